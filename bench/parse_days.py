@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Бенчмарк разбора get_all_values(): parse_days против прежнего построчного
+разбора на синтетическом листе (по умолчанию 10 лет × 200 хобби).
+
+    python -m bench.parse_days --years 10 --hobbies 200 --density 0.1
+"""
+
+import argparse
+import datetime as dt
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data.files import norm_hobby  # noqa: E402
+from src.data.sheets import parse_days, parse_rows  # noqa: E402
+
+
+def parse_days_before(all_values, dates):
+    """Прежняя реализация: весь лист, norm_hobby на каждую ячейку"""
+    result = {d: {} for d in dates}
+    if not all_values:
+        return result
+    headers = all_values[0]
+    wanted = set(dates)
+    for row in all_values[1:]:
+        if not row or row[0] not in wanted:
+            continue
+        day = {}
+        for j, header in enumerate(headers[1:], start=1):
+            if j < len(row) and row[j].strip():
+                try:
+                    day[norm_hobby(header)] = float(row[j].replace(",", "."))
+                except ValueError:
+                    continue
+        result[row[0]] = day
+    return result
+
+
+def make_sheet(years: int, hobbies: int, density: float, seed: int = 1) -> list[list[str]]:
+    rng = random.Random(seed)
+    start = dt.date(2016, 1, 1)
+    header = ["Дата"] + [f"Хобби {i}" for i in range(hobbies)]
+    rows = [header]
+    for i in range(years * 365):
+        d = (start + dt.timedelta(days=i)).isoformat()
+        rows.append([d] + [(f"{rng.randint(1, 8) / 2:g}".replace(".", ",") if rng.random() < density else "")
+                           for _ in range(hobbies)])
+    return rows
+
+
+def best(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--years", type=int, default=10)
+    ap.add_argument("--hobbies", type=int, default=200)
+    ap.add_argument("--density", type=float, default=0.1, help="доля заполненных ячеек")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    sheet = make_sheet(args.years, args.hobbies, args.density)
+    all_dates = [r[0] for r in sheet[1:]]
+    cases = {
+        "окно 7 дней": all_dates[-7:],
+        "окно 30 дней": all_dates[-30:],
+        "7 дней + нет строки": all_dates[-6:] + ["2099-01-01"],
+        "вся история": all_dates,
+    }
+    print(f"Лист: {len(sheet) - 1} строк × {args.hobbies} хобби, заполнено {args.density:.0%}")
+    print(f"{'случай':<22}{'было, мс':>11}{'стало, мс':>11}{'compact, мс':>13}{'ускорение':>11}")
+    for name, dates in cases.items():
+        assert parse_days(sheet, dates) == parse_days_before(sheet, dates)
+        before = best(lambda: parse_days_before(sheet, dates), args.repeat)
+        after = best(lambda: parse_days(sheet, dates), args.repeat)
+        compact = best(lambda: parse_rows(sheet, dates), args.repeat)
+        print(f"{name:<22}{before * 1e3:>11.2f}{after * 1e3:>11.2f}{compact * 1e3:>13.2f}{before / after:>10.1f}×")
+
+
+if __name__ == "__main__":
+    main()
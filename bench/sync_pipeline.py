@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Офлайн-бенчмарк пути записи: record_entry → журнал → SyncWorker → лист.
+
+Лист — FakeWorksheet с задержкой/отказами/квотой, всё остальное — боевой код
+(runtime, Journal, SyncWorker, SheetsManager, RateLimiter). Сеть не нужна.
+
+    python -m bench.sync_pipeline --entries 500 --dates 30 --latency 0.15 --failure-rate 0.05
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "bench")
+os.environ.setdefault("SPREADSHEET_ID", "bench")
+
+from src import runtime  # noqa: E402
+from src.data import sheets  # noqa: E402
+from src.data.fake_sheets import FakeWorksheet  # noqa: E402
+from src.data.ratelimit import RateLimiter  # noqa: E402
+from src.data.sync_worker import SyncWorker  # noqa: E402
+
+
+async def run(args) -> None:
+    tmp = tempfile.mkdtemp(prefix="hobby-bench-")
+    runtime.JOURNAL_FILE = os.path.join(tmp, "journal.jsonl")
+    runtime.JOURNAL_OFFSET_FILE = os.path.join(tmp, "journal.offset")
+    runtime.DAYCACHE_FILE = os.path.join(tmp, "days.json")
+    runtime.save_hobby_to_history = lambda h: None
+    runtime.init_runtime()
+
+    ws = FakeWorksheet(latency=args.latency, failure_rate=args.failure_rate,
+                       quota_per_minute=args.quota, seed=1)
+    limiter = RateLimiter(per_minute=args.rpm, burst=args.burst, base_backoff=0.05)
+    sheets._manager = sheets.SheetsManager(ws=ws, limiter=limiter)
+    m = sheets._manager
+
+    rng = random.Random(1)
+    dates = [f"2026-{1 + i // 28:02d}-{1 + i % 28:02d}" for i in range(args.dates)]
+    hobbies = [f"хобби{i}" for i in range(args.hobbies)]
+
+    t0 = time.perf_counter()
+    rec = []
+    for _ in range(args.entries):
+        t = time.perf_counter()
+        await runtime.record_entry(rng.choice(dates), rng.choice(hobbies), rng.choice([0.5, 1, 2]), "bench")
+        rec.append(time.perf_counter() - t)
+    print(f"record_entry: {args.entries} шт за {time.perf_counter() - t0:.3f}с, "
+          f"p50={statistics.median(rec) * 1e3:.2f}мс max={max(rec) * 1e3:.2f}мс")
+
+    worker = SyncWorker(runtime.journal, runtime.wake, write_day=m.write_values,
+                        sheets_lock=runtime.sheets_lock.writer, write_days=m.write_days)
+    t0 = time.perf_counter()
+    attempts = 0
+    while runtime.journal.pending_count():
+        attempts += 1
+        await worker.drain()
+    drain_s = time.perf_counter() - t0
+    print(f"drain: {drain_s:.3f}с, попыток {attempts}, вызовы API: {dict(ws.calls)}")
+
+    reads = []
+    for d in dates[: min(20, len(dates))]:
+        runtime.cache._data.pop(d, None)
+        t = time.perf_counter()
+        await runtime.get_day_values(d)
+        reads.append(time.perf_counter() - t)
+    print(f"get_day_values (промах кэша): p50={statistics.median(reads) * 1e3:.1f}мс "
+          f"max={max(reads) * 1e3:.1f}мс")
+    print(f"лимитер: {limiter.stats()}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--entries", type=int, default=300)
+    ap.add_argument("--dates", type=int, default=10)
+    ap.add_argument("--hobbies", type=int, default=20)
+    ap.add_argument("--latency", type=float, default=0.1, help="задержка одного вызова API, с")
+    ap.add_argument("--failure-rate", type=float, default=0.0)
+    ap.add_argument("--quota", type=int, default=None, help="квота фейка, вызовов/мин")
+    ap.add_argument("--rpm", type=int, default=600, help="квота лимитера, вызовов/мин")
+    ap.add_argument("--burst", type=int, default=10)
+    asyncio.run(run(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,10 +15,11 @@ from src.bot.handlers import (
     start, help_cmd, quick_cmd, stats_cmd, list_all_cmd, reminders_cmd,
     button_callback, text_message_handler,
 )
+from src.data.async_sheets import close_async_reader
 from src.data.files import create_sample_aliases
 from src.data.sheets import get_sheets_manager
 from src.data.sync_worker import SyncWorker
-from src.utils.config import API_PORT, BOT_TOKEN, WEBAPP_URL, validate_config
+from src.utils.config import API_PORT, BOT_TOKEN, RECONCILE_INTERVAL_S, WEBAPP_URL, validate_config
 from src.utils.scheduler import start_scheduler, stop_scheduler
 
 logger = logging.getLogger(__name__)
@@ -56,12 +57,29 @@ async def amain() -> None:
     worker = SyncWorker(
         runtime.journal, runtime.wake,
         write_day=lambda values, date: get_sheets_manager().write_values(values, date),
-        sheets_lock=runtime.sheets_lock,
+        write_days=lambda batch: get_sheets_manager().write_days(batch),
+        sheets_lock=runtime.sheets_lock.writer,
     )
     worker_task = asyncio.create_task(worker.run())
     runtime.wake.set()  # доиграть несинканный хвост после рестарта
     logger.info("✅ Sync-воркер запущен")
 
+    mirror_task = reconcile_task = None
+    if runtime.mirror is None and RECONCILE_INTERVAL_S > 0:
+        reconcile_task = asyncio.create_task(runtime.reconcile_loop())
+    if runtime.mirror is not None:
+        await runtime.bootstrap_mirror()
+        mirror_worker = SyncWorker(
+            runtime.mirror_cursor, runtime.mirror_wake,
+            write_day=runtime.mirror.write_values, write_days=runtime.mirror.write_days,
+            sheets_lock=asyncio.Lock(),  # своя цель — Sheets не держит
+            name="mirror",
+        )
+        mirror_task = asyncio.create_task(mirror_worker.run())
+        refresh_task = asyncio.create_task(runtime.mirror_refresh_loop())
+        runtime.mirror_wake.set()
+        logger.info("✅ Зеркало SQLite: %s", runtime.mirror.path)
+
     start_scheduler(BOT_TOKEN)
     logger.info("✅ Планировщик напоминаний запущен")
 
@@ -71,7 +89,19 @@ async def amain() -> None:
     await server.serve()  # блокируется до SIGTERM/SIGINT (uvicorn ловит сигналы)
 
     logger.info("🛑 Остановка...")
+    if runtime.writer is not None:
+        await runtime.writer.stop()  # дописать очередь group-commit до остановки
+    await runtime.cache.close()      # последний снапшот кэша дней
+    if runtime.warm is not None:
+        await runtime.warm.close()
     worker_task.cancel()
+    if reconcile_task is not None:
+        reconcile_task.cancel()
+    if mirror_task is not None:
+        mirror_task.cancel()
+        refresh_task.cancel()
+        runtime.mirror.close()
+    await close_async_reader()
     stop_scheduler()
     await bot_app.updater.stop()
     await bot_app.stop()
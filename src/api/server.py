@@ -1,14 +1,17 @@
 """HTTP API Mini App + раздача статики фронта."""
 
 import datetime as dt
+import hmac
 import re
 
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field, field_validator
 
 from .. import runtime
 from ..data.files import get_all_hobbies, get_hobby_display_name, norm_hobby
+from ..utils.config import METRICS_TOKEN
 from ..utils.dates import date_for_time
 from .auth import require_tg_auth
 
@@ -54,11 +57,12 @@ def create_app(serve_static: bool = True) -> FastAPI:
         if not DATE_RE.match(date):
             raise HTTPException(status_code=400, detail="date must be YYYY-MM-DD")
         values = await runtime.get_day_values(date)
+        runtime.prefetch_around(date)
         return {"values": values, "queue_pending": runtime.pending_count()}
 
     @app.post("/api/entry")
     async def entry(req: EntryRequest, _: dict = Depends(require_tg_auth)):
-        pending = runtime.record_entry(req.date, req.hobby, req.hours, source="miniapp")
+        pending = await runtime.record_entry(req.date, req.hobby, req.hours, source="miniapp")
         return {"ok": True, "queue_pending": pending}
 
     @app.get("/api/queue")
@@ -66,6 +70,15 @@ def create_app(serve_static: bool = True) -> FastAPI:
         """Лёгкий статус очереди — фронт опрашивает после записи, пока не 0"""
         return {"queue_pending": runtime.pending_count()}
 
+    @app.get("/api/metrics", response_class=PlainTextResponse)
+    async def metrics(authorization: str = Header(default="")):
+        """Prometheus text format: лаг журнала, сливы, латентность Sheets.
+        Без Telegram-auth (скрейпер её не умеет) — опционально Bearer METRICS_TOKEN."""
+        if METRICS_TOKEN and not hmac.compare_digest(authorization, f"Bearer {METRICS_TOKEN}"):
+            raise HTTPException(status_code=401, detail="bad metrics token")
+        return PlainTextResponse(runtime.collect_metrics(),
+                                 media_type="text/plain; version=0.0.4")
+
     if serve_static:
         app.mount("/", StaticFiles(directory="frontend", html=True), name="frontend")
     return app
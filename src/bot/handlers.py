@@ -1,4 +1,3 @@
-import asyncio
 import logging
 from datetime import datetime
 from telegram import Update
@@ -21,7 +20,6 @@ from ..data.files import (
 from ..data.reminders import (
     add_reminder, remove_reminder, get_user_reminders
 )
-from ..data.sheets import get_sheets_manager
 from ..utils.dates import date_for_time
 from .. import runtime
 
@@ -190,7 +188,7 @@ async def handle_stars_selection(query, user_id: int, data: str):
         target_date = parts[3]
 
         # Запись через журнал-буфер: мгновенно, Sheets дольёт воркер
-        runtime.record_entry(target_date, hobby_key, stars, source="bot")
+        await runtime.record_entry(target_date, hobby_key, stars, source="bot")
 
         hobby_display = get_hobby_display_name(hobby_key)
         result_text = format_hobby_stars_result(hobby_display, stars)
@@ -565,37 +563,19 @@ def create_unicode_chart(values: list, max_height: int = 8) -> str:
     return chart
 
 
-async def get_week_data() -> dict:
-    """Данные за последние 7 дней ОДНИМ запросом к Sheets"""
-    from datetime import datetime, timedelta
-    dates = [(datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(7)]
-    async with runtime.sheets_lock:
-        return await asyncio.to_thread(lambda: get_sheets_manager().get_days_bulk(dates))
-
-
 async def show_weekly_analytics(query):
     """Показывает еженедельную аналитику"""
     try:
-        week_data = await get_week_data()
-        
-        # Собираем статистику по увлечениям
-        hobby_totals = {}
-        daily_totals = []
-        dates = []
-        
-        # Сортируем даты по порядку (от старых к новым)
-        sorted_dates = sorted(week_data.keys())
-        
-        for date_str in sorted_dates:
-            day_data = week_data[date_str]
-            day_total = sum(day_data.values()) if day_data else 0
-            daily_totals.append(day_total)
-            dates.append(date_str)
-            
-            for hobby, hours in day_data.items():
-                if hours > 0:
-                    hobby_totals[hobby] = hobby_totals.get(hobby, 0) + hours
-        
+        from datetime import timedelta
+        hist = await runtime.get_history()
+        today = datetime.now()
+        end = today.strftime("%Y-%m-%d")
+
+        # Срезы колоночной истории: без сети, векторно
+        hobby_totals = hist.totals(end, 7)
+        daily_totals = [float(x) for x in hist.daily_totals(end, 7)]
+        sorted_dates = [(today - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(6, -1, -1)]
+
         # Создаем график недельной активности
         chart = create_unicode_chart(daily_totals)
         
@@ -618,7 +598,8 @@ async def show_weekly_analytics(query):
         
         message += f"📋 **Сводка за 7 дней:**\n"
         message += f"🎯 Общее время: {total_week_hours:.1f} ч.\n"
-        message += f"📊 Среднее в день: {avg_daily:.1f} ч.\n\n"
+        message += f"📊 Среднее в день: {avg_daily:.1f} ч.\n"
+        message += f"🔥 Дней подряд с активностью: {hist.streak(end)}\n\n"
         
         # Топ-3 активности за 7 дней
         if hobby_totals:
@@ -646,28 +627,15 @@ async def show_weekly_analytics(query):
 async def show_top3_analytics(query):
     """Показывает топ-3 активности за разные периоды"""
     try:
-        from datetime import datetime, timedelta
+        from datetime import datetime
 
-        # Данные за неделю
-        week_data = await get_week_data()
-        week_totals = {}
-        for day_data in week_data.values():
-            for hobby, hours in day_data.items():
-                if hours > 0:
-                    week_totals[hobby] = week_totals.get(hobby, 0) + hours
+        hist = await runtime.get_history()
+        end = datetime.now().strftime("%Y-%m-%d")
+        week_totals = hist.totals(end, 7)
+        # Тренд: последние 3 дня против первых 4 (как раньше, но векторно)
+        week_trend = hist.half_trend(end, 7)
+        month_totals = hist.totals(end, 30)
 
-        # Данные за месяц (последние 30 дней) — ОДНИМ запросом
-        today = datetime.now()
-        month_dates = [(today - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(30)]
-        async with runtime.sheets_lock:
-            month_data = await asyncio.to_thread(
-                lambda: get_sheets_manager().get_days_bulk(month_dates))
-        month_totals = {}
-        for day_data in month_data.values():
-            for hobby, hours in day_data.items():
-                if hours > 0:
-                    month_totals[hobby] = month_totals.get(hobby, 0) + hours
-        
         message = "🏆 **Топ-3 активности**\n\n"
         
         # Топ-3 за последние 7 дней
@@ -677,18 +645,7 @@ async def show_top3_analytics(query):
             for i, (hobby, hours) in enumerate(week_top3, 1):
                 hobby_display = get_hobby_display_name(hobby)
                 
-                # Простой тренд (сравниваем первую и вторую половину периода)
-                first_half = sum([week_data[d].get(hobby, 0) for d in sorted(week_data.keys())[:4]])
-                second_half = sum([week_data[d].get(hobby, 0) for d in sorted(week_data.keys())[4:]])
-                
-                trend = ""
-                if second_half > first_half * 1.1:
-                    trend = "📈"
-                elif second_half < first_half * 0.9:
-                    trend = "📉"
-                else:
-                    trend = "➡️"
-                
+                trend = week_trend.get(hobby, "")
                 message += f"{i}. {hobby_display}: {hours:.1f} ч. {trend}\n"
             message += "\n"
         
@@ -768,7 +725,7 @@ async def text_message_handler(update: Update, context: ContextTypes.DEFAULT_TYP
             logger.info(f"Custom stars value '{stars_value}' for hobby '{hobby_name}' by user {username} ({user_id}) on {target_date}")
 
             # Запись через журнал-буфер: мгновенно, Sheets дольёт воркер
-            runtime.record_entry(target_date, hobby_name, stars_value, source="bot")
+            await runtime.record_entry(target_date, hobby_name, stars_value, source="bot")
 
             hobby_display = get_hobby_display_name(hobby_name)
             await update.message.reply_text(format_hobby_stars_result(hobby_display, stars_value))
@@ -0,0 +1,199 @@
+"""Нативный async-клиент Sheets API v4 поверх httpx: чтения без потоков.
+
+gspread синхронный: каждый вызов занимает поток пула to_thread и сидит под
+sheets_lock. Здесь запросы идут корутинами через один httpx.AsyncClient
+(keep-alive пул соединений), число одновременных запросов ограничено
+семафором, квота и 429 — через общий RateLimiter (call_async).
+
+AsyncSheetsReader — чтения по кэшу раскладки SheetsManager (строки дат,
+заголовки). Записи остаются на gspread под sheets_lock: они меняют
+раскладку (append строк, новые колонки). Чтение sheets_lock не берёт и
+идёт параллельно со сливом: строка проверяется по дате в колонке A, так
+что сдвиг раскладки ловится, как и в get_days_strict."""
+
+import asyncio
+import datetime as dt
+import logging
+import time
+from typing import Dict, List, Optional
+from urllib.parse import quote
+
+import httpx
+
+from ..utils.config import (
+    SHEET_NAME, SHEETS_ASYNC, SHEETS_BACKEND, SHEETS_MAX_CONCURRENCY, SPREADSHEET_ID,
+)
+from ..utils.metrics import SHEETS_CALLS, SHEETS_SECONDS
+from .files import norm_hobby
+from .ratelimit import RateLimiter
+from .sheets import SheetsManager, get_sheets_manager, parse_days, row_ranges, sheets_limiter
+
+logger = logging.getLogger(__name__)
+
+API_ROOT = "https://sheets.googleapis.com/v4/spreadsheets/"
+# Токен обновляем заранее: запрос, начатый за минуту до истечения, не должен получить 401
+TOKEN_MARGIN = dt.timedelta(minutes=5)
+
+
+class SheetsHTTPError(Exception):
+    """Ответ API не 2xx. response — httpx.Response: status_code/Retry-After
+    читает RateLimiter так же, как у gspread.APIError."""
+
+    def __init__(self, response: httpx.Response):
+        self.response = response
+        super().__init__(f"Sheets API {response.status_code}: {response.text[:200]}")
+
+
+class AsyncSheetsClient:
+    def __init__(self, creds, spreadsheet_id: str, limiter: Optional[RateLimiter] = None,
+                 max_concurrency: int = 4, timeout: float = 30.0,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        """creds — google.auth Credentials (те же, что у SheetsManager).
+        transport — подмена транспорта httpx (тесты: httpx.MockTransport)."""
+        self.creds = creds
+        self.limiter = limiter
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self._token_lock = asyncio.Lock()
+        self._http = httpx.AsyncClient(
+            base_url=API_ROOT + spreadsheet_id,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_concurrency,
+                                max_keepalive_connections=max_concurrency),
+            transport=transport,
+        )
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    # --- токен ---
+
+    def _token_fresh(self) -> bool:
+        expiry = getattr(self.creds, "expiry", None)
+        if not self.creds.token:
+            return False
+        # google-auth хранит expiry наивным UTC
+        return expiry is None or expiry - TOKEN_MARGIN > dt.datetime.now(dt.timezone.utc).replace(tzinfo=None)
+
+    async def _token(self) -> str:
+        """Access-токен сервис-аккаунта. Обновление — раз в час, одно на всех:
+        остальные корутины ждут его на asyncio.Lock, не дёргая token endpoint."""
+        if self._token_fresh():
+            return self.creds.token
+        async with self._token_lock:
+            if not self._token_fresh():
+                from google.auth.transport.requests import Request
+                # refresh у google-auth синхронный; редкий (раз в час) — в потоке
+                await asyncio.to_thread(self.creds.refresh, Request())
+            return self.creds.token
+
+    # --- запросы ---
+
+    async def _send(self, name: str, method: str, url: str, **kwargs) -> dict:
+        async with self._sem:
+            headers = {"Authorization": f"Bearer {await self._token()}"}
+            start = time.monotonic()
+            outcome = "error"
+            try:
+                resp = await self._http.request(method, url, headers=headers, **kwargs)
+                if resp.status_code == 401:
+                    self.creds.token = None   # отозван/протух раньше expiry — следующий запрос обновит
+                if resp.status_code >= 400:
+                    raise SheetsHTTPError(resp)
+                outcome = "ok"
+                return resp.json() if resp.content else {}
+            finally:
+                SHEETS_SECONDS.observe(time.monotonic() - start, method=name)
+                SHEETS_CALLS.inc(method=name, outcome=outcome)
+
+    async def _call(self, name: str, method: str, url: str, **kwargs) -> dict:
+        """name — метка метрик (async_values_get, ...): отдельно от вызовов gspread"""
+        if self.limiter is None:
+            return await self._send(name, method, url, **kwargs)
+        return await self.limiter.call_async(self._send, name, method, url, **kwargs)
+
+    async def values_get(self, a1: str) -> List[List[str]]:
+        data = await self._call("async_values_get", "GET", f"/values/{quote(a1, safe='')}")
+        return data.get("values", [])
+
+    async def values_batch_get(self, ranges: List[str]) -> List[List[List[str]]]:
+        data = await self._call("async_batch_get", "GET", "/values:batchGet",
+                                params=[("ranges", r) for r in ranges])
+        return [vr.get("values", []) for vr in data.get("valueRanges", [])]
+
+
+def _a1(title: str, rng: str) -> str:
+    """Диапазон с листом: 'Данные'!A2:F8 (кавычки в названии удваиваются);
+    пустой rng — весь лист: 'Данные'"""
+    sheet = "'" + title.replace("'", "''") + "'"
+    return sheet + "!" + rng if rng else sheet
+
+
+class AsyncSheetsReader:
+    """Чтения дней через AsyncSheetsClient по раскладке SheetsManager.
+    Раскладка общая: её сбросы записью/сверкой видны и здесь, а пустую
+    заполняем одним batchGet (row 1 + колонка A)."""
+
+    def __init__(self, manager: SheetsManager, client: AsyncSheetsClient, title: str):
+        self.manager = manager
+        self.client = client
+        self.title = title
+
+    async def _layout(self) -> tuple[List[str], Dict[str, int]]:
+        headers, rows = self.manager.cached_layout()
+        if headers is not None and rows is not None:
+            return headers, rows
+        head, col_a = await self.client.values_batch_get(
+            [_a1(self.title, "1:1"), _a1(self.title, "A:A")])
+        if not head:
+            return [], {}   # пустой лист: заголовок создаст первая запись (load_headers)
+        return self.manager.set_layout(head[0], [r[0] if r else "" for r in col_a])
+
+    async def get_days_strict(self, dates: List[str]) -> Dict[str, Dict[str, float]]:
+        """Как SheetsManager.get_days_strict: строки дат из раскладки, значения —
+        одним batchGet; не та дата в строке — сброс раскладки и повтор. БРОСАЕТ."""
+        for _ in range(2):
+            headers, known = await self._layout()
+            at = {known[d]: d for d in dates if d in known and known[d] > 1}
+            if not at:
+                return {d: {} for d in dates}
+            rows = sorted(at)
+            fetched = await self.client.values_batch_get(
+                [_a1(self.title, r) for r in row_ranges(rows, len(headers))])
+            got = [r for block in fetched for r in block]
+            if [r[0] if r else "" for r in got] == [at[r] for r in rows]:
+                return parse_days([headers] + got, dates)
+            self.manager.invalidate_layout()
+        # Как get_rows_strict: раскладка не сошлась дважды — лист целиком, заодно и раскладка
+        logger.warning("Раскладка листа не сходится с данными — читаю лист целиком")
+        all_values = await self.client.values_get(_a1(self.title, ""))
+        self.manager.learn_layout(all_values)
+        return parse_days(all_values, dates)
+
+    async def get_day_data_strict(self, date: str) -> Dict[str, float]:
+        """Как SheetsManager.get_day_data_strict: все хобби листа, пустые — 0.0. БРОСАЕТ."""
+        day = (await self.get_days_strict([date]))[date]
+        headers, known = await self._layout()   # из кэша: get_days_strict его заполнил
+        if date not in known:
+            return {}
+        return {norm_hobby(h): day.get(norm_hobby(h), 0.0) for h in headers[1:]}
+
+
+_reader: "AsyncSheetsReader | None" = None
+
+
+def get_async_reader() -> Optional[AsyncSheetsReader]:
+    """Ленивый синглтон; None — async-клиент выключен (SHEETS_ASYNC) или лист fake"""
+    global _reader
+    if _reader is None and SHEETS_ASYNC and SHEETS_BACKEND != "fake":
+        manager = get_sheets_manager()
+        client = AsyncSheetsClient(manager.creds, SPREADSHEET_ID, limiter=sheets_limiter,
+                                   max_concurrency=SHEETS_MAX_CONCURRENCY)
+        _reader = AsyncSheetsReader(manager, client, SHEET_NAME)
+    return _reader
+
+
+async def close_async_reader() -> None:
+    global _reader
+    if _reader is not None:
+        await _reader.client.aclose()
+        _reader = None
@@ -1,8 +1,32 @@
-"""Локальный снапшот значений последних N дней + оверлей журнала."""
+"""Локальный снапшот значений последних N дней + оверлей журнала.
 
+Истина — память; days.json — перестраиваемый снапшот (долговечность даёт
+журнал, после потери файла хватит сверки). Поэтому запись на диск —
+write-behind: изменение помечает кэш грязным, а фоновый flush не чаще
+раза в flush_ms пишет атомарно (temp + fsync + rename) — тап не ждёт
+перезаписи файла.
+
+Уровни: DayCache — горячее окно в памяти (последние дни), WarmDayCache —
+тёплое окно на диске (месяцы/год, месяц грузится лениво). Даты старше
+окон — в LRUDayCache: ограниченный по числу записей и памяти
+read-through кэш с TTL (ручные правки в таблице не живут в нём дольше TTL)."""
+
+import abc
+import asyncio
 import datetime as dt
 import json
+import logging
 import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from .journal import atomic_write
+
+logger = logging.getLogger(__name__)
+
+_INDEX = "index"   # ключ/файл индекса дней WarmDayCache (месяцы — "2026-07")
 
 
 def merged(base: dict[str, float], pending: list[dict], date: str) -> dict[str, float]:
@@ -14,11 +38,84 @@ def merged(base: dict[str, float], pending: list[dict], date: str) -> dict[str,
     return out
 
 
-class DayCache:
-    def __init__(self, path: str, days_window: int = 7):
+class _WriteBehind(abc.ABC):
+    """Write-behind снапшотов на диск. Наследник помечает изменённые части
+    (_changed(key)) и отдаёт их снимки (_snapshot(key) → (путь, текст));
+    запись — атомарная, не чаще раза в flush_ms, в потоке."""
+
+    def _init_write_behind(self, flush_ms: int) -> None:
+        self.flush_interval = flush_ms / 1000
+        self._dirty: set[str] = set()
+        self._flush_task: asyncio.Task | None = None
+        self._flush_lock: asyncio.Lock | None = None
+        self.flushes = 0
+
+    @abc.abstractmethod
+    def _snapshot(self, key: str) -> tuple[str, str]:
+        """Снимок части key: (путь файла, текст)"""
+
+    def _take_snapshots(self) -> tuple[set[str], list[tuple[str, str]]]:
+        keys, self._dirty = self._dirty, set()
+        return keys, [self._snapshot(k) for k in sorted(keys)]
+
+    def _save(self) -> None:
+        for path, text in self._take_snapshots()[1]:
+            atomic_write(path, text)
+        self.flushes += 1
+
+    def _changed(self, key: str = "") -> None:
+        self._dirty.add(key)
+        if self.flush_interval <= 0:
+            self._save()
+            return
+        if self._flush_task is not None and not self._flush_task.done():
+            return   # flush уже запланирован — заберёт и это изменение
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._save()   # вне event loop (скрипты, тесты) — сразу
+            return
+        self._flush_task = loop.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        # shield: отмена (close) не должна рвать начатую запись файла
+        await asyncio.shield(self.flush())
+
+    async def flush(self) -> None:
+        """Снапшот грязного на диск (в потоке, атомарно)"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            keys, snapshots = self._take_snapshots()   # снимок в потоке loop — согласованный
+            try:
+                await asyncio.to_thread(lambda: [atomic_write(p, t) for p, t in snapshots])
+                self.flushes += 1
+            except Exception as e:
+                self._dirty |= keys
+                logger.error("Снапшот кэша дней не записан (повторим при следующем изменении): %s", e)
+
+    async def close(self) -> None:
+        """Остановка: снять отложенный flush и дописать грязное"""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.flush()
+
+
+class DayCache(_WriteBehind):
+    """Горячий уровень: последние days_window дней целиком в памяти"""
+
+    def __init__(self, path: str, days_window: int = 7, flush_ms: int = 0):
+        """flush_ms — окно write-behind (0 — писать файл на каждое изменение)"""
         self.path = path
         self.days_window = days_window
         self._data: dict[str, dict[str, float]] = self._load()
+        # Отпечаток строки листа, из которой день взят сверкой (в памяти:
+        # после рестарта первая сверка просто перечитает окно)
+        self._hashes: dict[str, str] = {}
+        self._init_write_behind(flush_ms)
 
     def _load(self) -> dict:
         try:
@@ -27,27 +124,251 @@ class DayCache:
         except (FileNotFoundError, json.JSONDecodeError):
             return {}
 
-    def _save(self) -> None:
-        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
-        with open(self.path, "w", encoding="utf-8") as f:
-            json.dump(self._data, f, ensure_ascii=False)
+    def _snapshot(self, key: str) -> tuple[str, str]:
+        return self.path, json.dumps(self._data, ensure_ascii=False)
+
+    def __contains__(self, date: str) -> bool:
+        return date in self._data
 
     def get(self, date: str) -> dict[str, float] | None:
         values = self._data.get(date)
         return dict(values) if values is not None else None
 
-    def set(self, date: str, values: dict[str, float]) -> None:
+    def set(self, date: str, values: dict[str, float], row_hash: str | None = None) -> None:
         self._data[date] = dict(values)
-        self._save()
+        if row_hash is None:
+            self._hashes.pop(date, None)
+        else:
+            self._hashes[date] = row_hash
+        self._changed()
+
+    def row_hash(self, date: str) -> str | None:
+        return self._hashes.get(date)
 
     def apply_entry(self, date: str, hobby: str, hours: float) -> None:
         self._data.setdefault(date, {})[hobby] = hours
-        self._save()
+        self._changed()
 
-    def prune(self, today: str) -> None:
+    def prune(self, today: str) -> dict[str, tuple[dict[str, float], str | None]]:
+        """Убирает дни старше окна; возвращает их {дата: (значения, отпечаток)}
+        — runtime переносит их в тёплый уровень"""
         cutoff = (dt.date.fromisoformat(today) - dt.timedelta(days=self.days_window)).isoformat()
-        stale = [d for d in self._data if d < cutoff]
-        for d in stale:
-            del self._data[d]
+        stale = {d: (self._data.pop(d), self._hashes.pop(d, None))
+                 for d in [d for d in self._data if d < cutoff]}
         if stale:
-            self._save()
+            self._changed()
+        return stale
+
+
+class WarmDayCache(_WriteBehind):
+    """Тёплый уровень: дни за последние days_window дней на диске, файл на
+    месяц (warm/2026-07.json: значения + отпечатки строк листа). Месяц
+    читается с диска при первом обращении и дальше живёт в памяти. Правила
+    те же, что у DayCache: база без оверлея журнала, сверка по отпечаткам.
+    apply_entry трогает только известные дни — остальных хобби дня мы не знаем.
+
+    Список дней по месяцам — в warm/index.json: сверке и prune не нужно
+    читать все месяцы. Индекс — подсказка: разойтись с файлами месяцев он
+    может только после падения между их записью, и тогда сверка лишний раз
+    перечитает день или узнает о нём при следующем set. Нет/битый — строится
+    заново по файлам месяцев."""
+
+    def __init__(self, dir: str, days_window: int = 90, flush_ms: int = 0):
+        self.dir = dir
+        self.days_window = days_window
+        self._months: dict[str, dict] = {}   # "2026-07" → {"days": {...}, "hashes": {...}}
+        self.stats = {"hits": 0, "misses": 0}
+        self._init_write_behind(flush_ms)
+        self._index: dict[str, set[str]] = {}   # "2026-07" → дни месяца
+        self._load_index()
+
+    def _path(self, month: str) -> str:
+        return os.path.join(self.dir, f"{month}.json")
+
+    def _load_index(self) -> None:
+        try:
+            with open(self._path(_INDEX), "r", encoding="utf-8") as f:
+                self._index = {m: set(days) for m, days in json.load(f).items()}
+            return
+        except FileNotFoundError:
+            pass
+        except (ValueError, AttributeError, TypeError):
+            logger.warning("Битый индекс тёплого кэша — перестраиваю по месяцам")
+        if os.path.isdir(self.dir):
+            for name in os.listdir(self.dir):
+                if name.endswith(".json") and name != f"{_INDEX}.json":
+                    days = self._month(name[:-5] + "-01")["days"]
+                    if days:
+                        self._index[name[:-5]] = set(days)
+        if self._index:
+            self._changed(_INDEX)
+
+    def _month(self, date: str) -> dict:
+        m = date[:7]
+        shard = self._months.get(m)
+        if shard is None:
+            try:
+                with open(self._path(m), "r", encoding="utf-8") as f:
+                    shard = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                shard = {}
+            shard.setdefault("days", {})
+            shard.setdefault("hashes", {})
+            self._months[m] = shard
+        return shard
+
+    def _snapshot(self, key: str) -> tuple[str, str]:
+        if key == _INDEX:
+            return self._path(key), json.dumps({m: sorted(d) for m, d in self._index.items()})
+        return self._path(key), json.dumps(self._months[key], ensure_ascii=False)
+
+    def __contains__(self, date: str) -> bool:
+        return date in self._month(date)["days"]
+
+    def get(self, date: str) -> dict[str, float] | None:
+        values = self._month(date)["days"].get(date)
+        self.stats["hits" if values is not None else "misses"] += 1
+        return dict(values) if values is not None else None
+
+    def set(self, date: str, values: dict[str, float], row_hash: str | None = None) -> None:
+        shard = self._month(date)
+        shard["days"][date] = dict(values)
+        if row_hash is None:
+            shard["hashes"].pop(date, None)
+        else:
+            shard["hashes"][date] = row_hash
+        self._changed(date[:7])
+        known = self._index.setdefault(date[:7], set())
+        if date not in known:
+            known.add(date)
+            self._changed(_INDEX)
+
+    def row_hash(self, date: str) -> str | None:
+        return self._month(date)["hashes"].get(date)
+
+    def apply_entry(self, date: str, hobby: str, hours: float) -> None:
+        shard = self._month(date)
+        if date in shard["days"]:
+            shard["days"][date][hobby] = hours
+            self._changed(date[:7])
+
+    def dates(self) -> list[str]:
+        """Все дни уровня — по индексу, без чтения месяцев (для сверки)"""
+        return sorted(d for days in self._index.values() for d in days)
+
+    def prune(self, today: str) -> None:
+        cutoff = (dt.date.fromisoformat(today) - dt.timedelta(days=self.days_window)).isoformat()
+        pruned = False
+        for m, days in list(self._index.items()):
+            stale = [d for d in days if d < cutoff]
+            if not stale:
+                continue
+            shard = self._month(stale[0])   # с диска — только месяцы, где есть что убрать
+            for d in stale:
+                days.discard(d)
+                shard["days"].pop(d, None)
+                shard["hashes"].pop(d, None)
+            pruned = True
+            if days:
+                self._changed(m)
+            else:
+                del self._index[m]
+                self._months.pop(m, None)
+                self._dirty.discard(m)
+                try:
+                    os.remove(self._path(m))
+                except FileNotFoundError:
+                    pass
+        if pruned:
+            self._changed(_INDEX)   # после удаления месяцев: при flush_ms=0 пишется сразу
+
+
+def _approx_bytes(date: str, values: dict[str, float]) -> int:
+    """Грубая оценка памяти записи: dict + ключи + float'ы"""
+    return (sys.getsizeof(date) + sys.getsizeof(values)
+            + sum(sys.getsizeof(h) + 24 for h in values))
+
+
+class LRUDayCache:
+    """Дни вне окна DayCache: LRU по числу записей и байтам + TTL.
+    Инвалидация явная — запись (apply_entry) и сверка (invalidate)."""
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 2 * 1024 * 1024,
+                 ttl: float = 300.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict[str, tuple[float, int, dict[str, float]]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, date: str) -> bool:
+        """Есть и не протух; без учёта в stats и без сдвига в LRU (префетч)"""
+        with self._lock:
+            item = self._data.get(date)
+            return item is not None and self._clock() - item[0] <= self.ttl
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def _drop(self, date: str) -> None:
+        _, size, _ = self._data.pop(date)
+        self._bytes -= size
+
+    def get(self, date: str) -> dict[str, float] | None:
+        with self._lock:
+            item = self._data.get(date)
+            if item is None:
+                self.stats["misses"] += 1
+                return None
+            if self._clock() - item[0] > self.ttl:
+                self._drop(date)
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._data.move_to_end(date)
+            self.stats["hits"] += 1
+            return dict(item[2])
+
+    def set(self, date: str, values: dict[str, float]) -> None:
+        values = dict(values)
+        size = _approx_bytes(date, values)
+        with self._lock:
+            if date in self._data:
+                self._drop(date)
+            if size > self.max_bytes:
+                return
+            self._data[date] = (self._clock(), size, values)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._data)))
+                self.stats["evictions"] += 1
+
+    def apply_entry(self, date: str, hobby: str, hours: float) -> None:
+        """Запись в кэшированный день — на месте (TTL не продлевается);
+        некэшированный не создаём: остальных хобби дня мы не знаем"""
+        with self._lock:
+            item = self._data.get(date)
+            if item is None:
+                return
+            ts, size, values = item
+            values[hobby] = hours
+            new_size = _approx_bytes(date, values)
+            self._data[date] = (ts, new_size, values)
+            self._bytes += new_size - size
+
+    def invalidate(self, date: str) -> None:
+        with self._lock:
+            if date in self._data:
+                self._drop(date)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
@@ -0,0 +1,193 @@
+"""Лист Google Sheets в памяти процесса — для тестов, бенчмарков и офлайн-запуска.
+
+Реализует тот же набор вызовов gspread, что использует SheetsManager
+(см. sheets.Worksheet), с настраиваемыми задержкой, долей отказов и
+минутной квотой. Ошибки похожи на gspread.APIError ровно настолько,
+насколько это нужно RateLimiter: .response.status_code и .response.headers."""
+
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+
+_A1_RE = re.compile(r"^(?:.*!)?([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?$")
+_ROWS_RE = re.compile(r"^(?:.*!)?(\d+):(\d+)$")   # целые строки: '1:1'
+_COLS_RE = re.compile(r"^(?:.*!)?([A-Z]+):([A-Z]+)$")   # целые колонки: 'A:A'
+
+
+def _col_to_num(col: str) -> int:
+    n = 0
+    for ch in col:
+        n = n * 26 + ord(ch) - ord("A") + 1
+    return n
+
+
+def _num_to_col(n: int) -> str:
+    col = ""
+    while n:
+        n, r = divmod(n - 1, 26)
+        col = chr(ord("A") + r) + col
+    return col
+
+
+def _fmt(v) -> str:
+    """Как Sheets отдаёт число после RAW-записи: 2.0 → «2», 1.5 → «1.5»"""
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status: int, message: str = "", retry_after: float | None = None):
+        super().__init__(f"[{status}] {message}")
+        self.code = status
+        headers = {"Retry-After": f"{retry_after:.3f}"} if retry_after is not None else {}
+        self.response = type("FakeResponse", (), {"status_code": status, "headers": headers})()
+
+
+class FakeWorksheet:
+    def __init__(self, rows: list[list] | None = None, title: str = "Данные",
+                 latency: float | tuple[float, float] = 0.0, failure_rate: float = 0.0,
+                 quota_per_minute: int | None = None, seed: int | None = None):
+        self.title = title
+        self.rows: list[list[str]] = [[_fmt(v) for v in r] for r in (rows or [["Дата"]])]
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.quota_per_minute = quota_per_minute
+        self.calls: Counter = Counter()
+        self.call_log: list[str] = []
+        self._recent: deque[float] = deque()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    # --- модель «сети» ---
+
+    def _api(self, method: str) -> None:
+        with self._lock:
+            self.calls[method] += 1
+            self.call_log.append(method)
+            if self.quota_per_minute is not None:
+                now = time.monotonic()
+                while self._recent and now - self._recent[0] >= 60:
+                    self._recent.popleft()
+                if len(self._recent) >= self.quota_per_minute:
+                    raise FakeAPIError(429, "Quota exceeded", retry_after=60 - (now - self._recent[0]))
+                self._recent.append(now)
+            fail = self._rng.random() < self.failure_rate
+            lat = self.latency
+            delay = self._rng.uniform(*lat) if isinstance(lat, tuple) else lat
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise FakeAPIError(503, "Backend error")
+
+    # --- хранилище ---
+
+    def _used_rows(self) -> int:
+        n = len(self.rows)
+        while n and not any(self.rows[n - 1]):
+            n -= 1
+        return n
+
+    def _set(self, r: int, c: int, v) -> None:
+        while len(self.rows) < r:
+            self.rows.append([])
+        row = self.rows[r - 1]
+        while len(row) < c:
+            row.append("")
+        row[c - 1] = _fmt(v)
+
+    def _get_range(self, a1: str) -> list[list[str]]:
+        m = _A1_RE.match(a1)
+        if m:
+            c1, r1 = _col_to_num(m.group(1)), int(m.group(2))
+            c2 = _col_to_num(m.group(3)) if m.group(3) else c1
+            r2 = int(m.group(4)) if m.group(4) else r1
+        elif m := _ROWS_RE.match(a1):
+            c1, c2 = 1, max((len(r) for r in self.rows), default=1)
+            r1, r2 = int(m.group(1)), int(m.group(2))
+        elif m := _COLS_RE.match(a1):
+            c1, c2 = _col_to_num(m.group(1)), _col_to_num(m.group(2))
+            r1, r2 = 1, len(self.rows)
+        else:
+            raise FakeAPIError(400, f"Bad range {a1}")
+        out = []
+        for r in range(r1, min(r2, len(self.rows)) + 1):
+            row = self.rows[r - 1][c1 - 1:c2]
+            while row and not row[-1]:
+                row = row[:-1]
+            out.append(row)
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    # --- вызовы gspread ---
+
+    def get_all_values(self) -> list[list[str]]:
+        self._api("get_all_values")
+        with self._lock:
+            n = self._used_rows()
+            width = max((len(r) for r in self.rows[:n]), default=0)
+            return [r + [""] * (width - len(r)) for r in self.rows[:n]]
+
+    def row_values(self, i: int) -> list[str]:
+        self._api("row_values")
+        with self._lock:
+            row = list(self.rows[i - 1]) if i <= len(self.rows) else []
+        while row and not row[-1]:
+            row.pop()
+        return row
+
+    def col_values(self, i: int) -> list[str]:
+        self._api("col_values")
+        with self._lock:
+            col = [r[i - 1] if i <= len(r) else "" for r in self.rows]
+        while col and not col[-1]:
+            col.pop()
+        return col
+
+    def batch_get(self, ranges: list[str]) -> list[list[list[str]]]:
+        self._api("batch_get")
+        with self._lock:
+            return [self._get_range(a1) for a1 in ranges]
+
+    def update(self, values, range_name: str = "A1"):
+        self._api("update")
+        m = _A1_RE.match(range_name)
+        if not m:
+            raise FakeAPIError(400, f"Bad range {range_name}")
+        c0, r0 = _col_to_num(m.group(1)), int(m.group(2))
+        if values and not isinstance(values[0], (list, tuple)):
+            values = [values]   # gspread принимает и плоский список
+        with self._lock:
+            for dr, row in enumerate(values):
+                for dc, v in enumerate(row):
+                    self._set(r0 + dr, c0 + dc, v)
+        return {"updatedRange": range_name}
+
+    def batch_update(self, data):
+        self._api("batch_update")
+        with self._lock:
+            for item in data:
+                m = _A1_RE.match(item["range"])
+                if not m:
+                    raise FakeAPIError(400, f"Bad range {item['range']}")
+                c0, r0 = _col_to_num(m.group(1)), int(m.group(2))
+                for dr, row in enumerate(item["values"]):
+                    for dc, v in enumerate(row):
+                        self._set(r0 + dr, c0 + dc, v)
+        return {"totalUpdatedCells": sum(len(r) for item in data for r in item["values"])}
+
+    def append_rows(self, values):
+        self._api("append_rows")
+        with self._lock:
+            first = self._used_rows() + 1
+            del self.rows[first - 1:]
+            self.rows.extend([_fmt(v) for v in row] for row in values)
+            last = first + len(values) - 1
+            width = max((len(r) for r in values), default=1)
+        return {"updates": {"updatedRange": f"'{self.title}'!A{first}:{_num_to_col(width)}{last}"}}
+
+    def append_row(self, values):
+        return self.append_rows([values])
@@ -0,0 +1,156 @@
+"""Колоночная история для аналитики: плотная float32-матрица [день × хобби].
+
+Строка — календарный день от start (пропуски — нули), столбец — интернированный
+id хобби. Окно аналитики — один срез матрицы, агрегаты — векторные
+операции numpy: годы истории считаются за миллисекунды и без сети.
+Грузится из зеркала или листа (runtime.get_history), дальше обновляется
+записями приложения (set_value)."""
+
+import datetime as dt
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class History:
+    def __init__(self, start: Optional[dt.date] = None, hobbies: Iterable[str] = (),
+                 matrix: Optional[np.ndarray] = None):
+        self.start = start
+        self.hobbies: List[str] = list(hobbies)
+        self._ids: Dict[str, int] = {h: i for i, h in enumerate(self.hobbies)}
+        self.matrix = matrix if matrix is not None else np.zeros((0, len(self.hobbies)), np.float32)
+
+    @classmethod
+    def from_days(cls, days: Dict[str, Dict[str, float]]) -> "History":
+        """{дата: {хобби: часы}} → матрица одним проходом"""
+        dates = sorted(d for d, v in days.items() if v)
+        if not dates:
+            return cls()
+        start = dt.date.fromisoformat(dates[0])
+        n_days = (dt.date.fromisoformat(dates[-1]) - start).days + 1
+        hobbies = sorted({h for d in dates for h in days[d]})
+        ids = {h: i for i, h in enumerate(hobbies)}
+        rows, cols, vals = [], [], []
+        for d in dates:
+            r = (dt.date.fromisoformat(d) - start).days
+            for h, v in days[d].items():
+                rows.append(r)
+                cols.append(ids[h])
+                vals.append(v)
+        matrix = np.zeros((n_days, len(hobbies)), np.float32)
+        matrix[rows, cols] = vals
+        return cls(start, hobbies, matrix)
+
+    # --- запись ---
+
+    def intern(self, hobby: str) -> int:
+        i = self._ids.get(hobby)
+        if i is None:
+            i = self._ids[hobby] = len(self.hobbies)
+            self.hobbies.append(hobby)
+            self.matrix = np.pad(self.matrix, ((0, 0), (0, 1)))
+        return i
+
+    def _row(self, date: dt.date) -> int:
+        """Индекс строки дня; расширяет матрицу, если день вне диапазона"""
+        if self.start is None:
+            self.start = date
+        r = (date - self.start).days
+        if r < 0:
+            self.matrix = np.pad(self.matrix, ((-r, 0), (0, 0)))
+            self.start, r = date, 0
+        elif r >= len(self.matrix):
+            self.matrix = np.pad(self.matrix, ((0, r - len(self.matrix) + 1), (0, 0)))
+        return r
+
+    def set_value(self, date: str, hobby: str, hours: float) -> None:
+        c = self.intern(hobby)
+        r = self._row(dt.date.fromisoformat(date))   # до обращения к matrix: может её заменить
+        self.matrix[r, c] = hours
+
+    def set_day(self, date: str, values: Dict[str, float]) -> None:
+        """День целиком (сверка с листом): хобби вне values обнуляются"""
+        r = self._row(dt.date.fromisoformat(date))
+        self.matrix[r] = 0
+        for h, v in values.items():
+            c = self.intern(h)
+            self.matrix[r, c] = v
+
+    # --- окна ---
+
+    def window(self, end: str, days: int) -> np.ndarray:
+        """[days × хобби] за days дней по end включительно (дни вне истории — нули)"""
+        out = np.zeros((days, len(self.hobbies)), np.float32)
+        if self.start is None:
+            return out
+        hi = (dt.date.fromisoformat(end) - self.start).days + 1
+        lo = hi - days
+        src = self.matrix[max(lo, 0):max(min(hi, len(self.matrix)), 0)]
+        if len(src):
+            out[max(-lo, 0):max(-lo, 0) + len(src)] = src
+        return out
+
+    def _named(self, vec: np.ndarray) -> Dict[str, float]:
+        return {self.hobbies[i]: float(vec[i]) for i in np.flatnonzero(vec > 0)}
+
+    def totals(self, end: str, days: int) -> Dict[str, float]:
+        """{хобби: часы} за окно (только ненулевые)"""
+        return self._named(self.window(end, days).sum(axis=0, dtype=np.float64))
+
+    def daily_totals(self, end: str, days: int) -> np.ndarray:
+        """Сумма часов по дням окна, от старых к новым"""
+        return self.window(end, days).sum(axis=1, dtype=np.float64)
+
+    def top(self, end: str, days: int, k: int = 3) -> List[Tuple[str, float]]:
+        sums = self.window(end, days).sum(axis=0, dtype=np.float64)
+        order = np.argsort(-sums, kind="stable")[:k]
+        return [(self.hobbies[i], float(sums[i])) for i in order if sums[i] > 0]
+
+    def rolling_mean(self, end: str, days: int, k: int = 7, hobby: Optional[str] = None) -> np.ndarray:
+        """Скользящее среднее за k дней по каждому дню окна (hobby=None — сумма хобби)"""
+        w = self.window(end, days + k - 1)
+        series = w.sum(axis=1, dtype=np.float64) if hobby is None else (
+            w[:, self._ids[hobby]].astype(np.float64) if hobby in self._ids else np.zeros(len(w)))
+        csum = np.concatenate(([0.0], np.cumsum(series)))
+        return (csum[k:] - csum[:-k]) / k
+
+    def weekday_means(self, end: str, days: int, hobby: Optional[str] = None) -> np.ndarray:
+        """Средние часы по дням недели (0 = Пн) за окно"""
+        w = self.window(end, days)
+        series = w.sum(axis=1, dtype=np.float64) if hobby is None else (
+            w[:, self._ids[hobby]].astype(np.float64) if hobby in self._ids else np.zeros(days))
+        first = (dt.date.fromisoformat(end) - dt.timedelta(days=days - 1)).weekday()
+        wd = (np.arange(days) + first) % 7
+        counts = np.bincount(wd, minlength=7)
+        return np.bincount(wd, weights=series, minlength=7) / np.maximum(counts, 1)
+
+    def streak(self, end: str, hobby: Optional[str] = None) -> int:
+        """Дней подряд с активностью, заканчивая end (пустой end не рвёт серию —
+        день ещё идёт)"""
+        if self.start is None:
+            return 0
+        n = (dt.date.fromisoformat(end) - self.start).days + 1
+        w = self.window(end, max(n, 1))
+        active = (w.sum(axis=1) if hobby is None else
+                  (w[:, self._ids[hobby]] if hobby in self._ids else np.zeros(len(w)))) > 0
+        if len(active) and not active[-1]:
+            active = active[:-1]
+        gaps = np.flatnonzero(~active)
+        return int(len(active) - 1 - gaps[-1]) if len(gaps) else int(len(active))
+
+    def trends(self, end: str, days: int) -> Dict[str, float]:
+        """Наклон МНК (часов/день) по каждому активному в окне хобби"""
+        w = self.window(end, days).astype(np.float64)
+        x = np.arange(days, dtype=np.float64) - (days - 1) / 2
+        slopes = x @ (w - w.mean(axis=0)) / max(float(x @ x), 1e-9)
+        active = w.sum(axis=0) > 0
+        return {self.hobbies[i]: float(slopes[i]) for i in np.flatnonzero(active)}
+
+    def half_trend(self, end: str, days: int) -> Dict[str, str]:
+        """Стрелка тренда: вторая половина окна против первой (±10%)"""
+        w = self.window(end, days)
+        half = days // 2 + days % 2
+        first = w[:half].sum(axis=0, dtype=np.float64)
+        second = w[half:].sum(axis=0, dtype=np.float64)
+        arrows = np.where(second > first * 1.1, "📈", np.where(second < first * 0.9, "📉", "➡️"))
+        return {self.hobbies[i]: str(arrows[i]) for i in range(len(self.hobbies))}
@@ -1,91 +1,887 @@
-"""Журнал-буфер записи: append-only jsonl + offset слитых в Sheets строк."""
+"""Журнал-буфер записи: append-only jsonl-сегменты + offset слитых в Sheets строк.
 
+Журнал нарезан на сегменты. Активный (куда идут append'ы) — journal.jsonl;
+дорос до segment_bytes — переименовывается в запечатанный journal.000042.jsonl,
+список запечатанных ведёт манифест journal.manifest.json. Полностью слитые
+сегменты удаляются (или уезжают в архив) независимо от хвоста: одна вечно
+падающая запись больше не держит весь файл.
+
+Во время долгого сбоя Sheets coalesce() переписывает несинканный хвост до
+одной записи на (date, hobby): хвост запечатывается, сливается в один файл
+с тем же номером сегмента (синканный префикс копируется байт-в-байт —
+offset остаётся валидным), переключение — атомарной записью манифеста.
+
+Offset — позиция начала несинканного хвоста {"seg": номер сегмента,
+"pos": байт}; чтение seek'ается сразу к хвосту и трогает только живые
+сегменты. Старые форматы ({"pos": N} и голое число строк) читаются как
+fallback и относятся к активному сегменту.
+
+Кроме основного курсора (Sheets) у журнала бывают именованные курсоры
+дополнительных целей репликации (journal.<имя>.offset, см. cursor()):
+каждая цель читает и подтверждает хвост сама, сегменты удаляются только
+позади самого отстающего курсора, coalesce() пересчитывает их позиции.
+
+Несинканный хвост дополнительно живёт в памяти процесса: строится один раз
+при старте, обновляется append()/advance(). Счётчик очереди и оверлей дня
+отдаются без файлового I/O.
+
+Строка журнала — запись с длиной и CRC32 полезной нагрузки:
+`<crc32 hex> <длина> <json>`. Порча ловится по контрольной сумме, а не только
+по падению json.loads; verify() проходит сегменты через mmap, проверяя CRC
+без декодирования JSON, и умеет отправить битые диапазоны в карантин
+(journal.quarantine.jsonl), затерев их пробелами на месте — offset'ы не
+сдвигаются. Старые строки без заголовка (голый json) читаются как раньше.
+
+Опционально (GroupCommitWriter) append'ы из event loop копятся в коротком
+окне и пишутся одним write+fsync в отдельном потоке; каждый вызывающий
+получает ответ только после fsync своей записи."""
+
+import asyncio
+import bisect
 import json
 import logging
+import mmap
 import os
+import re
+import shutil
+import threading
+import zlib
+from collections import deque
 from datetime import datetime
 
+from ..utils.config import JOURNAL_FILE, JOURNAL_OFFSET_FILE
 from ..utils.dates import get_tz
 
 logger = logging.getLogger(__name__)
 
+SEGMENT_BYTES = 256 * 1024
+
+# Позиция в журнале: (номер сегмента, байт) — сравнивается лексикографически
+Pos = tuple[int, int]
+
+
+def encode_record(entry: dict) -> bytes:
+    payload = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+    return b"%08x %d %s\n" % (zlib.crc32(payload), len(payload), payload)
+
+
+def _payload(line: bytes) -> bytes | None:
+    """Полезная нагрузка строки, если длина и CRC сходятся (None — порча).
+    Старая строка без заголовка отдаётся как есть — проверит json.loads."""
+    line = line.rstrip(b"\r\n")
+    if line.startswith(b"{"):
+        return line
+    try:
+        crc, length, payload = line.split(b" ", 2)
+        if len(payload) != int(length) or zlib.crc32(payload) != int(crc, 16):
+            return None
+    except ValueError:
+        return None
+    return payload
+
+
+def decode_record(line: bytes) -> dict | None:
+    payload = _payload(line)
+    if payload is None:
+        return None
+    try:
+        entry = json.loads(payload)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    if not isinstance(entry, dict) or not {"date", "hobby", "hours"} <= entry.keys():
+        return None
+    return entry
+
+
+def check_record(line: bytes) -> bool:
+    """Проверка без json-декода для новых записей (старые — только через json)"""
+    payload = _payload(line)
+    if payload is None:
+        return False
+    if line.startswith(b"{"):
+        return decode_record(line) is not None
+    return True
+
+
+def _split_lines(data: bytes) -> list[bytes]:
+    """Строки по LF (как mmap-сканер), последняя может быть оборванной"""
+    parts = data.split(b"\n")
+    lines = [p + b"\n" for p in parts[:-1]]
+    if parts[-1]:
+        lines.append(parts[-1])
+    return lines
+
+
+def scan_segment(path: str, start: int = 0) -> tuple[int, list[tuple[int, int]]]:
+    """mmap-проход по сегменту от start без декодирования JSON:
+    (число валидных записей, [(начало, конец) битых диапазонов])"""
+    valid, damaged = 0, []
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= start:
+            return 0, []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = start
+            while pos < size:
+                nl = mm.find(b"\n", pos)
+                end = size if nl == -1 else nl + 1
+                line = mm[pos:end]
+                if line.strip():
+                    if check_record(line):
+                        valid += 1
+                    elif damaged and damaged[-1][1] == pos:
+                        damaged[-1] = (damaged[-1][0], end)   # соседние битые — одним диапазоном
+                    else:
+                        damaged.append((pos, end))
+                pos = end
+    return valid, damaged
+
+
+def _fsync_dir(path: str) -> None:
+    try:
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path: str, text: str) -> None:
+    """temp + fsync + rename: после падения на диске старая или новая версия"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(path)
+
 
 class Journal:
-    def __init__(self, journal_path: str, offset_path: str):
+    def __init__(self, journal_path: str, offset_path: str,
+                 segment_bytes: int = SEGMENT_BYTES, archive_dir: str | None = None,
+                 verify_tail: bool = False, quarantine: bool = False):
+        """verify_tail — mmap-проверка CRC несинканного хвоста до построения
+        индекса (после нечистой остановки); quarantine — битое ещё и в карантин,
+        без него только лог."""
         self.journal_path = journal_path
         self.offset_path = offset_path
+        self.segment_bytes = segment_bytes
+        self.archive_dir = archive_dir
+        self._base = os.path.splitext(journal_path)[0]
+        self.manifest_path = self._base + ".manifest.json"
+        # Уже записанные в Sheets значения несинканного хвоста (частичный слив)
+        self.applied_path = self._base + ".applied.json"
+        # Индекс хвоста: [(конец строки, seq, запись)] + {дата: {хобби: (seq, запись)}}
+        self._tail: deque[tuple[Pos, int, dict]] = deque()
+        self._by_date: dict[str, dict[str, tuple[int, dict]]] = {}
+        self._seq = 0
+        # Файл пишется из потока group-commit: чтение хвоста не должно увидеть
+        # полустроку. Индекс под отдельным локом — читатели не ждут fsync.
+        self._file_lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._active, self._sealed = self._load_manifest()
+        self._cursor = self._read_offset()
+        # Дополнительные цели репликации (SQLite-зеркало): свой курсор у каждой
+        self._cursors: dict[str, Pos] = {}
+        self._gen = 0   # растёт при coalesce(): позиции, прочитанные раньше, недействительны
+        if verify_tail:
+            self.verify(quarantine=quarantine, from_cursor=True)
+        for end, entry in self._parse_tail(self._cursor)[0]:
+            self._index_add(end, entry)
+        self._applied = self._read_applied()
+
+    # --- сегменты и манифест ---
 
-    def _ends_with_newline(self) -> bool:
+    def _sealed_path(self, seg: int, gen: int = 0) -> str:
+        """gen > 0 — поколение сегмента, переписанного coalesce()"""
+        return f"{self._base}.{seg:06d}.c{gen}.jsonl" if gen else f"{self._base}.{seg:06d}.jsonl"
+
+    def _segment_path(self, seg: int) -> str:
+        return self.journal_path if seg == self._active else self._sealed[seg]
+
+    def _scan_segments(self) -> dict[int, str]:
+        """Запечатанные сегменты по листингу каталога (манифеста нет/битый)"""
+        directory = os.path.dirname(self.journal_path) or "."
+        found: dict[int, tuple[int, str]] = {}
         try:
-            with open(self.journal_path, "rb") as f:
-                f.seek(0, os.SEEK_END)
-                if f.tell() == 0:
-                    return True
-                f.seek(-1, os.SEEK_END)
-                return f.read(1) == b"\n"
+            names = os.listdir(directory)
         except FileNotFoundError:
-            return True
+            return {}
+        for name in names:
+            m = self._segment_re().match(name)
+            if m:
+                seg, gen = int(m.group(1)), int(m.group(2) or 0)
+                # Из поколений одного сегмента берём последнее
+                if gen >= found.get(seg, (-1, ""))[0]:
+                    found[seg] = (gen, os.path.join(directory, name))
+        return {seg: path for seg, (_, path) in sorted(found.items())}
 
-    def append(self, date: str, hobby: str, hours: float, source: str) -> None:
-        entry = {
+    def _segment_re(self) -> re.Pattern:
+        return re.compile(re.escape(os.path.basename(self._base)) + r"\.(\d{6})(?:\.c(\d+))?\.jsonl$")
+
+    def _load_manifest(self) -> tuple[int, dict[int, str]]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            active = int(data["active"])
+            sealed = {int(s["seq"]): os.path.join(os.path.dirname(self.journal_path), s["file"])
+                      for s in data["segments"]}
+        except FileNotFoundError:
+            sealed = self._scan_segments()
+            return (max(sealed) + 1 if sealed else 1), sealed
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning("Битый манифест журнала (%s), восстанавливаю по каталогу", e)
+            sealed = self._scan_segments()
+            return (max(sealed) + 1 if sealed else 1), sealed
+        # Падение между записью манифеста и rename при ротации: доделать rename
+        if sealed:
+            last = max(sealed)
+            if not os.path.exists(sealed[last]) and os.path.exists(self.journal_path):
+                os.replace(self.journal_path, sealed[last])
+                _fsync_dir(self.journal_path)
+        for seg in [s for s, p in sealed.items() if not os.path.exists(p)]:
+            logger.warning("Сегмент журнала %s из манифеста не найден", sealed.pop(seg))
+        # Сироты (недоделанные coalesce/удаление слитых) — вне манифеста, их данные
+        # либо уже слиты, либо целиком лежат в переписанном сегменте
+        listed = set(sealed.values())
+        for path in self._scan_all():
+            if path not in listed:
+                logger.warning("Удаляю сироту журнала %s", path)
+                os.remove(path)
+        return active, dict(sorted(sealed.items()))
+
+    def _scan_all(self) -> list[str]:
+        directory = os.path.dirname(self.journal_path) or "."
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        return [os.path.join(directory, n) for n in names if self._segment_re().match(n)]
+
+    def _write_manifest(self) -> None:
+        atomic_write(self.manifest_path, json.dumps({
+            "active": self._active,
+            "segments": [{"seq": s, "file": os.path.basename(p)} for s, p in self._sealed.items()],
+        }))
+
+    def _rotate_if_full(self, force: bool = False) -> None:
+        """Под _file_lock: запечатать активный сегмент, если он дорос до лимита
+        (force — если в нём вообще что-то есть). Сначала манифест, потом
+        rename — падение между ними доделает _load_manifest()."""
+        try:
+            size = os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            return
+        if size == 0 or (size < self.segment_bytes and not force):
+            return
+        self._sealed[self._active] = self._sealed_path(self._active)
+        self._active += 1
+        self._write_manifest()
+        os.replace(self.journal_path, self._sealed[self._active - 1])
+        _fsync_dir(self.journal_path)
+
+    def segments(self) -> list[str]:
+        """Пути живых сегментов по порядку (запечатанные + активный).
+        Копия под _file_lock: coalesce() в потоке меняет _sealed."""
+        with self._file_lock:
+            sealed = list(self._sealed.values())
+        return sealed + [self.journal_path]
+
+    # --- запись ---
+
+    @staticmethod
+    def make_entry(date: str, hobby: str, hours: float, source: str) -> dict:
+        return {
             "ts": datetime.now(tz=get_tz()).isoformat(),
             "date": date,
             "hobby": hobby,
             "hours": hours,
             "source": source,
         }
+
+    def append(self, date: str, hobby: str, hours: float, source: str) -> None:
+        self.append_entries([self.make_entry(date, hobby, hours, source)])
+
+    def append_entries(self, entries: list[dict]) -> None:
+        """Пачка записей одним write + одним fsync"""
+        lines = [encode_record(e) for e in entries]
         os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
-        # Защита от оборванного хвоста: не приклеиваемся к недописанной строке
-        prefix = "" if self._ends_with_newline() else "\n"
-        with open(self.journal_path, "a", encoding="utf-8") as f:
-            f.write(prefix + json.dumps(entry, ensure_ascii=False) + "\n")
-            f.flush()
-            os.fsync(f.fileno())
+        with self._file_lock:
+            self._rotate_if_full()
+            with open(self.journal_path, "a+b") as f:
+                end = f.seek(0, os.SEEK_END)
+                # Защита от оборванного хвоста: не приклеиваемся к недописанной строке
+                if end:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        lines[0] = b"\n" + lines[0]
+                f.write(b"".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+            # Индекс — под тем же файловым локом: advance() не обгонит свежие строки
+            for line, entry in zip(lines, entries):
+                end += len(line)
+                self._index_add((self._active, end), entry)
+
+    def _index_add(self, end: Pos, entry: dict) -> None:
+        with self._index_lock:
+            self._seq += 1
+            self._tail.append((end, self._seq, entry))
+            self._by_date.setdefault(entry["date"], {})[entry["hobby"]] = (self._seq, entry)
+
+    def _index_trim(self, pos: Pos) -> None:
+        """Выкидывает из индекса записи, слитые до позиции pos"""
+        with self._index_lock:
+            while self._tail and self._tail[0][0] <= pos:
+                _, seq, entry = self._tail.popleft()
+                day = self._by_date.get(entry["date"])
+                # Слитая запись старше всех оставшихся: если она победитель пары — пара ушла целиком
+                if day is not None and day.get(entry["hobby"], (None,))[0] == seq:
+                    del day[entry["hobby"]]
+                    if not day:
+                        del self._by_date[entry["date"]]
 
-    def _read_offset(self) -> int:
+    # --- offset ---
+
+    def _lines_to_pos(self, n: int) -> int:
+        """Байтовая позиция после n непустых строк (миграция старого offset)"""
+        pos = 0
         try:
-            with open(self.offset_path, "r", encoding="utf-8") as f:
-                return int(f.read().strip() or 0)
-        except (FileNotFoundError, ValueError):
+            with open(self.journal_path, "rb") as f:
+                for line in f:
+                    if n <= 0:
+                        break
+                    pos += len(line)
+                    if line.strip():
+                        n -= 1
+        except FileNotFoundError:
             return 0
+        return pos
 
-    def _write_offset(self, value: int) -> None:
-        os.makedirs(os.path.dirname(self.offset_path) or ".", exist_ok=True)
-        with open(self.offset_path, "w", encoding="utf-8") as f:
-            f.write(str(value))
-            f.flush()
-            os.fsync(f.fileno())
-
-    def _read_lines(self) -> list[str]:
+    def _read_offset(self) -> Pos:
         try:
-            with open(self.journal_path, "r", encoding="utf-8") as f:
-                return [ln for ln in f.read().splitlines() if ln.strip()]
+            with open(self.offset_path, "r", encoding="utf-8") as f:
+                raw = f.read().strip()
         except FileNotFoundError:
-            return []
+            return (self._first_seg(), 0)
+        if raw.startswith("{"):
+            try:
+                data = json.loads(raw)
+                return (int(data.get("seg", self._active)), int(data["pos"]))
+            except (ValueError, KeyError, TypeError, AttributeError):
+                logger.warning("Битый offset журнала: %r, читаю с начала", raw[:80])
+                return (self._first_seg(), 0)
+        try:
+            lines = int(raw or 0)
+        except ValueError:
+            return (self._first_seg(), 0)
+        # Старый формат: число строк → байты (один полный проход, один раз)
+        pos = (self._active, self._lines_to_pos(lines))
+        self._write_offset(pos)
+        return pos
 
-    def pending_with_raw_count(self) -> tuple[list[dict], int]:
-        """Несинканные записи + число сырых строк (включая битые) для advance()"""
-        raw = self._read_lines()[self._read_offset():]
-        entries = []
-        for line in raw:
+    def _first_seg(self) -> int:
+        return min(self._sealed, default=self._active)
+
+    def _write_offset(self, value: Pos) -> None:
+        atomic_write(self.offset_path, json.dumps({"seg": value[0], "pos": value[1]}))
+
+    def _set_cursor(self, value: Pos) -> None:
+        self._write_offset(value)
+        self._cursor = value
+
+    def _named_offset_path(self, name: str) -> str:
+        return f"{self._base}.{name}.offset"
+
+    def _set_named(self, name: str, value: Pos) -> None:
+        atomic_write(self._named_offset_path(name), json.dumps({"seg": value[0], "pos": value[1]}))
+        self._cursors[name] = value
+
+    def cursor(self, name: str) -> "JournalCursor":
+        """Независимый курсор дополнительной цели репликации. Новый курсор
+        стартует с позиции основного: историю до неё цель берёт из Sheets."""
+        path = self._named_offset_path(name)
+        with self._file_lock:
             try:
-                entries.append(json.loads(line))
-            except json.JSONDecodeError:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.loads(f.read())
+                pos = (int(data["seg"]), int(data["pos"]))
+                if pos[0] not in self._sealed and pos[0] != self._active:
+                    raise ValueError(f"сегмент {pos[0]} уже удалён")
+                self._cursors[name] = pos
+            except FileNotFoundError:
+                self._set_named(name, self._cursor)
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning("Битый курсор %s (%s) — с позиции основного", name, e)
+                self._set_named(name, self._cursor)
+        return JournalCursor(self, name)
+
+    # --- чтение хвоста ---
+
+    def _read_tail(self, start: Pos) -> list[tuple[Pos, bytes]]:
+        """Непустые строки живых сегментов от позиции start:
+        [((сегмент, байт конца строки), строка)]"""
+        out = []
+        with self._file_lock:
+            for seg in [s for s in self._sealed if s >= start[0]] + [self._active]:
+                pos = start[1] if seg == start[0] else 0
+                try:
+                    with open(self._segment_path(seg), "rb") as f:
+                        f.seek(pos)
+                        data = f.read()
+                except FileNotFoundError:
+                    continue
+                for line in _split_lines(data):
+                    pos += len(line)
+                    if line.strip():
+                        out.append(((seg, pos), line))
+        return out
+
+    def _parse_tail(self, start: Pos) -> tuple[list[tuple[Pos, dict]], int]:
+        """[(конец строки, запись)] валидных строк от start + число сырых строк"""
+        raw = self._read_tail(start)
+        parsed = []
+        for end, line in raw:
+            entry = decode_record(line)
+            if entry is None:
                 logger.warning("Пропущена битая строка журнала: %r", line[:80])
-        return entries, len(raw)
+                continue
+            parsed.append((end, entry))
+        return parsed, len(raw)
+
+    def pending_with_raw_count(self) -> tuple[list[dict], int]:
+        """Несинканные записи + число сырых строк (включая битые) для advance().
+        Читает файл (путь воркера), а не индекс — видит и битые строки."""
+        parsed, raw_count = self._parse_tail(self._cursor)
+        return [e for _, e in parsed], raw_count
 
     def pending(self) -> list[dict]:
-        return self.pending_with_raw_count()[0]
+        with self._index_lock:
+            return [e for _, _, e in self._tail]
 
     def pending_count(self) -> int:
-        return len(self.pending())
+        return len(self._tail)
+
+    def oldest_pending(self) -> dict | None:
+        """Старейшая несинканная запись (для метрики лага)"""
+        with self._index_lock:
+            return self._tail[0][2] if self._tail else None
+
+    def disk_bytes(self) -> int:
+        """Суммарный размер живых сегментов на диске"""
+        return sum(os.path.getsize(p) for p in self.segments() if os.path.exists(p))
+
+    def pending_for(self, date: str) -> list[dict]:
+        """Несинканные записи дня, по одной на хобби (последняя побеждает)"""
+        with self._index_lock:
+            return [e for _, e in self._by_date.get(date, {}).values()]
+
+    def _pos_after(self, start: Pos, n: int) -> Pos:
+        """Позиция после n сырых строк от start"""
+        tail = self._read_tail(start)
+        if n > 0 and tail:
+            return tail[min(n, len(tail)) - 1][0]
+        return start
 
     def advance(self, n: int) -> None:
-        self._write_offset(self._read_offset() + n)
+        pos = self._pos_after(self._cursor, n)
+        self._set_cursor(pos)
+        self._index_trim(pos)
+        self._prune_applied()
+
+    # --- частичное подтверждение ---
+
+    def _read_applied(self) -> dict[str, dict[str, float]]:
+        try:
+            with open(self.applied_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return {d: {h: float(v) for h, v in vals.items()} for d, vals in data.items()}
+        except FileNotFoundError:
+            return {}
+        except (ValueError, AttributeError, TypeError):
+            logger.warning("Битый %s — перезапишем хвост целиком", self.applied_path)
+            return {}
+
+    def _write_applied(self) -> None:
+        if self._applied:
+            atomic_write(self.applied_path, json.dumps(self._applied, ensure_ascii=False))
+        elif os.path.exists(self.applied_path):
+            os.remove(self.applied_path)
+
+    def applied(self) -> dict[str, dict[str, float]]:
+        """{дата: {хобби: часы}} — что из хвоста уже лежит в Sheets"""
+        with self._index_lock:
+            return {d: dict(vals) for d, vals in self._applied.items()}
+
+    def mark_applied(self, batch: dict[str, dict[str, float]]) -> None:
+        """Значения дат {дата: {хобби: часы}} записаны в Sheets: повтор слива их не пошлёт"""
+        with self._index_lock:
+            for date, values in batch.items():
+                self._applied.setdefault(date, {}).update({h: float(v) for h, v in values.items()})
+            self._write_applied()
+
+    def _covered(self, entry: dict) -> bool:
+        """Пара (date, hobby) записи уже в Sheets с актуальным (последним) значением"""
+        winner = self._by_date.get(entry["date"], {}).get(entry["hobby"])
+        applied = self._applied.get(entry["date"], {}).get(entry["hobby"])
+        return winner is not None and applied is not None and winner[1]["hours"] == applied
+
+    def advance_applied(self) -> int:
+        """Двигает курсор через префикс хвоста, целиком покрытый applied.
+        Возвращает число пройденных записей (битые строки между ними — тоже)."""
+        n, pos = 0, None
+        with self._index_lock:
+            for end, _, entry in self._tail:
+                if not self._covered(entry):
+                    break
+                n, pos = n + 1, end
+        if pos is not None:
+            self._set_cursor(pos)
+            self._index_trim(pos)
+            self._prune_applied()
+        return n
+
+    def _prune_applied(self) -> None:
+        """Оставляет в applied только пары, ещё висящие в хвосте с тем же значением"""
+        with self._index_lock:
+            if not self._applied:
+                return
+            kept = {}
+            for date, vals in self._applied.items():
+                pending = self._by_date.get(date, {})
+                keep = {h: v for h, v in vals.items() if h in pending and pending[h][1]["hours"] == v}
+                if keep:
+                    kept[date] = keep
+            if kept != self._applied:
+                self._applied = kept
+                self._write_applied()
+
+    # --- компактация ---
+
+    def _drop_segment(self, path: str) -> None:
+        if self.archive_dir:
+            os.makedirs(self.archive_dir, exist_ok=True)
+            shutil.move(path, os.path.join(self.archive_dir, os.path.basename(path)))
+        else:
+            os.remove(path)
+
+    def _next_live(self, pos: Pos) -> Pos:
+        """Курсор в конце запечатанного сегмента → начало следующего живого
+        (после coalesce() номера идут с пропусками)"""
+        seg, off = pos
+        if seg in self._sealed and off >= os.path.getsize(self._sealed[seg]):
+            return (min((s for s in self._sealed if s > seg), default=self._active), 0)
+        return pos
+
+    def _drop_synced_segments(self) -> None:
+        """Удаляет (архивирует) запечатанные сегменты целиком позади всех курсоров.
+        Манифест пишется до удаления файлов: падение оставит лишь сироту."""
+        with self._file_lock:   # coalesce() из потока может переписывать сегменты
+            nxt = self._next_live(self._cursor)
+            if nxt != self._cursor:
+                self._set_cursor(nxt)
+            for name, pos in list(self._cursors.items()):
+                nxt = self._next_live(pos)
+                if nxt != pos:
+                    self._set_named(name, nxt)
+            low = min([self._cursor[0]] + [p[0] for p in self._cursors.values()])
+            done = [s for s in self._sealed if s < low]
+            if not done:
+                return
+            paths = [self._sealed.pop(s) for s in done]
+            self._write_manifest()
+        for path in paths:
+            try:
+                self._drop_segment(path)
+            except OSError as e:
+                logger.warning("Не удалось убрать слитый сегмент %s: %s", path, e)
+        logger.info("Журнал: убрано слитых сегментов: %d", len(paths))
 
     def compact_if_synced(self) -> None:
-        lines = self._read_lines()
-        if lines and self._read_offset() >= len(lines):
+        self._drop_synced_segments()
+        cursors = [self._cursor, *self._cursors.values()]
+        if any(seg != self._active for seg, _ in cursors):
+            return
+        try:
+            size = os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            return
+        if not size or any(self._read_tail(c) for c in cursors):
+            return
+        with self._file_lock:
+            # Повторная проверка под локом: group-commit мог дописать хвост или ротировать
+            if self._cursor[0] != self._active or os.path.getsize(self.journal_path) != size:
+                return
             with open(self.journal_path, "w", encoding="utf-8") as f:
                 f.truncate(0)
-            self._write_offset(0)
+            self._set_cursor((self._active, 0))
+            for name in self._cursors:
+                self._set_named(name, (self._active, 0))
+            # Под тем же локом: иначе append успеет добавить в индекс запись с
+            # позицией <= size в обнулённом файле, и trim её выкинет
+            self._index_trim((self._active, size))
+
+    # --- проверка целостности ---
+
+    def verify(self, quarantine: bool = False, from_cursor: bool = False) -> list[tuple[str, int, int]]:
+        """mmap-проверка CRC живых сегментов (from_cursor — только несинканный
+        хвост). Возвращает [(файл, начало, конец)] битых диапазонов; quarantine —
+        копирует их в карантин и затирает пробелами на месте (offset'ы целы)."""
+        report = []
+        with self._file_lock:
+            for seg in list(self._sealed) + [self._active]:
+                if from_cursor and seg < self._cursor[0]:
+                    continue
+                path = self._segment_path(seg)
+                start = self._cursor[1] if from_cursor and seg == self._cursor[0] else 0
+                try:
+                    _, damaged = scan_segment(path, start)
+                except FileNotFoundError:
+                    continue
+                for a, b in damaged:
+                    logger.warning("Журнал: битый диапазон %s [%d, %d)", path, a, b)
+                    report.append((path, a, b))
+                if quarantine and damaged:
+                    self._quarantine(path, damaged)
+        return report
+
+    def _quarantine(self, path: str, damaged: list[tuple[int, int]]) -> None:
+        with open(self._base + ".quarantine.jsonl", "a", encoding="utf-8") as q, \
+                open(path, "r+b") as f:
+            for a, b in damaged:
+                f.seek(a)
+                raw = f.read(b - a)
+                q.write(json.dumps({
+                    "file": os.path.basename(path), "start": a, "end": b,
+                    "raw": raw.decode("utf-8", "backslashreplace"),
+                }, ensure_ascii=False) + "\n")
+                f.seek(a)
+                f.write(b" " * (b - a - 1) + b"\n")   # пустая строка: читатели её пропускают
+            q.flush()
+            os.fsync(q.fileno())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def superseded_count(self) -> int:
+        """Сколько несинканных записей перекрыто более поздними той же пары"""
+        with self._index_lock:
+            return len(self._tail) - sum(len(d) for d in self._by_date.values())
+
+    def coalesce(self, min_gain: int = 1) -> int:
+        """Переписывает несинканный хвост до одной записи на (date, hobby).
+        Возвращает число выброшенных строк (0 — переписывать нечего).
+
+        Крэш-безопасно: новый файл пишется и fsync'ается рядом, живым его
+        делает одна атомарная запись манифеста; до неё на диске старый хвост,
+        после — новый. Вызывать из того же потока, что и drain/advance
+        (sync-воркер между попытками), — иначе сырые счётчики drain разъедутся."""
+        if self.superseded_count() < min_gain:
+            return 0
+        with self._file_lock:
+            self._rotate_if_full(force=True)   # весь хвост — в запечатанных
+            seg, pos = self._cursor
+            targets = [s for s in self._sealed if s >= seg]
+            if not targets:
+                return 0
+            first = targets[0]
+            prefix = b""
+            latest: dict[tuple[str, str], tuple[int, bytes, dict]] = {}
+            raw_count = 0
+            ends: list[Pos] = []   # конец каждой сырой строки — для пересчёта курсоров целей
+            for s in targets:
+                with open(self._sealed[s], "rb") as f:
+                    data = f.read()
+                start = pos if s == seg else 0
+                if s == first:
+                    prefix = data[:start]
+                off = start
+                for line in _split_lines(data[start:]):
+                    off += len(line)
+                    if not line.strip():
+                        continue
+                    raw_count += 1
+                    ends.append((s, off))
+                    entry = decode_record(line)
+                    if entry is not None:   # битые строки и так пропускаются — не переносим
+                        line = line.rstrip(b"\r\n") + b"\n"   # оборванный хвост сегмента
+                        latest[(entry["date"], entry["hobby"])] = (raw_count, line, entry)
+            if len(latest) == raw_count:
+                return 0
+            kept = sorted(latest.values(), key=lambda x: x[0])   # порядок последних вхождений
+            m = self._segment_re().match(os.path.basename(self._sealed[first]))
+            new_path = self._sealed_path(first, int(m.group(2) or 0) + 1)
+            with open(new_path, "wb") as f:
+                f.write(prefix + b"".join(line for _, line, _ in kept))
+                f.flush()
+                os.fsync(f.fileno())
+            old_paths = [self._sealed[s] for s in targets]
+            # Курсоры целей внутри хвоста: сначала на его начало (префикс одинаков
+            # в обеих версиях — падение здесь даст лишь повтор), после — пересчёт
+            inside = {n: c for n, c in self._cursors.items() if c[0] in targets and c >= (seg, pos)}
+            for name in inside:
+                self._set_named(name, (seg, pos))
+            self._sealed[first] = new_path
+            for s in targets[1:]:
+                del self._sealed[s]
+            self._write_manifest()   # точка переключения
+            self._gen += 1
+            for name, c in inside.items():
+                # Цель видела первые k сырых строк: из оставленных ей известны те же
+                k = bisect.bisect_right(ends, c)
+                self._set_named(name, (first, len(prefix) + sum(
+                    len(line) for idx, line, _ in kept if idx <= k)))
+            for path in old_paths:
+                os.remove(path)
+            # Индекс целиком в переписанном сегменте — пересобрать с новыми позициями.
+            # Собираем рядом и подменяем за один захват: читатели не видят пустой хвост
+            tail: deque[tuple[Pos, int, dict]] = deque()
+            by_date: dict[str, dict[str, tuple[int, dict]]] = {}
+            end, seq = len(prefix), self._seq   # seq растёт только под _file_lock
+            for _, line, entry in kept:
+                end += len(line)
+                seq += 1
+                tail.append(((first, end), seq, entry))
+                by_date.setdefault(entry["date"], {})[entry["hobby"]] = (seq, entry)
+            with self._index_lock:
+                self._tail, self._by_date, self._seq = tail, by_date, seq
+        dropped = raw_count - len(kept)
+        logger.info("Журнал: coalesce %d → %d записей", raw_count, len(kept))
+        return dropped
+
+
+class JournalCursor:
+    """Курсор дополнительной цели (SQLite-зеркало) — тот же интерфейс, что
+    SyncWorker ждёт от Journal. Без частичных подтверждений и coalesce:
+    это забота основной цели, у которой медленная сеть."""
+
+    def __init__(self, journal: Journal, name: str):
+        self.journal = journal
+        self.name = name
+        self._snapshot: tuple[int, Pos, list[Pos]] | None = None
+
+    @property
+    def position(self) -> Pos:
+        return self.journal._cursors[self.name]
+
+    def pending_with_raw_count(self) -> tuple[list[dict], int]:
+        j = self.journal
+        with j._file_lock:
+            gen, start = j._gen, self.position
+        parsed, raw_count = j._parse_tail(start)
+        ends = [end for end, _ in j._read_tail(start)]
+        self._snapshot = (gen, start, ends)
+        return [e for _, e in parsed], raw_count
+
+    def advance(self, n: int) -> None:
+        """Продвинуть на n строк последнего чтения. Если между чтением и
+        подтверждением coalesce() переписал хвост — не двигаем: прочитаем
+        заново и повторим (запись в цель идемпотентна)."""
+        if self._snapshot is None or n <= 0:
+            return
+        gen, start, ends = self._snapshot
+        j = self.journal
+        with j._file_lock:
+            if j._gen == gen and self.position == start and ends:
+                j._set_named(self.name, ends[min(n, len(ends)) - 1])
+        self._snapshot = None
+
+    def pending(self) -> list[dict]:
+        """Ещё не дошедшие до цели записи (без снимка для advance)"""
+        return [e for _, e in self.journal._parse_tail(self.position)[0]]
+
+    def pending_count(self) -> int:
+        return len(self.journal._read_tail(self.position))
+
+    def compact_if_synced(self) -> None:
+        self.journal.compact_if_synced()
+
+    def applied(self) -> dict[str, dict[str, float]]:
+        return {}
+
+    def mark_applied(self, batch: dict[str, dict[str, float]]) -> None:
+        pass
+
+    def advance_applied(self) -> int:
+        return 0
+
+    def coalesce(self, min_gain: int = 1) -> int:
+        return 0
+
+
+class GroupCommitWriter:
+    """Групповой коммит журнала: append'ы, пришедшие за window_ms, уходят
+    одним write+fsync в потоке. append() возвращается только после fsync —
+    гарантия «ни одна запись не теряется» та же, что у Journal.append()."""
+
+    def __init__(self, journal: Journal, window_ms: int = 5, max_batch: int = 256):
+        self.journal = journal
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def append(self, date: str, hobby: str, hours: float, source: str) -> None:
+        if self._task is None:
+            self.start()
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((Journal.make_entry(date, hobby, hours, source), fut))
+        await fut
+
+    async def _run(self) -> None:
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            await asyncio.sleep(self.window)  # окно: собрать соседние тапы
+            stop = False
+            while len(batch) < self.max_batch and not self._queue.empty():
+                nxt = self._queue.get_nowait()
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+            await self._commit(batch)
+            if stop:
+                return
+
+    async def _commit(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        try:
+            await asyncio.to_thread(self.journal.append_entries, [e for e, _ in batch])
+        except Exception as e:
+            logger.error("Group-commit журнала не удался (%d записей): %s", len(batch), e)
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for _, fut in batch:
+            if not fut.done():
+                fut.set_result(None)
+
+    async def stop(self) -> None:
+        """Дописывает всё, что уже в очереди, и гасит задачу"""
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+
+
+if __name__ == "__main__":
+    # python -m src.data.journal [--quarantine] — проверка журнала после нечистой остановки
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    damaged = Journal(JOURNAL_FILE, JOURNAL_OFFSET_FILE).verify(quarantine="--quarantine" in sys.argv)
+    print(f"Битых диапазонов: {len(damaged)}")
+    sys.exit(1 if damaged else 0)
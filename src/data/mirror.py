@@ -0,0 +1,153 @@
+"""Локальное SQLite-зеркало истории (WAL) — вторая цель репликации журнала.
+
+Зеркало держит всю историю {дата: {хобби: часы}} и наполняется тем же
+журналом, что и Sheets, но своим курсором и своим воркером: медленный или
+лежащий Sheets зеркало не задерживает. Пустое зеркало один раз заливается
+снимком листа (bootstrap), дальше живёт журналом; ручные правки в таблице
+подтягивает периодический refresh (runtime.refresh_mirror) через replace_days().
+Sheets остаётся переносимым источником истины."""
+
+import logging
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS days (
+    date  TEXT NOT NULL,
+    hobby TEXT NOT NULL,
+    hours REAL NOT NULL,
+    PRIMARY KEY (date, hobby)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SQLiteMirror:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Одно соединение на процесс: вызовы идут из потоков to_thread — под локом
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")   # durability — у журнала
+            self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # --- запись ---
+
+    def write_days(self, batch: Dict[str, Dict[str, float]]) -> None:
+        """Upsert всего слива одной транзакцией (та же сигнатура, что у SheetsManager)"""
+        rows = [(d, h, float(v)) for d, values in batch.items() for h, v in values.items()]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO days(date, hobby, hours) VALUES (?, ?, ?) "
+                    "ON CONFLICT(date, hobby) DO UPDATE SET hours = excluded.hours", rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def write_values(self, values: Dict[str, float], target_date: str) -> None:
+        self.write_days({target_date: values})
+
+    def is_bootstrapped(self) -> bool:
+        return self.get_meta("bootstrapped") is not None
+
+    def bootstrap(self, days: Dict[str, Dict[str, float]]) -> None:
+        """Первичная заливка снимком листа. Не затирает уже записанное журналом:
+        курсор зеркала стартует раньше снимка, его записи новее."""
+        rows = [(d, h, float(v)) for d, values in days.items() for h, v in values.items()]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO days(date, hobby, hours) VALUES (?, ?, ?)", rows)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta(key, value) VALUES ('bootstrapped', datetime('now'))")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        logger.info("Зеркало: залито %d дней из Sheets", len(days))
+
+    def replace_days(self, days: Dict[str, Dict[str, float]],
+                     skip: Optional[Callable[[str], bool]] = None) -> List[str]:
+        """Даты целиком заменяются значениями из Sheets (пустой dict — дата
+        удалена). skip(date) проверяется под локом зеркала — даты с
+        несинканными записями журнала не трогаем. Возвращает изменённые даты."""
+        changed = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for date, values in days.items():
+                    if skip is not None and skip(date):
+                        continue
+                    have = {h: v for h, v in self._conn.execute(
+                        "SELECT hobby, hours FROM days WHERE date = ?", (date,))}
+                    want = {h: float(v) for h, v in values.items()}
+                    if have == want:
+                        continue
+                    self._conn.execute("DELETE FROM days WHERE date = ?", (date,))
+                    self._conn.executemany(
+                        "INSERT INTO days(date, hobby, hours) VALUES (?, ?, ?)",
+                        [(date, h, v) for h, v in want.items()])
+                    changed.append(date)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return changed
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)", (key, value))
+
+    # --- чтение ---
+
+    def get_days(self, dates: Iterable[str]) -> Dict[str, Dict[str, float]]:
+        """{дата: {хобби: часы}} для каждой запрошенной даты (пустой dict — нет данных)"""
+        dates = list(dates)
+        out: Dict[str, Dict[str, float]] = {d: {} for d in dates}
+        if not dates:
+            return out
+        marks = ",".join("?" * len(dates))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT date, hobby, hours FROM days WHERE date IN ({marks})", dates).fetchall()
+        for d, h, v in rows:
+            out[d][h] = v
+        return out
+
+    def get_range(self, start: str, end: str) -> Dict[str, Dict[str, float]]:
+        """Все дни с данными в [start, end] (ISO-даты сравниваются как строки)"""
+        out: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT date, hobby, hours FROM days WHERE date BETWEEN ? AND ? ORDER BY date",
+                (start, end)).fetchall()
+        for d, h, v in rows:
+            out.setdefault(d, {})[h] = v
+        return out
+
+    def dates(self) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT DISTINCT date FROM days ORDER BY date")]
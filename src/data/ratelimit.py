@@ -0,0 +1,245 @@
+"""Квота Google Sheets: token bucket с приоритетами + разбор 429/Retry-After.
+
+Все вызовы API листа идут через один лимитер. Очередь ожидания упорядочена
+по приоритету: запись синка > интерактивное чтение > фоновая сверка —
+пачка просмотров статистики не съедает минутную квоту раньше синка.
+Вызовы выполняются в потоках (asyncio.to_thread), поэтому лимитер
+потокобезопасный и блокирующий."""
+
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from enum import IntEnum
+
+from ..utils.metrics import SHEETS_CALLS, SHEETS_SECONDS
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# Неидемпотентные вызовы (append): 5xx мог прийти после того, как строка уже
+# легла, — повтор её задвоит. 429 отбивается до выполнения — его повторять можно.
+THROTTLED_STATUS = {429}
+
+
+class Priority(IntEnum):
+    SYNC = 0          # слив журнала
+    INTERACTIVE = 1   # чтение по запросу пользователя
+    BACKGROUND = 2    # сверка, префетч
+
+
+_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar(
+    "sheets_priority", default=Priority.INTERACTIVE)
+
+
+@contextlib.contextmanager
+def sheets_priority(p: Priority):
+    """Приоритет вызовов Sheets внутри блока (contextvar — живёт и в to_thread)"""
+    token = _priority.set(p)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def _status(exc: Exception) -> int | None:
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is None:
+        status = getattr(exc, "code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after(exc: Exception) -> float | None:
+    """Секунды из заголовка Retry-After ответа (None — нет/нечитаемый)"""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return max(0.0, float(headers.get("Retry-After")))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    def __init__(self, per_minute: int = 60, burst: int = 10, max_retries: int = 3,
+                 base_backoff: float = 1.0, max_backoff: float = 60.0):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+        self._waiters: list[tuple[int, int]] = []
+        self._ticket = itertools.count()
+        self.counters = {
+            "calls": 0, "throttled": 0, "throttle_wait_seconds": 0.0,
+            "http_429": 0, "retries": 0, "failures": 0,
+        }
+
+    def _refill(self, now: float) -> None:
+        if now > self._updated:   # во время паузы 429 токены не копятся
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def acquire(self, priority: Priority | None = None) -> None:
+        """Блокирует, пока не подойдёт очередь (по приоритету) и не найдётся токен"""
+        p = _priority.get() if priority is None else priority
+        start = time.monotonic()
+        with self._cond:
+            ticket = (int(p), next(self._ticket))
+            heapq.heappush(self._waiters, ticket)
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                head = self._waiters[0] == ticket
+                if head and now >= self._paused_until and self._tokens >= 1:
+                    heapq.heappop(self._waiters)
+                    self._tokens -= 1
+                    self._cond.notify_all()
+                    break
+                if head:
+                    timeout = max(self._paused_until - now, (1 - self._tokens) / self.rate, 0.001)
+                else:
+                    timeout = 1.0   # разбудит notify_all головы очереди
+                self._cond.wait(timeout)
+            waited = time.monotonic() - start
+            self.counters["calls"] += 1
+            if waited > 0.001:
+                self.counters["throttled"] += 1
+                self.counters["throttle_wait_seconds"] += waited
+
+    def pause(self, seconds: float) -> None:
+        """Квота выбрана (429): никто не ходит в API ближайшие seconds"""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self._updated = self._paused_until
+            self._cond.notify_all()
+
+    def backoff(self, attempt: int) -> float:
+        """Экспоненциальная пауза с полным джиттером"""
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+
+    def _retry_delay(self, e: Exception, attempt: int,
+                     retry_status: set[int] = RETRYABLE_STATUS) -> float | None:
+        """Пауза перед повтором (None — не повторять: бросаем). 429 ставит
+        общую паузу лимитера — ждать её будет следующий acquire()."""
+        status = _status(e)
+        if status not in retry_status or attempt >= self.max_retries:
+            with self._cond:
+                self.counters["failures"] += 1
+            return None
+        delay = self.backoff(attempt)
+        if status == 429:
+            ra = retry_after(e)
+            delay = max(delay, ra if ra is not None else self.base_backoff * 2 ** attempt)
+            self.pause(delay)
+        with self._cond:
+            self.counters["retries"] += 1
+            if status == 429:
+                self.counters["http_429"] += 1
+        logger.warning("Sheets ответил %s, повтор через %.1fс", status, delay)
+        return 0.0 if status == 429 else delay
+
+    def call(self, fn, *args, retry_status: set[int] = RETRYABLE_STATUS, **kwargs):
+        """fn(*args) под лимитером; 429/5xx — повтор с джиттером (Retry-After уважается).
+        retry_status — какие ответы повторять (THROTTLED_STATUS — только 429)."""
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, retry_status)
+                if delay is None:
+                    raise
+                if delay:
+                    time.sleep(delay)
+                attempt += 1
+
+    async def acquire_async(self, priority: Priority | None = None) -> None:
+        """acquire() для корутин: ждёт в event loop, не занимая поток.
+        Пропускает вперёд потоки с более высоким приоритетом в очереди."""
+        p = _priority.get() if priority is None else priority
+        start = time.monotonic()
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                self._refill(now)
+                blocked = bool(self._waiters) and self._waiters[0][0] < int(p)
+                if not blocked and now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    waited = now - start
+                    self.counters["calls"] += 1
+                    if waited > 0.001:
+                        self.counters["throttled"] += 1
+                        self.counters["throttle_wait_seconds"] += waited
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate, 0.005)
+            await asyncio.sleep(wait)
+
+    async def call_async(self, fn, *args, **kwargs):
+        """call() для корутин: await fn(*args) с той же политикой повторов"""
+        attempt = 0
+        while True:
+            await self.acquire_async()
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                if delay:
+                    await asyncio.sleep(delay)
+                attempt += 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            self._refill(time.monotonic())
+            return {**self.counters, "tokens": round(self._tokens, 2),
+                    "waiting": len(self._waiters),
+                    "paused_seconds": max(0.0, self._paused_until - time.monotonic())}
+
+
+class LimitedWorksheet:
+    """Прокси листа: каждый метод API — через RateLimiter, остальное как есть.
+    Каждая попытка вызова (включая повторы) — в метрики латентности по методу."""
+
+    API_METHODS = {
+        "row_values", "col_values", "get_all_values", "get", "batch_get",
+        "update", "batch_update", "append_row", "append_rows",
+    }
+    NON_IDEMPOTENT = {"append_row", "append_rows"}
+
+    def __init__(self, ws, limiter: RateLimiter):
+        self._ws = ws
+        self._limiter = limiter
+
+    def __getattr__(self, name):
+        attr = getattr(self._ws, name)
+        if name not in self.API_METHODS:
+            return attr
+
+        def timed(*args, **kwargs):
+            start = time.monotonic()
+            outcome = "error"
+            try:
+                result = attr(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                SHEETS_SECONDS.observe(time.monotonic() - start, method=name)
+                SHEETS_CALLS.inc(method=name, outcome=outcome)
+
+        retry_status = THROTTLED_STATUS if name in self.NON_IDEMPOTENT else RETRYABLE_STATUS
+
+        def limited(*args, **kwargs):
+            return self._limiter.call(timed, *args, retry_status=retry_status, **kwargs)
+        return limited
@@ -1,9 +1,66 @@
+import hashlib
+import itertools
+import logging
+import re
+import threading
+
 import gspread
 from google.oauth2.service_account import Credentials
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Protocol, Tuple
 
-from ..utils.config import SERVICE_ACCOUNT_FILE, SCOPES, SPREADSHEET_ID, SHEET_NAME
+from ..utils.config import (
+    SERVICE_ACCOUNT_FILE, SCOPES, SHEETS_BACKEND, SHEETS_BURST, SHEETS_RPM, SPREADSHEET_ID,
+    SHEET_NAME,
+)
 from .files import norm_hobby
+from .ratelimit import LimitedWorksheet, Priority, RateLimiter, sheets_priority
+
+logger = logging.getLogger(__name__)
+
+
+_UPDATED_ROW_RE = re.compile(r"![A-Z]+(\d+)")
+
+
+def appended_first_row(response: dict) -> Optional[int]:
+    """Номер первой строки, куда легли append_rows (из updates.updatedRange)"""
+    m = _UPDATED_ROW_RE.search(response.get("updates", {}).get("updatedRange", "") if response else "")
+    return int(m.group(1)) if m else None
+
+
+def parse_rows(all_values: list[list[str]], dates: list[str]
+               ) -> tuple[list[str], dict[str, list[tuple[int, float]]]]:
+    """Компактный разбор get_all_values(): (нормализованные ключи колонок,
+    {дата: [(колонка, часы), ...]}) — только непустые числовые ячейки,
+    без словаря на день. Pure, без сети.
+
+    Заголовки нормализуются один раз на лист, не на каждую ячейку. Строки
+    ищутся с конца (окна обычно свежие) до первого вхождения каждой даты —
+    это и «последняя строка даты побеждает» — и скан останавливается, как
+    только нашлись все. Отсортированность колонки A не предполагается:
+    строки задним числом дописываются в конец листа."""
+    found: dict[str, list[tuple[int, float]]] = {}
+    if not all_values:
+        return [], found
+    keys = [norm_hobby(h) for h in all_values[0]]
+    cols = range(1, len(keys))
+    wanted = set(dates)
+    for row in itertools.islice(reversed(all_values), len(all_values) - 1):   # без строки заголовков
+        if not row or row[0] not in wanted or row[0] in found:
+            continue
+        cells = []
+        for j, cell in zip(cols, itertools.islice(row, 1, None)):
+            if not cell:
+                continue   # пустые ячейки — большинство; до float не доходят
+            if "," in cell:
+                cell = cell.replace(",", ".")
+            try:
+                cells.append((j, float(cell)))
+            except ValueError:
+                continue   # текст, пробелы
+        found[row[0]] = cells
+        if len(found) == len(wanted):
+            break
+    return keys, found
 
 
 def parse_days(all_values: list[list[str]], dates: list[str]) -> dict[str, dict[str, float]]:
@@ -12,30 +69,70 @@ def parse_days(all_values: list[list[str]], dates: list[str]) -> dict[str, dict[
     Ключи хобби НОРМАЛИЗУЮТСЯ (norm_hobby): заголовок колонки в таблице может
     отличаться регистром («книги RU»), а весь остальной код живёт в
     нормализованном ключевом пространстве — иначе кэш ловит дубли."""
+    keys, found = parse_rows(all_values, dates)
     result: dict[str, dict[str, float]] = {d: {} for d in dates}
-    if not all_values:
-        return result
-    headers = all_values[0]
-    wanted = set(dates)
-    for row in all_values[1:]:
-        if not row or row[0] not in wanted:
-            continue
-        day: dict[str, float] = {}
-        for j, header in enumerate(headers[1:], start=1):
-            if j < len(row) and row[j].strip():
-                try:
-                    day[norm_hobby(header)] = float(row[j].replace(",", "."))
-                except ValueError:
-                    continue
-        result[row[0]] = day
+    for date, cells in found.items():
+        result[date] = {keys[j]: v for j, v in cells}
     return result
 
 
+def row_hash(headers: list[str], row: list[str]) -> str:
+    """Отпечаток строки листа вместе с заголовками (переименованная колонка
+    меняет смысл тех же ячеек). Хвостовые пустые ячейки не различаются."""
+    cells = list(row)
+    while cells and not cells[-1]:
+        cells.pop()
+    raw = "\x1f".join(headers) + "\x1e" + "\x1f".join(cells)
+    return hashlib.blake2b(raw.encode(), digest_size=8).hexdigest()
+
+
+def row_ranges(rows: list[int], width: int) -> list[str]:
+    """Отсортированные номера строк → A1-диапазоны подряд идущих строк
+    (окно 7/30 дней — обычно один диапазон)"""
+    last_col = gspread.utils.rowcol_to_a1(1, max(width, 1)).rstrip("0123456789")
+    out, start = [], rows[0]
+    for prev, cur in zip(rows, rows[1:] + [None]):
+        if cur != prev + 1:
+            out.append(f"A{start}:{last_col}{prev}")
+            start = cur
+    return out
+
+
+class Worksheet(Protocol):
+    """Бэкенд хранилища: подмножество gspread.Worksheet, которым пользуется
+    SheetsManager. Реализации — gspread (прод) и fake_sheets.FakeWorksheet."""
+
+    title: str
+
+    def get_all_values(self) -> List[List[str]]: ...
+    def row_values(self, row: int) -> List[str]: ...
+    def col_values(self, col: int) -> List[str]: ...
+    def batch_get(self, ranges: List[str]) -> List[List[List[str]]]: ...
+    def update(self, values: Any, range_name: str) -> Any: ...
+    def batch_update(self, data: List[Dict[str, Any]]) -> Any: ...
+    def append_rows(self, values: List[List[Any]]) -> Dict[str, Any]: ...
+
+
 class SheetsManager:
-    def __init__(self):
-        self.creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-        self.gc = gspread.authorize(self.creds)
-        self.ws = self._open_or_create_sheet()
+    """Обёртка над листом. Держит кэш раскладки: нормализованный заголовок →
+    колонка и дата → строка. Свои добавления колонок/строк обновляют кэш
+    локально; несовпадение (строка легла не туда, в строке не та дата,
+    ошибка записи) или сверка — сбрасывают. Перед записью кэш сверяется с листом,
+    поэтому обычная запись — два вызова: batch_get (row 1 + ячейки A) и
+    batch_update. Сознательный размен: лишний вызов на слив дешевле значения,
+    записанного в чужую колонку или строку после ручной правки таблицы."""
+
+    def __init__(self, ws: Optional[Worksheet] = None, limiter: Optional[RateLimiter] = None):
+        """ws — готовый лист (FakeWorksheet, тесты); по умолчанию gspread по кредам сервис-аккаунта.
+        limiter — все вызовы API листа идут через него (квота, 429)."""
+        if ws is None:
+            self.creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+            self.gc = gspread.authorize(self.creds)
+            ws = self._open_or_create_sheet()
+        self.limiter = limiter
+        self.ws = LimitedWorksheet(ws, limiter) if limiter is not None else ws
+        self._layout = {"headers": None, "rows": None, "n_rows": 0}
+        self._layout_lock = threading.RLock()
 
     def _open_or_create_sheet(self):
         """Открывает или создает лист в Google Sheets"""
@@ -47,42 +144,123 @@ class SheetsManager:
             ws.update(["Дата"], "A1")
         return ws
 
+    # --- кэш раскладки ---
+
+    def invalidate_layout(self) -> None:
+        """Забыть раскладку — следующий вызов перечитает row 1 / колонку A"""
+        with self._layout_lock:
+            self._layout.update(headers=None, rows=None, n_rows=0)
+
+    def _set_headers(self, headers: List[str]) -> None:
+        self._layout["headers"] = list(headers)
+
+    def _set_col_a(self, col_a: List[str]) -> None:
+        rows: Dict[str, int] = {}
+        for i, d in enumerate(col_a, start=1):
+            rows.setdefault(d, i)
+        self._layout.update(rows=rows, n_rows=len(col_a))
+
+    def cached_layout(self) -> Tuple[Optional[List[str]], Optional[Dict[str, int]]]:
+        """(заголовки, {дата: строка}) из кэша; None — эта часть не загружена"""
+        with self._layout_lock:
+            headers, rows = self._layout["headers"], self._layout["rows"]
+            return (list(headers) if headers is not None else None), rows
+
+    def set_layout(self, headers: List[str], col_a: List[str]) -> Tuple[List[str], Dict[str, int]]:
+        """Раскладка из row 1 и колонки A, прочитанных в обход ws (async-клиент)"""
+        with self._layout_lock:
+            self._set_headers(headers)
+            self._set_col_a(col_a)
+            return list(self._layout["headers"]), self._layout["rows"]
+
+    def learn_layout(self, all_values: List[List[str]]) -> None:
+        """Раскладка из уже скачанного get_all_values() — без лишних запросов"""
+        with self._layout_lock:
+            if all_values:
+                self._set_headers(all_values[0])
+            self._set_col_a([row[0] if row else "" for row in all_values])
+
     def load_headers(self) -> List[str]:
-        """Загружает заголовки из первой строки"""
+        """Заголовки первой строки (из кэша; API — только при пустом кэше).
+        Лок раскладки — только на подмену: его берёт и event loop (async-чтения),
+        а вызов API под лимитером может ждать Retry-After."""
+        with self._layout_lock:
+            cached = self._layout["headers"]
+        if cached is not None:
+            return list(cached)
         headers = self.ws.row_values(1)
         if not headers:
             self.ws.update(["Дата"], "A1")
             headers = ["Дата"]
-        return headers
+        with self._layout_lock:
+            self._set_headers(headers)
+        return list(headers)
+
+    def _date_rows(self) -> Dict[str, int]:
+        with self._layout_lock:
+            rows = self._layout["rows"]
+        if rows is not None:
+            return rows
+        col_a = self.ws.col_values(1)   # без лока — см. load_headers
+        with self._layout_lock:
+            self._set_col_a(col_a)
+            return self._layout["rows"]
 
     def ensure_columns(self, hobby_names: List[str]) -> List[str]:
         """Гарантирует наличие столбцов под каждое хобби"""
         headers = self.load_headers()
+        known = {norm_hobby(h) for h in headers}
+        if all(norm_hobby(raw) in known for raw in hobby_names):
+            return headers
+        # Добавлять колонки по кэшу нельзя: затрём ручную колонку — перечитываем
+        with self._layout_lock:
+            self._layout["headers"] = None
+        headers = self.load_headers()
         header_norm_map = {norm_hobby(h): h for h in headers}
         to_add = []
         
         for raw in hobby_names:
             n = norm_hobby(raw)
             if n not in header_norm_map:
+                header_norm_map[n] = raw.strip()  # одна колонка на хобби, даже если оно во многих датах
                 to_add.append(raw.strip())
         
         if to_add:
             new_headers = headers + to_add
             self.ws.update([new_headers], f"A1:{gspread.utils.rowcol_to_a1(1, len(new_headers))}")
+            with self._layout_lock:
+                self._set_headers(new_headers)
             return new_headers
         return headers
 
     def find_today_row_idx(self, target_date: str) -> Optional[int]:
         """Ищет индекс строки (1-based) по дате в колонке A"""
-        dates = self.ws.col_values(1)
-        for i, d in enumerate(dates, start=1):
-            if d == target_date:
-                return i
-        return None
+        return self._date_rows().get(target_date)
 
     def create_today_row(self, target_date: str) -> None:
         """Добавляет пустую строку с датой в A"""
-        self.ws.append_row([target_date])
+        self._append_date_rows([target_date])
+
+    def _append_date_rows(self, dates: List[str]) -> Dict[str, int]:
+        """Дописывает строки дат одним append_rows, возвращает {дата: строка}"""
+        expected = self._layout["n_rows"] + 1 if self._layout["rows"] is not None else None
+        resp = self.ws.append_rows([[d] for d in dates])
+        first = appended_first_row(resp) or expected
+        if first is None:
+            self.invalidate_layout()
+            rows = self._date_rows()
+            return {d: rows[d] for d in dates if d in rows}
+        with self._layout_lock:
+            layout = self._layout
+            if expected is None or first != expected:
+                # Строка легла не туда, где ждали: в таблице правили руками
+                logger.info("Раскладка листа разошлась (ждали строку %s, легла %s) — сброс", expected, first)
+                layout.update(rows=None, n_rows=0)
+            else:
+                for i, d in enumerate(dates):
+                    layout["rows"].setdefault(d, first + i)
+                layout["n_rows"] = first + len(dates) - 1
+        return {d: first + i for i, d in enumerate(dates)}
 
     def write_values(self, values: Dict[str, int], target_date: str) -> Tuple[List[str], int]:
         """
@@ -90,50 +268,112 @@ class SheetsManager:
         values: {hobby: stars}
         Возвращает: (финальные заголовки, индекс строки)
         """
-        hobby_list = list(values.keys())
-        headers = self.ensure_columns(hobby_list)
-        row_idx = self.find_today_row_idx(target_date)
-        
-        if row_idx is None:
-            self.create_today_row(target_date)
-            row_idx = len(self.ws.get_all_values())
+        headers, rows = self.write_days({target_date: values})
+        return headers, rows[target_date]
+
+    def write_days(self, batch: Dict[str, Dict[str, float]]) -> Tuple[List[str], Dict[str, int]]:
+        """
+        Записывает несколько дат за постоянное число запросов к API:
+        раскладка берётся из кэша (при пустом — row 1 и колонка A один раз)
+        и перед записью сверяется с листом одним batch_get (row 1 + ячейки A
+        целевых строк; разошлась — перечитывается), все недостающие строки
+        дат — одним append_rows, все ячейки — одним batch_update. Ошибка
+        записи сбрасывает кэш раскладки.
+        batch: {дата: {hobby: hours}}
+        Возвращает: (финальные заголовки, {дата: индекс строки})
+        """
+        with sheets_priority(Priority.SYNC):   # запись синка — первая в очереди квоты
+            return self._write_days(batch)
+
+    def _layout_matches(self, headers: List[str], rows: Dict[str, int]) -> bool:
+        """Одним batch_get: row 1 и ячейки A целевых строк совпадают с раскладкой.
+        Ловит ручную вставку колонки (значение ушло бы в чужую) и удаление строк."""
+        ranges = row_ranges(sorted(set(rows.values())), 1) if rows else []
+        fetched = self.ws.batch_get(["1:1"] + ranges)
+        head = list(fetched[0][0]) if fetched and fetched[0] else []
+        while head and not head[-1]:
+            head.pop()
+        if head != headers:
+            return False
+        cells: Dict[int, str] = {}
+        for rng, block in zip(ranges, fetched[1:]):
+            first = int(rng.split(":")[0][1:])
+            for i, r in enumerate(block):
+                cells[first + i] = r[0] if r else ""
+        return all(cells.get(row, "") == d for d, row in rows.items())
+
+    def _write_days(self, batch: Dict[str, Dict[str, float]]) -> Tuple[List[str], Dict[str, int]]:
+        try:
+            hobby_list = [h for values in batch.values() for h in values]
+            for _ in range(2):
+                # Раскладку, только что прочитанную из листа, проверять незачем
+                with self._layout_lock:
+                    cached = self._layout["headers"] is not None or self._layout["rows"] is not None
+                headers = self.ensure_columns(hobby_list)
+                known = self._date_rows()
+                rows = {d: known[d] for d in batch if d in known}
+                missing = [d for d in batch if d not in rows]
+                if missing:
+                    rows.update(self._append_date_rows(missing))
+                if not cached or self._layout_matches(headers, rows):
+                    break
+                logger.info("Раскладка листа разошлась с кэшем перед записью — перечитываю")
+                self.invalidate_layout()
+
+            # Карта: нормализованное название -> индекс столбца
+            header_norm_to_col = {norm_hobby(h): i+1 for i, h in enumerate(headers)}
+
+            updates = []
+            for date, values in batch.items():
+                for hobby, stars in values.items():
+                    col = header_norm_to_col[norm_hobby(hobby)]
+                    a1 = gspread.utils.rowcol_to_a1(rows[date], col)
+                    updates.append({"range": a1, "values": [[stars]]})
+
+            if updates:
+                self.ws.batch_update(updates)
+        except Exception:
+            self.invalidate_layout()
+            raise
+        return headers, rows
+
+    def _row_for(self, target_date: str) -> Optional[List[str]]:
+        """Строка даты через кэш раскладки: один row_values. В строке не та
+        дата — раскладка устарела: сброс и одна повторная попытка."""
+        for _ in range(2):
+            row_idx = self.find_today_row_idx(target_date)
+            if row_idx is None:
+                return None
+            row_values = self.ws.row_values(row_idx)
+            if row_values and row_values[0] == target_date:
+                return row_values
+            self.invalidate_layout()
+        return None
 
-        # Карта: нормализованное название -> индекс столбца
-        header_norm_to_col = {norm_hobby(h): i+1 for i, h in enumerate(headers)}
+    def get_day_data_strict(self, target_date: str) -> Dict[str, float]:
+        """Данные за день (все хобби листа, пустые — 0.0); БРОСАЕТ при сбое API"""
+        row_values = self._row_for(target_date)
+        if row_values is None:
+            return {}
+        headers = self.load_headers()
+        data = {}
 
-        updates = []
-        for hobby, stars in values.items():
-            col = header_norm_to_col[norm_hobby(hobby)]
-            a1 = gspread.utils.rowcol_to_a1(row_idx, col)
-            updates.append({"range": a1, "values": [[stars]]})
+        # Ключи нормализуем (см. parse_days) — единое ключевое пространство
+        for j, header in enumerate(headers[1:], start=1):  # Пропускаем колонку даты
+            if j < len(row_values) and row_values[j]:
+                try:
+                    data[norm_hobby(header)] = float(row_values[j].replace(',', '.'))
+                except ValueError:
+                    data[norm_hobby(header)] = 0.0
+            else:
+                data[norm_hobby(header)] = 0.0
 
-        if updates:
-            self.ws.batch_update(updates)
-        return headers, row_idx
+        return data
 
     def get_day_data(self, target_date: str) -> Dict[str, float]:
         """Получает данные за указанный день"""
         try:
-            dates = self.ws.col_values(1)
-            headers = self.ws.row_values(1)
-            
-            for i, date_str in enumerate(dates, start=1):
-                if date_str == target_date:
-                    row_values = self.ws.row_values(i)
-                    data = {}
-
-                    # Ключи нормализуем (см. parse_days) — единое ключевое пространство
-                    for j, header in enumerate(headers[1:], start=1):  # Пропускаем колонку даты
-                        if j < len(row_values) and row_values[j]:
-                            try:
-                                data[norm_hobby(header)] = float(row_values[j].replace(',', '.'))
-                            except ValueError:
-                                data[norm_hobby(header)] = 0.0
-                        else:
-                            data[norm_hobby(header)] = 0.0
-
-                    return data
-            return {}
+            return self.get_day_data_strict(target_date)
         except Exception:
             return {}
 
@@ -142,21 +382,114 @@ class SheetsManager:
         data = self.get_day_data(target_date)
         return sum(data.values())
 
+    def get_days_strict(self, dates: list[str], fresh: bool = False) -> dict[str, dict[str, float]]:
+        """Данные за несколько дат; БРОСАЕТ при сбое API. Строки дат — из кэша
+        раскладки (при пустом — одна колонка A), значения — одним batch_get
+        только по нужным строкам: объём не растёт с историей листа.
+        fresh — сверить раскладку с листом (сверка: ручные правки в таблице)."""
+        headers, rows = self.get_rows_strict(dates, fresh)
+        return parse_days([headers] + list(rows.values()), dates)
+
+    def _rows_checked(self, dates: list[str]) -> Optional[Tuple[List[str], Dict[str, List[str]]]]:
+        """Строки дат по кэшу раскладки и сама раскладка (row 1 + колонка A) —
+        одним batch_get. Раскладка разошлась (ручные строки, переименованные
+        колонки) — кэш пересчитывается по ответу, возвращается None: строки
+        надо перечитать по новой."""
+        headers, known = self.cached_layout()
+        at = {known[d]: d for d in dates if d in known and known[d] > 1} if known is not None else {}
+        rows = sorted(at)
+        ranges = row_ranges(rows, len(headers)) if rows and headers is not None else []
+        fetched = self.ws.batch_get(["1:1", "A:A"] + ranges)
+        head = list(fetched[0][0]) if fetched[0] else []
+        if not head:
+            self.invalidate_layout()   # пустой лист: заголовок создаст load_headers
+            return None
+        new_headers, new_known = self.set_layout(head, [r[0] if r else "" for r in fetched[1]])
+        if new_headers != headers or new_known != known:
+            logger.info("Раскладка листа изменилась с прошлой сверки — пересчитана")
+            return None
+        # Колонка A из того же ответа совпала с кэшем — строки на своих местах
+        got = [r for block in fetched[2:] for r in block]
+        return headers, {at[r]: row for r, row in zip(rows, got)}
+
+    def get_rows_strict(self, dates: list[str], fresh: bool = False) -> Tuple[List[str], Dict[str, List[str]]]:
+        """Сырые строки дат как в get_days_strict: (заголовки, {дата: строка}),
+        дат без строки в ответе нет. БРОСАЕТ при сбое API. fresh — раскладка
+        сверяется с листом в том же batch_get (см. _rows_checked)."""
+        if fresh:
+            checked = self._rows_checked(dates)
+            if checked is not None:
+                return checked
+        for _ in range(2):
+            headers = self.load_headers()
+            known = self._date_rows()
+            at = {known[d]: d for d in dates if d in known and known[d] > 1}
+            if not at:
+                return headers, {}
+            rows = sorted(at)
+            fetched = self.ws.batch_get(row_ranges(rows, len(headers)))
+            got = [r for block in fetched for r in block]
+            # В строке не та дата (ручная вставка/удаление строк) — раскладка устарела
+            if [r[0] if r else "" for r in got] == [at[r] for r in rows]:
+                return headers, {at[r]: row for r, row in zip(rows, got)}
+            self.invalidate_layout()
+        logger.warning("Раскладка листа не сходится с данными — читаю лист целиком")
+        all_values = self.ws.get_all_values()
+        self.learn_layout(all_values)
+        wanted = set(dates)
+        return (all_values[0] if all_values else [],
+                {row[0]: row for row in all_values[1:] if row and row[0] in wanted})
+
+    def date_column(self) -> List[str]:
+        """Колонка A свежим запросом (один col_values) — заодно обновляет
+        кэш строк дат. Дёшево: одна ячейка на день истории."""
+        col_a = self.ws.col_values(1)
+        with self._layout_lock:
+            self._set_col_a(col_a)
+        return col_a
+
+    def modified_time(self) -> Optional[str]:
+        """modifiedTime таблицы из Drive (None — недоступно: fake-лист, нет прав)"""
+        spreadsheet = getattr(self.ws, "spreadsheet", None)
+        if spreadsheet is None or not hasattr(spreadsheet, "get_lastUpdateTime"):
+            return None
+        try:
+            if self.limiter is not None:
+                return self.limiter.call(spreadsheet.get_lastUpdateTime)
+            return spreadsheet.get_lastUpdateTime()
+        except Exception as e:
+            logger.debug("modifiedTime недоступен: %s", e)
+            return None
+
+    def get_all_days_strict(self) -> dict[str, dict[str, float]]:
+        """Вся история листа (bootstrap локального зеркала); БРОСАЕТ при сбое API"""
+        all_values = self.ws.get_all_values()
+        self.learn_layout(all_values)
+        dates = [row[0] for row in all_values[1:] if row and row[0]]
+        return {d: v for d, v in parse_days(all_values, dates).items() if v}
+
     def get_days_bulk(self, dates: list[str]) -> dict[str, dict[str, float]]:
         """Данные за несколько дат ОДНИМ запросом к API"""
         try:
-            all_values = self.ws.get_all_values()
+            return self.get_days_strict(dates)
         except Exception:
             return {d: {} for d in dates}
-        return parse_days(all_values, dates)
 
 
 _manager: "SheetsManager | None" = None
 
+# Один лимитер на процесс: квота Sheets — на сервис-аккаунт, а не на вызывающего
+sheets_limiter = RateLimiter(per_minute=SHEETS_RPM, burst=SHEETS_BURST)
+
 
 def get_sheets_manager() -> "SheetsManager":
     """Ленивый синглтон — создаётся при первом обращении, не при импорте"""
     global _manager
     if _manager is None:
-        _manager = SheetsManager()
+        if SHEETS_BACKEND == "fake":
+            # Офлайн-запуск: лист в памяти процесса (данные живут до рестарта)
+            from .fake_sheets import FakeWorksheet
+            _manager = SheetsManager(ws=FakeWorksheet(title=SHEET_NAME), limiter=sheets_limiter)
+        else:
+            _manager = SheetsManager(limiter=sheets_limiter)
     return _manager
\ No newline at end of file
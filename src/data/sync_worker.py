@@ -1,11 +1,25 @@
-"""Фоновый слив журнала в Google Sheets: батч, retry с backoff, offset после успеха."""
+"""Фоновый слив журнала в цель репликации: батч, retry с backoff, offset после успеха.
+
+Один воркер — одна цель со своим курсором журнала и своим backoff'ом
+(Sheets — основной курсор Journal, SQLite-зеркало — Journal.cursor("mirror"))."""
 
 import asyncio
 import logging
+import time
+
+from ..utils.metrics import (
+    DRAIN_API_CALLS, DRAIN_ENTRIES, DRAIN_FAILURES, DRAIN_SECONDS, LAST_SYNC, SHEETS_CALLS,
+    SYNC_BACKOFF,
+)
 
 logger = logging.getLogger(__name__)
 
 MAX_BACKOFF = 60
+# Coalesce хвоста во время сбоя — когда перекрытых записей набралось хотя бы столько
+COALESCE_MIN_GAIN = 32
+# Большой слив (догоняем после сбоя) пишется пачками по столько дат; записанные
+# пачки подтверждаются (applied) — сбой на следующей не отправит их заново
+DRAIN_CHUNK_DATES = 50
 
 
 def compact_entries(entries: list[dict]) -> dict[str, dict[str, float]]:
@@ -16,31 +30,103 @@ def compact_entries(entries: list[dict]) -> dict[str, dict[str, float]]:
     return batch
 
 
+def pending_batch(batch: dict[str, dict[str, float]],
+                  applied: dict[str, dict[str, float]]) -> dict[str, dict[str, float]]:
+    """batch без значений, которые прошлые попытки уже записали в Sheets"""
+    out = {}
+    for date, values in batch.items():
+        done = applied.get(date, {})
+        todo = {h: v for h, v in values.items() if done.get(h) != v}
+        if todo:
+            out[date] = todo
+    return out
+
+
+def chunk_batch(batch: dict[str, dict[str, float]], size: int) -> list[dict[str, dict[str, float]]]:
+    """batch → пачки по size дат в исходном порядке (порядке журнала)"""
+    items = list(batch.items())
+    return [dict(items[i:i + size]) for i in range(0, len(items), size)]
+
+
+def _sync_calls() -> float:
+    """Вызовы Sheets через gspread (без async-клиента: он идёт мимо sheets_lock)"""
+    return SHEETS_CALLS.total(lambda labels: not labels.get("method", "").startswith("async_"))
+
+
 class SyncWorker:
-    def __init__(self, journal, wake: asyncio.Event, write_day, sheets_lock: asyncio.Lock):
-        self.journal = journal
+    def __init__(self, journal, wake: asyncio.Event, write_day, sheets_lock,
+                 write_days=None, name: str = "sheets"):
+        self.name = name
+        self.journal = journal              # Journal или JournalCursor — курсор этой цели
         self.wake = wake
         self.write_day = write_day          # sync callable: (values: dict, date: str)
-        self.sheets_lock = sheets_lock
+        self.write_days = write_days        # sync callable: (batch: {date: values}) — весь слив одним вызовом
+        self.sheets_lock = sheets_lock      # async-лок записи (Sheets — runtime.sheets_lock.writer)
         self._backoff = 1
+        self._spent, self._calls = 0.0, 0   # время и вызовы Sheets под локом за текущий слив
+
+    async def _locked(self, fn, *args) -> None:
+        """fn(*args) в потоке под sheets_lock. Снимок метрик — уже под локом:
+        ожидание лока не в счёт, а gspread-чтения в это время ждут, так что
+        дельта вызовов — ровно этот слив (async-клиент пишет свои методы async_*)."""
+        async with self.sheets_lock:
+            start, calls_before = time.monotonic(), _sync_calls()
+            try:
+                await asyncio.to_thread(fn, *args)
+            finally:
+                self._spent += time.monotonic() - start
+                self._calls += _sync_calls() - calls_before
 
     async def drain(self) -> bool:
         entries, raw_count = self.journal.pending_with_raw_count()
         if raw_count == 0:
             self.journal.compact_if_synced()
             return True
+        batch = pending_batch(compact_entries(entries), self.journal.applied())
+        self._spent, self._calls = 0.0, 0
         try:
-            for date, values in compact_entries(entries).items():
-                async with self.sheets_lock:
-                    await asyncio.to_thread(self.write_day, values, date)
+            if not batch:
+                pass   # всё уже записано прошлыми попытками — осталось подтвердить
+            elif self.write_days is not None:
+                chunks = chunk_batch(batch, DRAIN_CHUNK_DATES)
+                for i, chunk in enumerate(chunks):
+                    await self._locked(self.write_days, chunk)
+                    # Пачка в Sheets: повтор после сбоя на следующей её не перепишет
+                    # (после последней сразу advance — подтверждать нечего)
+                    if i < len(chunks) - 1:
+                        self.journal.mark_applied(chunk)
+            else:
+                for date, values in batch.items():
+                    await self._locked(self.write_day, values, date)
+                    self.journal.mark_applied({date: values})
         except Exception as e:
-            logger.error("Синк в Sheets не удался (retry через %sс): %s", self._backoff, e)
+            DRAIN_FAILURES.inc(target=self.name)
+            acked = self.journal.advance_applied()
+            logger.error("Синк в %s не удался (retry через %sс, подтверждено %d записей): %s",
+                         self.name, self._backoff, acked, e)
             return False
+        finally:
+            if self.name == "sheets":
+                DRAIN_API_CALLS.observe(self._calls)
+            DRAIN_SECONDS.observe(self._spent, target=self.name)
         self.journal.advance(raw_count)
         self.journal.compact_if_synced()
-        logger.info("Синк: %d записей слито в Sheets", len(entries))
+        DRAIN_ENTRIES.observe(raw_count, target=self.name)
+        LAST_SYNC.set(time.time(), target=self.name)
+        logger.info("Синк: %d записей слито в %s (%d дат)", len(entries), self.name, len(batch))
         return True
 
+    async def coalesce(self) -> None:
+        """Sheets лежит — ужать хвост журнала до одной записи на (date, hobby).
+        Здесь, между попытками drain, — чтобы не гоняться с его advance()."""
+        try:
+            dropped = await asyncio.to_thread(self.journal.coalesce, COALESCE_MIN_GAIN)
+        except Exception as e:
+            logger.error("Coalesce журнала не удался: %s", e)
+            return
+        if dropped:
+            logger.info("Coalesce: выброшено %d перекрытых записей журнала", dropped)
+
     async def run(self) -> None:
         while True:
             try:
@@ -50,7 +136,10 @@ class SyncWorker:
             self.wake.clear()
             if await self.drain():
                 self._backoff = 1
+                SYNC_BACKOFF.set(0, target=self.name)
             else:
+                await self.coalesce()
+                SYNC_BACKOFF.set(self._backoff, target=self.name)
                 await asyncio.sleep(self._backoff)
                 self._backoff = min(self._backoff * 2, MAX_BACKOFF)
                 self.wake.set()  # немедленный повтор после паузы
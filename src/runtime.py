@@ -4,32 +4,206 @@
 """
 
 import asyncio
+import collections
 import datetime as dt
+import json
 import logging
+import time
 
-from .data.daycache import DayCache, merged
+from .data.async_sheets import get_async_reader
+from .data.daycache import DayCache, LRUDayCache, WarmDayCache, merged
 from .data.files import norm_hobby, save_hobby_to_history
-from .data.journal import Journal
-from .data.sheets import get_sheets_manager, parse_days
-from .utils.config import DAYCACHE_FILE, JOURNAL_FILE, JOURNAL_OFFSET_FILE
+from .data.history import History
+from .data.journal import GroupCommitWriter, Journal, JournalCursor
+from .data.mirror import SQLiteMirror
+from .data.ratelimit import Priority, sheets_priority
+from .data.sheets import get_sheets_manager, parse_days, row_hash, sheets_limiter
+from .utils.config import (
+    DAY_LRU_BYTES, DAY_LRU_ENTRIES, DAY_LRU_TTL_S, DAYCACHE_FILE, DAYCACHE_FLUSH_MS, DAYCACHE_HOT_DAYS,
+    DAYCACHE_WARM_DAYS, DAYCACHE_WARM_DIR, HISTORY_TTL_S, JOURNAL_ARCHIVE_DIR, JOURNAL_FILE, JOURNAL_GROUP_COMMIT_MS,
+    JOURNAL_OFFSET_FILE, JOURNAL_QUARANTINE, JOURNAL_SEGMENT_BYTES, MIRROR_DB, MIRROR_FULL_REFRESH_S,
+    MIRROR_RECENT_ROWS, MIRROR_REFRESH_S, PREFETCH_DAYS, RECONCILE_INTERVAL_S,
+)
+from .utils import metrics
 from .utils.dates import date_for_time
 
 logger = logging.getLogger(__name__)
 
 journal: Journal
-cache: DayCache
+writer: GroupCommitWriter | None
+cache: DayCache    # горячий уровень: последние DAYCACHE_HOT_DAYS дней
+warm: WarmDayCache | None   # тёплый: до DAYCACHE_WARM_DAYS дней на диске
+lru: LRUDayCache   # даты старше окон
 wake: asyncio.Event
-sheets_lock: asyncio.Lock
+sheets_lock: "RWLock"   # .reader — чтения листа, .writer — слив журнала
+# SQLite-зеркало: своя цель репликации со своим курсором и будильником (None — выкл)
+mirror: SQLiteMirror | None = None
+mirror_cursor: JournalCursor | None = None
+mirror_wake: asyncio.Event | None = None
+# Колоночная история для аналитики: строится лениво (get_history), дальше живёт записями
+history: History | None = None
+_history_loaded_at = 0.0
+_history_backlog: list[tuple[str, str, float]] | None = None   # записи во время загрузки
+_history_lock: asyncio.Lock
+flights: "SingleFlight"   # чтения Sheets по датам
+_last_day: str | None = None   # прошлая дата /api/day — направление навигации Mini App
+_prefetching: set[asyncio.Task] = set()
 
 
 def init_runtime() -> None:
     """Создаёт синглтоны. Имена резолвятся из module globals в момент вызова —
     тесты подменяют runtime.JOURNAL_FILE и т.п. через monkeypatch."""
-    global journal, cache, wake, sheets_lock
-    journal = Journal(JOURNAL_FILE, JOURNAL_OFFSET_FILE)
-    cache = DayCache(DAYCACHE_FILE, days_window=7)
+    global journal, writer, cache, warm, lru, wake, sheets_lock, mirror, mirror_cursor, mirror_wake
+    global history, _history_lock, flights, _last_day
+    # Хвост проверяется до построения индекса; в карантин — только по JOURNAL_QUARANTINE
+    journal = Journal(JOURNAL_FILE, JOURNAL_OFFSET_FILE,
+                      segment_bytes=JOURNAL_SEGMENT_BYTES, archive_dir=JOURNAL_ARCHIVE_DIR or None,
+                      verify_tail=True, quarantine=JOURNAL_QUARANTINE)
+    writer = GroupCommitWriter(journal, JOURNAL_GROUP_COMMIT_MS) if JOURNAL_GROUP_COMMIT_MS > 0 else None
+    cache = DayCache(DAYCACHE_FILE, days_window=DAYCACHE_HOT_DAYS, flush_ms=DAYCACHE_FLUSH_MS)
+    # Тёплый уровень на диске; с зеркалом не нужен — оно само локальная история
+    warm = (WarmDayCache(DAYCACHE_WARM_DIR, days_window=DAYCACHE_WARM_DAYS, flush_ms=DAYCACHE_FLUSH_MS)
+            if DAYCACHE_WARM_DAYS > DAYCACHE_HOT_DAYS and not MIRROR_DB else None)
+    lru = LRUDayCache(DAY_LRU_ENTRIES, DAY_LRU_BYTES, DAY_LRU_TTL_S)
     wake = asyncio.Event()
-    sheets_lock = asyncio.Lock()
+    sheets_lock = RWLock()
+    mirror = mirror_cursor = mirror_wake = None
+    history = None
+    _history_lock = asyncio.Lock()
+    flights = SingleFlight()
+    _last_day = None
+    if MIRROR_DB:
+        mirror = SQLiteMirror(MIRROR_DB)
+        mirror_cursor = journal.cursor("mirror")
+        mirror_wake = asyncio.Event()
+
+
+class SingleFlight:
+    """Одинаковые одновременные промахи — один запрос к Sheets.
+    Ключ — дата: одиночное чтение дня и окно префетча, пересекающиеся
+    по датам, ждут один и тот же in-flight запрос."""
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.shared = 0   # сколько ожиданий обслужено чужим запросом
+
+    async def do(self, key: str, fetch):
+        """fetch() — корутина-фабрика; результат получают все ждущие key"""
+        return (await self.do_many([key], lambda keys: _one(fetch, keys[0])))[key]
+
+    async def do_many(self, keys: list[str], fetch_many) -> dict:
+        """fetch_many(keys) → {key: value} только для ключей, которые ещё никто не грузит.
+        Запрос — отдельная задача: отмена одного ждущего (клиент ушёл) не
+        отменяет его для остальных."""
+        waiting = {k: self._inflight[k] for k in keys if k in self._inflight}
+        mine = [k for k in dict.fromkeys(keys) if k not in waiting]
+        out: dict = {}
+        if mine:
+            task = asyncio.ensure_future(fetch_many(mine))
+            for k in mine:
+                self._inflight[k] = task
+            task.add_done_callback(lambda t: self._done(t, mine))
+            out.update(await asyncio.shield(task))
+        for k, task in waiting.items():
+            self.shared += 1
+            out[k] = (await asyncio.shield(task)).get(k)
+        return out
+
+    def _done(self, task: asyncio.Task, keys: list[str]) -> None:
+        for k in keys:
+            if self._inflight.get(k) is task:
+                del self._inflight[k]
+        if not task.cancelled():
+            task.exception()   # помечено прочитанным: ждущих могло не остаться
+
+
+class _LockSide:
+    """Одна сторона RWLock как обычный async-лок: `async with lock.reader:`"""
+
+    def __init__(self, acquire, release):
+        self._acquire, self._release = acquire, release
+
+    async def __aenter__(self):
+        await self._acquire()
+
+    async def __aexit__(self, *exc):
+        self._release()
+
+
+class RWLock:
+    """Лок Sheets с раздельными путями. Чтения (промахи кэша, аналитика,
+    сверка, refresh зеркала) идут параллельно друг с другом; запись (слив
+    журнала) — одна и без чтений: раскладка листа меняется только при
+    ней. Ждущая запись не пускает новые чтения — поток просмотров не
+    откладывает слив. Владение передаётся при пробуждении (без гонки за лок)."""
+
+    def __init__(self):
+        self._readers = 0
+        self._writing = False
+        self._waiting_readers: list[asyncio.Future] = []
+        self._waiting_writers: collections.deque[asyncio.Future] = collections.deque()
+        self.reader = _LockSide(self._acquire_read, self._release_read)
+        self.writer = _LockSide(self._acquire_write, self._release_write)
+
+    @property
+    def readers(self) -> int:
+        return self._readers
+
+    @property
+    def writing(self) -> bool:
+        return self._writing
+
+    async def _wait(self, queue, fut: asyncio.Future, release) -> None:
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                release()          # лок уже передан — вернуть
+            else:
+                queue.remove(fut)
+                self._wake()       # ушёл ждущий писатель — читатели могут идти
+            raise
+
+    async def _acquire_read(self) -> None:
+        if not self._writing and not self._waiting_writers:
+            self._readers += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._waiting_readers.append(fut)
+        await self._wait(self._waiting_readers, fut, self._release_read)
+
+    def _release_read(self) -> None:
+        self._readers -= 1
+        self._wake()
+
+    async def _acquire_write(self) -> None:
+        if not self._writing and not self._readers and not self._waiting_writers:
+            self._writing = True
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._waiting_writers.append(fut)
+        await self._wait(self._waiting_writers, fut, self._release_write)
+
+    def _release_write(self) -> None:
+        self._writing = False
+        self._wake()
+
+    def _wake(self) -> None:
+        if self._writing:
+            return
+        if self._waiting_writers:
+            if not self._readers:
+                self._writing = True
+                self._waiting_writers.popleft().set_result(None)
+            return
+        waiting, self._waiting_readers = self._waiting_readers, []
+        for fut in waiting:
+            self._readers += 1
+            fut.set_result(None)
+
+
+async def _one(fetch, key):
+    return {key: await fetch()}
 
 
 def _in_window(date: str, window: int = 7) -> bool:
@@ -37,13 +211,30 @@ def _in_window(date: str, window: int = 7) -> bool:
     return (today - dt.date.fromisoformat(date)).days <= window
 
 
-def record_entry(date: str, hobby: str, hours: float, source: str) -> int:
+def _tier(date: str) -> DayCache | WarmDayCache | None:
+    """Уровень кэша даты: горячий, тёплый или None — LRU"""
+    if _in_window(date, cache.days_window):
+        return cache
+    if warm is not None and _in_window(date, warm.days_window):
+        return warm
+    return None
+
+
+async def record_entry(date: str, hobby: str, hours: float, source: str) -> int:
     hobby = norm_hobby(hobby)  # единое ключевое пространство (регистр, ё→е)
-    journal.append(date, hobby, hours, source)
-    if _in_window(date):
-        cache.apply_entry(date, hobby, hours)
+    if writer is not None:
+        await writer.append(date, hobby, hours, source)  # вернётся после fsync пачки
+    else:
+        journal.append(date, hobby, hours, source)
+    (_tier(date) or lru).apply_entry(date, hobby, hours)
+    if history is not None:
+        history.set_value(date, hobby, hours)
+    if _history_backlog is not None:
+        _history_backlog.append((date, hobby, hours))
     save_hobby_to_history(hobby)
     wake.set()
+    if mirror_wake is not None:
+        mirror_wake.set()
     return journal.pending_count()
 
 
@@ -51,36 +242,309 @@ def pending_count() -> int:
     return journal.pending_count()
 
 
-def _fetch_days_strict(dates: list[str]) -> dict[str, dict[str, float]]:
-    """Как get_days_bulk, но БРОСАЕТ при недоступности Sheets —
-    сверка не должна затирать кэш пустотой при сбое."""
-    all_values = get_sheets_manager().ws.get_all_values()
-    return parse_days(all_values, dates)
+def _fetch_rows_strict(dates: list[str], fresh: bool) -> tuple[list[str], dict[str, list[str]]]:
+    """Сырые строки дат; БРОСАЕТ при недоступности Sheets — сверка не
+    должна затирать кэш пустотой при сбое. fresh — в том же batch_get
+    сверить раскладку листа (ручные строки, переименованные колонки).
+    Фоновый приоритет квоты: синк и интерактивные чтения идут первыми."""
+    with sheets_priority(Priority.BACKGROUND):
+        return get_sheets_manager().get_rows_strict(dates, fresh=fresh)
 
 
-async def reconcile_cache() -> None:
-    """Стартовая сверка последних 7 дней с Sheets (Sheets истина:
-    ручные правки в таблице подтягиваются) + prune старых дат."""
+async def reconcile_cache(fresh: bool = True) -> list[str]:
+    """Сверка кэша с Sheets — Sheets истина: ручные правки в таблице
+    подтягиваются. Горячее окно целиком + уже известные дни тёплого уровня,
+    один batch_get; строка с тем же отпечатком, что кэш видел в прошлый
+    раз, не разбирается и не пишется. Даты с несинканным журналом
+    пропускаются (лист их ещё не догнал — сверим после слива). Выпавшие
+    из горячего окна дни уходят в тёплый уровень. Возвращает изменённые даты."""
     today = date_for_time()
     dates = [(dt.date.fromisoformat(today) - dt.timedelta(days=i)).isoformat()
-             for i in range(7)]
+             for i in range(cache.days_window)]
+    if warm is not None:
+        dates += [d for d in warm.dates() if d not in dates]
     try:
-        async with sheets_lock:
-            days = await asyncio.to_thread(_fetch_days_strict, dates)
+        async with sheets_lock.reader:
+            headers, rows = await asyncio.to_thread(_fetch_rows_strict, dates, fresh)
     except Exception as e:
-        logger.warning("Стартовая сверка с Sheets не удалась, кэш оставлен как есть: %s", e)
+        logger.warning("Сверка с Sheets не удалась, кэш оставлен как есть: %s", e)
+        return []
+    _demote(today)
+    changed = []
+    for date in dates:
+        tier = _tier(date)
+        row = rows.get(date, [])
+        h = row_hash(headers, row)
+        if tier is None or h == tier.row_hash(date) or journal.pending_for(date):
+            continue
+        values = parse_days([headers, row], [date])[date] if row else {}
+        tier.set(date, values, row_hash=h)
+        lru.invalidate(date)
+        if history is not None:
+            history.set_day(date, values)
+        changed.append(date)
+    logger.info("Кэш сверен с Sheets (%d дней, изменилось %d)", len(dates), len(changed))
+    return changed
+
+
+def _demote(today: str) -> None:
+    """Горячее окно сдвинулось: старые дни — в тёплый уровень (с отпечатками),
+    из тёплого — выпавшие за его окно"""
+    stale = cache.prune(today)
+    if warm is None:
         return
-    for date, values in days.items():
-        cache.set(date, values)
-    cache.prune(today)
-    logger.info("Кэш сверен с Sheets (%d дней)", len(dates))
+    for date, (values, h) in stale.items():
+        if _in_window(date, warm.days_window):
+            warm.set(date, values, row_hash=h)
+    warm.prune(today)
+
+
+async def reconcile_loop() -> None:
+    """Периодическая сверка окна кэша без зеркала (с зеркалом ручные правки
+    подтягивает его refresh). Тик — один batch_get: строки окна вместе с
+    row 1 и колонкой A; раскладка разошлась — пересчёт и повтор по новой."""
+    while True:
+        await asyncio.sleep(RECONCILE_INTERVAL_S)
+        try:
+            await reconcile_cache()
+        except Exception as e:
+            logger.warning("Фоновая сверка не удалась: %s", e)
+
+
+async def bootstrap_mirror() -> None:
+    """Пустое зеркало — один раз залить историей из Sheets. Курсор зеркала уже
+    стоит (init_runtime), записи журнала после него новее снимка и доиграются."""
+    if mirror is None or mirror.is_bootstrapped():
+        return
+    try:
+        async with sheets_lock.reader:
+            with sheets_priority(Priority.BACKGROUND):
+                days = await asyncio.to_thread(lambda: get_sheets_manager().get_all_days_strict())
+        await asyncio.to_thread(mirror.bootstrap, days)
+    except Exception as e:
+        logger.warning("Bootstrap зеркала не удался, повторим при следующем старте: %s", e)
+
+
+def _mirror_ready() -> bool:
+    return mirror is not None and mirror.is_bootstrapped()
+
+
+def _refresh_mirror_sync(full: bool) -> list[str]:
+    """Один проход refresh под sheets_lock.reader (см. refresh_mirror)"""
+    mgr = get_sheets_manager()
+    with sheets_priority(Priority.BACKGROUND):
+        modified = mgr.modified_time()
+        if not full and modified is not None and modified == mirror.get_meta("modified_time"):
+            return []   # таблица не менялась с прошлой проверки — ни одного чтения листа
+        if full:
+            days = mgr.get_all_days_strict()
+            dates = set(days) | set(mirror.dates())
+        else:
+            col_a = mgr.date_column()
+            sheet_dates = [d for d in col_a[1:] if d]
+            prev = mirror.get_meta("sheet_dates")
+            known = set(json.loads(prev)) if prev else set(mirror.dates())
+            # Новые/удалённые руками строки + последние N строк (там обычно и правят)
+            dates = (set(sheet_dates) ^ known) | set(sheet_dates[-MIRROR_RECENT_ROWS:])
+            days = mgr.get_days_strict(sorted(dates)) if dates else {}
+    fresh = {d: days.get(d, {}) for d in dates}
+    changed = mirror.replace_days(fresh, skip=lambda d: bool(journal.pending_for(d)))
+    if not full:
+        mirror.set_meta("sheet_dates", json.dumps(sheet_dates))
+    if modified is not None:
+        mirror.set_meta("modified_time", modified)
+    if full:
+        mirror.set_meta("full_refresh_at", dt.datetime.now(dt.timezone.utc).isoformat())
+    return changed
+
+
+async def refresh_mirror(full: bool = False) -> list[str]:
+    """Подтягивает в зеркало ручные правки таблицы. Дёшево: modifiedTime из
+    Drive (не менялся — выход), иначе колонка A (новые/удалённые строки) +
+    batch_get последних MIRROR_RECENT_ROWS строк. full — вся таблица.
+    Под sheets_lock.reader: слив в Sheets не вклинится между чтением листа и
+    заменой в зеркале, даты с несинканным журналом пропускаются."""
+    async with sheets_lock.reader:
+        changed = await asyncio.to_thread(_refresh_mirror_sync, full)
+    if changed:
+        logger.info("Зеркало: из Sheets обновлено дат: %d", len(changed))
+        fresh = mirror.get_days(changed)
+        for date in changed:
+            if cache.get(date) is not None:
+                cache.set(date, fresh[date])
+            lru.invalidate(date)
+            if history is not None:
+                history.set_day(date, fresh[date])
+    return changed
+
+
+async def mirror_refresh_loop() -> None:
+    """Фоновый refresh зеркала: дешёвая проверка каждые MIRROR_REFRESH_S,
+    полная пересверка — раз в MIRROR_FULL_REFRESH_S"""
+    while True:
+        await asyncio.sleep(MIRROR_REFRESH_S)
+        last_full = mirror.get_meta("full_refresh_at")
+        full = last_full is None or (
+            dt.datetime.now(dt.timezone.utc) - dt.datetime.fromisoformat(last_full)
+        ).total_seconds() >= MIRROR_FULL_REFRESH_S
+        try:
+            await refresh_mirror(full=full)
+        except Exception as e:
+            logger.warning("Refresh зеркала не удался: %s", e)
+
+
+def _load_history_days() -> tuple[dict[str, dict[str, float]], list[dict]]:
+    """Вся история + записи журнала, которых в источнике ещё нет"""
+    if _mirror_ready():
+        return mirror.get_range("0000-01-01", "9999-12-31"), mirror_cursor.pending()
+    # Загрузку ждёт пользователь (тап по статистике) — впереди сверки и префетча
+    with sheets_priority(Priority.INTERACTIVE):
+        days = get_sheets_manager().get_all_days_strict()
+    return days, journal.pending()
+
+
+async def get_history() -> History:
+    """Колоночная история для аналитики. Из зеркала — один раз (дальше
+    её ведут записи и refresh), из листа — перечитывается раз в HISTORY_TTL_S
+    (ручные правки). БРОСАЕТ, если источник недоступен и истории ещё нет."""
+    global history, _history_loaded_at, _history_backlog
+    async with _history_lock:
+        stale = not _mirror_ready() and time.monotonic() - _history_loaded_at > HISTORY_TTL_S
+        if history is not None and not stale:
+            return history
+        _history_backlog = []
+        try:
+            if _mirror_ready():
+                days, pending = await asyncio.to_thread(_load_history_days)
+            else:
+                async with sheets_lock.reader:
+                    days, pending = await asyncio.to_thread(_load_history_days)
+            h = await asyncio.to_thread(History.from_days, days)
+            for e in pending:
+                h.set_value(e["date"], e["hobby"], e["hours"])
+            for date, hobby, hours in _history_backlog:
+                h.set_value(date, hobby, hours)
+        except Exception as e:
+            if history is None:
+                raise
+            logger.warning("История не перечитана, отдаю прежнюю: %s", e)
+            return history
+        finally:
+            _history_backlog = None
+        history, _history_loaded_at = h, time.monotonic()
+        logger.info("История: %d дней × %d хобби", *h.matrix.shape)
+        return history
+
+
+async def _fetch_days(dates: list[str]) -> dict[str, dict[str, float]]:
+    """Оконное чтение листа: async-клиентом или gspread под sheets_lock.reader.
+    БРОСАЕТ при сбое API — пустота не должна попасть в кэш как «ничего»."""
+    reader = get_async_reader()
+    if reader is not None:   # без потока и sheets_lock
+        return await reader.get_days_strict(dates)
+    async with sheets_lock.reader:
+        return await asyncio.to_thread(lambda: get_sheets_manager().get_days_strict(dates))
+
+
+def _cached(date: str) -> bool:
+    tier = _tier(date)
+    return date in (tier if tier is not None else lru)
+
+
+def _store_day(date: str, base: dict[str, float]) -> None:
+    tier = _tier(date)
+    if tier is not None:
+        tier.set(date, base)
+    else:
+        # С несинканными записями: после слива они будут в Sheets, а
+        # кэшированная база без них устарела бы до TTL
+        lru.set(date, merged(base, journal.pending_for(date), date))
 
 
 async def get_day_values(date: str) -> dict[str, float]:
-    base = cache.get(date)
+    tier = _tier(date)
+    base = tier.get(date) if tier is not None else lru.get(date)
     if base is None:
-        async with sheets_lock:
-            base = await asyncio.to_thread(lambda: get_sheets_manager().get_day_data(date))
-        if _in_window(date):
-            cache.set(date, base)
-    return merged(base, journal.pending(), date)
+        if _mirror_ready():
+            base = (await asyncio.to_thread(mirror.get_days, [date]))[date]
+        else:
+            async def fetch() -> dict[str, float]:
+                reader = get_async_reader()
+                if reader is not None:
+                    return await reader.get_day_data_strict(date)
+                async with sheets_lock.reader:
+                    return await asyncio.to_thread(lambda: get_sheets_manager().get_day_data_strict(date))
+            try:
+                base = dict(await flights.do(date, fetch) or {})
+            except Exception as e:
+                # Не кэшируем: пустота при сбое осталась бы как «в этот день ничего»
+                logger.warning("Чтение %s из Sheets не удалось: %s", date, e)
+                return merged({}, journal.pending_for(date), date)
+        _store_day(date, base)
+    return merged(base, journal.pending_for(date), date)
+
+
+def prefetch_around(date: str) -> None:
+    """Mini App листает даты: в фоне подгрузить PREFETCH_DAYS соседних дней
+    по направлению движения (первый запрос или тот же день — в обе стороны),
+    чтобы следующий тап отдался из памяти. Фоновый приоритет квоты; с
+    зеркалом не нужен — оно и так локальное."""
+    global _last_day
+    prev, _last_day = _last_day, date
+    if PREFETCH_DAYS <= 0 or _mirror_ready():
+        return
+    day, today = dt.date.fromisoformat(date), date_for_time()
+    if prev is None or prev == date:
+        steps = [k * sign for k in range(1, PREFETCH_DAYS + 1) for sign in (1, -1)]
+    else:
+        steps = [k if date > prev else -k for k in range(1, PREFETCH_DAYS + 1)]
+    dates = [d for d in ((day + dt.timedelta(days=s)).isoformat() for s in steps)
+             if d <= today and not _cached(d)]
+    if dates:
+        task = asyncio.create_task(_prefetch(sorted(dates)))
+        _prefetching.add(task)   # держим ссылку: иначе задачу может собрать GC
+        task.add_done_callback(_prefetching.discard)
+
+
+async def _prefetch(dates: list[str]) -> None:
+    # Ошибку не глушим внутри flight: присоединившееся чтение дня получит её
+    # и не закэширует пустоту (см. get_day_values)
+    try:
+        with sheets_priority(Priority.BACKGROUND):
+            got = await flights.do_many(dates, _fetch_days)
+    except Exception as e:
+        logger.debug("Префетч %s не удался: %s", dates, e)
+        return
+    stored = 0
+    for d in dates:
+        if got.get(d) is not None and not _cached(d):   # не затирать то, что успел положить запрос
+            _store_day(d, got[d])
+            stored += 1
+    metrics.DAY_PREFETCH.inc(stored)
+
+
+def collect_metrics() -> str:
+    """Гауги состояния на момент скрейпа + счётчики лимитера → текст Prometheus"""
+    oldest = journal.oldest_pending()
+    if oldest is None:
+        metrics.JOURNAL_LAG.set(0.0)
+    elif oldest.get("ts"):   # ts в записи не обязателен (старые строки) — тогда лаг не знаем
+        metrics.JOURNAL_LAG.set(max(0.0, (dt.datetime.now(dt.timezone.utc)
+                                          - dt.datetime.fromisoformat(oldest["ts"])).total_seconds()))
+    metrics.JOURNAL_PENDING.set(journal.pending_count())
+    metrics.JOURNAL_BYTES.set(journal.disk_bytes())
+    metrics.JOURNAL_SEGMENTS.set(len(journal.segments()))
+    metrics.DAY_LRU_REQUESTS.set_total(lru.stats["hits"], outcome="hit")
+    metrics.DAY_LRU_REQUESTS.set_total(lru.stats["misses"], outcome="miss")
+    metrics.DAY_LRU_EVICTIONS.set_total(lru.stats["evictions"])
+    metrics.DAY_LRU_ENTRIES.set(len(lru))
+    metrics.DAY_LRU_BYTES.set(lru.bytes)
+    metrics.SHEETS_READS_SHARED.set_total(flights.shared)
+    if warm is not None:
+        metrics.DAY_WARM_REQUESTS.set_total(warm.stats["hits"], outcome="hit")
+        metrics.DAY_WARM_REQUESTS.set_total(warm.stats["misses"], outcome="miss")
+    stats = sheets_limiter.stats()
+    metrics.SHEETS_RETRIES.set_total(stats["retries"])
+    metrics.SHEETS_429.set_total(stats["http_429"])
+    metrics.SHEETS_THROTTLE.set_total(stats["throttle_wait_seconds"])
+    return metrics.REGISTRY.render()
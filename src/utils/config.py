@@ -21,6 +21,8 @@ WEBAPP_URL = os.getenv("WEBAPP_URL", "")
 ALLOWED_USER_IDS = [int(x) for x in os.getenv("ALLOWED_USER_IDS", "").split(",") if x.strip()]
 API_PORT = int(os.getenv("API_PORT", "8000"))
 AUTH_DISABLED = os.getenv("AUTH_DISABLED") == "1"  # только локальная отладка
+# Bearer-токен для /api/metrics (пусто — эндпоинт открыт, метрики без личных данных)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
 
 # File paths
 HOBBIES_HISTORY_FILE = "data/hobbies_history.txt"
@@ -33,6 +35,48 @@ SERVICE_ACCOUNT_FILE = "service_account.json"
 JOURNAL_FILE = "data/journal.jsonl"
 JOURNAL_OFFSET_FILE = "data/journal.offset"
 DAYCACHE_FILE = "data/cache/days.json"
+# Уровни кэша дней: горячее окно в памяти и тёплое на диске (файл на месяц), дней;
+# тёплое не больше горячего = выкл (с зеркалом MIRROR_DB выключено всегда)
+DAYCACHE_HOT_DAYS = int(os.getenv("DAYCACHE_HOT_DAYS", "7"))
+DAYCACHE_WARM_DAYS = int(os.getenv("DAYCACHE_WARM_DAYS", "90"))
+DAYCACHE_WARM_DIR = os.getenv("DAYCACHE_WARM_DIR", "data/cache/warm")
+# Write-behind снапшотов кэша дней: не чаще раза в столько мс (0 — на каждое изменение)
+DAYCACHE_FLUSH_MS = int(os.getenv("DAYCACHE_FLUSH_MS", "1000"))
+# Сегменты журнала: размер активного до ротации; куда убирать слитые ("" = удалять)
+JOURNAL_SEGMENT_BYTES = int(os.getenv("JOURNAL_SEGMENT_BYTES", str(256 * 1024)))
+JOURNAL_ARCHIVE_DIR = os.getenv("JOURNAL_ARCHIVE_DIR", "")
+# Локальное SQLite-зеркало истории (вторая цель репликации журнала; "" = выкл)
+MIRROR_DB = os.getenv("MIRROR_DB", "")
+# Refresh зеркала (ручные правки в таблице): период дешёвой проверки, сколько
+# последних строк сверять каждый раз и период полной пересверки, сек
+MIRROR_REFRESH_S = int(os.getenv("MIRROR_REFRESH_S", "300"))
+MIRROR_RECENT_ROWS = int(os.getenv("MIRROR_RECENT_ROWS", "14"))
+MIRROR_FULL_REFRESH_S = int(os.getenv("MIRROR_FULL_REFRESH_S", str(24 * 3600)))
+# LRU для дат вне 7-дневного окна кэша: записей, байт, TTL в секундах
+DAY_LRU_ENTRIES = int(os.getenv("DAY_LRU_ENTRIES", "512"))
+DAY_LRU_BYTES = int(os.getenv("DAY_LRU_BYTES", str(2 * 1024 * 1024)))
+DAY_LRU_TTL_S = int(os.getenv("DAY_LRU_TTL_S", "300"))
+# Фоновая сверка окна кэша с таблицей (ручные правки) без зеркала, сек (0 = только при старте)
+RECONCILE_INTERVAL_S = int(os.getenv("RECONCILE_INTERVAL_S", "300"))
+# Префетч соседних дат при навигации Mini App: сколько дней по направлению движения (0 = выкл)
+PREFETCH_DAYS = int(os.getenv("PREFETCH_DAYS", "3"))
+# Колоночная история для аналитики: как часто перечитывать лист, если зеркала нет, сек
+HISTORY_TTL_S = int(os.getenv("HISTORY_TTL_S", "600"))
+# Group-commit журнала: окно в мс (0 = выкл, каждый append — свой fsync)
+JOURNAL_GROUP_COMMIT_MS = int(os.getenv("JOURNAL_GROUP_COMMIT_MS", "0"))
+# Проверка хвоста журнала при старте: битые диапазоны в карантин (по умолчанию только лог)
+JOURNAL_QUARANTINE = os.getenv("JOURNAL_QUARANTINE") == "1"
+
+# Хранилище: google (по умолчанию) | fake — лист в памяти, для локальной отладки и бенчмарков
+SHEETS_BACKEND = os.getenv("SHEETS_BACKEND", "google")
+
+# Квота Google Sheets: запросов в минуту на весь процесс и размер всплеска
+SHEETS_RPM = int(os.getenv("SHEETS_RPM", "60"))
+SHEETS_BURST = int(os.getenv("SHEETS_BURST", "10"))
+# Чтения через нативный async-клиент (httpx, без потоков и sheets_lock) и его
+# предел одновременных запросов = размер пула соединений
+SHEETS_ASYNC = os.getenv("SHEETS_ASYNC") == "1"
+SHEETS_MAX_CONCURRENCY = int(os.getenv("SHEETS_MAX_CONCURRENCY", "4"))
 
 # Google Sheets Scopes
 SCOPES = [
@@ -44,5 +88,5 @@ def validate_config() -> None:
     """Вызывается из main() — НЕ при импорте, чтобы тесты жили без .env"""
     if not BOT_TOKEN or not SPREADSHEET_ID:
         raise SystemExit("Отсутствуют TELEGRAM_BOT_TOKEN или SPREADSHEET_ID в .env")
-    if not os.path.exists(SERVICE_ACCOUNT_FILE):
+    if SHEETS_BACKEND != "fake" and not os.path.exists(SERVICE_ACCOUNT_FILE):
         raise SystemExit(f"Нет файла {SERVICE_ACCOUNT_FILE} рядом с main.py")
\ No newline at end of file
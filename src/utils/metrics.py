@@ -0,0 +1,201 @@
+"""Метрики процесса в текстовом формате Prometheus (без prometheus_client).
+
+Счётчики/гистограммы обновляются по месту (воркер, прокси листа), гауги
+состояния (лаг, размер журнала) — в момент скрейпа, см. runtime.collect_metrics().
+Все метрики — в REGISTRY, отдаются /api/metrics."""
+
+import abc
+import bisect
+import math
+import threading
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+def _key(labels: dict[str, str]) -> LabelKey:
+    return tuple(sorted(labels.items()))
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(key: LabelKey, extra: tuple[str, str] | None = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class _Metric(abc.ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def samples(self) -> list[str]:
+        """Строки сэмплов в формате экспозиции, без HELP/TYPE"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self._values: dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        k = _key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0.0) + amount
+
+    def set_total(self, value: float, **labels: str) -> None:
+        """Счётчик, который ведёт кто-то другой (напр. RateLimiter) — копируем значение"""
+        with self._lock:
+            self._values[_key(labels)] = float(value)
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(_key(labels), 0.0)
+
+    def total(self, where=None) -> float:
+        """Сумма по всем меткам; where(labels: dict) -> bool — только подходящие"""
+        with self._lock:
+            return sum(v for k, v in self._values.items() if where is None or where(dict(k)))
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_fmt_labels(k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        self.set_total(value, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...]):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[LabelKey, list] = {}   # key → [counts по бакетам, sum, count]
+
+    def observe(self, value: float, **labels: str) -> None:
+        k = _key(labels)
+        with self._lock:
+            s = self._series.get(k)
+            if s is None:
+                s = self._series[k] = [[0] * len(self.buckets), 0.0, 0]
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            s = self._series.get(_key(labels))
+            return s[2] if s else 0
+
+    def sum(self, **labels: str) -> float:
+        with self._lock:
+            s = self._series.get(_key(labels))
+            return s[1] if s else 0.0
+
+    def samples(self) -> list[str]:
+        out = []
+        with self._lock:
+            items = sorted((k, (list(c), total, n)) for k, (c, total, n) in self._series.items())
+        for k, (counts, total, n) in items:
+            acc = 0
+            for le, c in zip(self.buckets, counts):
+                acc += c
+                out.append(f"{self.name}_bucket{_fmt_labels(k, ('le', _fmt_value(le)))} {acc}")
+            out.append(f"{self.name}_bucket{_fmt_labels(k, ('le', '+Inf'))} {n}")
+            out.append(f"{self.name}_sum{_fmt_labels(k)} {_fmt_value(total)}")
+            out.append(f"{self.name}_count{_fmt_labels(k)} {n}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.setdefault(metric.name, metric)
+        return self._metrics[metric.name]
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self.register(Counter(name, help))
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        return self.register(Gauge(name, help))
+
+    def histogram(self, name: str, help: str, buckets: tuple[float, ...]) -> Histogram:
+        return self.register(Histogram(name, help, buckets))
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- синк журнала → Sheets ---
+DRAIN_ENTRIES = REGISTRY.histogram(
+    "hobby_sync_drain_entries", "Записей журнала за один успешный слив",
+    (1, 2, 5, 10, 25, 50, 100, 250, 1000))
+DRAIN_API_CALLS = REGISTRY.histogram(
+    "hobby_sync_drain_api_calls", "Вызовов Sheets API за один слив (включая повторы)",
+    (1, 2, 3, 5, 8, 13, 21, 50))
+DRAIN_SECONDS = REGISTRY.histogram(
+    "hobby_sync_drain_seconds", "Длительность слива (с ожиданием квоты)",
+    (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+DRAIN_FAILURES = REGISTRY.counter("hobby_sync_drain_failures_total", "Неудачных сливов")
+SYNC_BACKOFF = REGISTRY.gauge("hobby_sync_backoff_seconds", "Текущая пауза воркера перед повтором")
+LAST_SYNC = REGISTRY.gauge("hobby_sync_last_success_timestamp_seconds", "Unix-время последнего успешного слива")
+
+# --- Sheets API ---
+SHEETS_CALLS = REGISTRY.counter("hobby_sheets_calls_total", "Вызовов Sheets API по методам и исходу")
+SHEETS_SECONDS = REGISTRY.histogram(
+    "hobby_sheets_call_seconds", "Латентность одного вызова Sheets API по методам",
+    (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30))
+SHEETS_RETRIES = REGISTRY.counter("hobby_sheets_retries_total", "Повторов вызовов Sheets (429/5xx)")
+SHEETS_429 = REGISTRY.counter("hobby_sheets_http_429_total", "Ответов 429 от Sheets")
+SHEETS_THROTTLE = REGISTRY.counter(
+    "hobby_sheets_throttle_wait_seconds_total", "Суммарное ожидание токена квоты")
+
+# --- журнал (заполняется при скрейпе) ---
+JOURNAL_PENDING = REGISTRY.gauge("hobby_journal_pending_entries", "Несинканных записей журнала")
+JOURNAL_LAG = REGISTRY.gauge(
+    "hobby_journal_oldest_pending_age_seconds", "Возраст старейшей несинканной записи (0 — очередь пуста)")
+JOURNAL_BYTES = REGISTRY.gauge("hobby_journal_bytes", "Размер живых сегментов журнала на диске")
+JOURNAL_SEGMENTS = REGISTRY.gauge("hobby_journal_segments", "Живых сегментов журнала")
+
+# --- LRU дней вне окна (заполняется при скрейпе) ---
+DAY_LRU_REQUESTS = REGISTRY.counter("hobby_day_lru_requests_total", "Обращений к LRU дней по исходу (hit/miss)")
+DAY_LRU_EVICTIONS = REGISTRY.counter("hobby_day_lru_evictions_total", "Вытеснений из LRU дней по размеру")
+DAY_LRU_ENTRIES = REGISTRY.gauge("hobby_day_lru_entries", "Дней в LRU")
+DAY_LRU_BYTES = REGISTRY.gauge("hobby_day_lru_bytes", "Оценка памяти LRU дней")
+DAY_WARM_REQUESTS = REGISTRY.counter(
+    "hobby_day_warm_requests_total", "Обращений к тёплому (дисковому) уровню кэша дней по исходу (hit/miss)")
+SHEETS_READS_SHARED = REGISTRY.counter(
+    "hobby_sheets_reads_shared_total", "Чтений дат, обслуженных чужим in-flight запросом (single-flight)")
+DAY_PREFETCH = REGISTRY.counter(
+    "hobby_day_prefetch_total", "Дней, подгруженных в кэш префетчем соседних дат Mini App")
@@ -13,8 +13,10 @@ def client(tmp_path, monkeypatch):
     monkeypatch.setattr(runtime, "JOURNAL_FILE", str(tmp_path / "j.jsonl"))
     monkeypatch.setattr(runtime, "JOURNAL_OFFSET_FILE", str(tmp_path / "j.offset"))
     monkeypatch.setattr(runtime, "DAYCACHE_FILE", str(tmp_path / "days.json"))
+    monkeypatch.setattr(runtime, "DAYCACHE_WARM_DIR", str(tmp_path / "warm"))
     monkeypatch.setattr(runtime, "save_hobby_to_history", lambda h: None)
     monkeypatch.setattr(runtime, "_in_window", lambda date, window=7: True)
+    monkeypatch.setattr(runtime, "PREFETCH_DAYS", 0)
     runtime.init_runtime()
     runtime.cache.set("2026-07-06", {"мото": 1.0})
 
@@ -67,3 +69,19 @@ def test_no_auth_401(client):
 def test_wrong_user_403(client):
     r = client.get("/api/hobbies", headers={"Telegram-Init-Data": make_init_data(777)})
     assert r.status_code == 403
+
+
+def test_metrics_endpoint(client, monkeypatch):
+    client.post("/api/entry", headers=AUTH,
+                json={"date": "2026-07-06", "hobby": "игры", "hours": 1})
+    r = client.get("/api/metrics")
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain")
+    assert "hobby_journal_pending_entries 1" in r.text
+    assert "# TYPE hobby_sync_drain_entries histogram" in r.text
+    lag = next(line for line in r.text.splitlines()
+               if line.startswith("hobby_journal_oldest_pending_age_seconds "))
+    assert float(lag.split()[1]) >= 0
+
+    monkeypatch.setattr("src.api.server.METRICS_TOKEN", "s3cret")
+    assert client.get("/api/metrics").status_code == 401
+    assert client.get("/api/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
@@ -0,0 +1,185 @@
+import asyncio
+import datetime as dt
+import json
+
+import httpx
+import pytest
+
+from src.data.async_sheets import AsyncSheetsClient, AsyncSheetsReader, SheetsHTTPError
+from src.data.fake_sheets import FakeWorksheet
+from src.data.ratelimit import RateLimiter
+from src.data.sheets import SheetsManager
+
+
+class Creds:
+    """Креды сервис-аккаунта без сети: refresh выдаёт новый токен на час"""
+
+    def __init__(self, token="t0", expiry=None):
+        self.token = token
+        self.expiry = expiry
+        self.refreshes = 0
+
+    def refresh(self, request):
+        self.refreshes += 1
+        self.token = f"t{self.refreshes}"
+        self.expiry = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None) + dt.timedelta(hours=1)
+
+
+ROWS = [["Дата", "Книги", "Спорт"], ["2025-01-01", "1", ""], ["2025-01-02", "2", "0,5"]]
+
+
+def sheet_api(rows, log):
+    """Мини Sheets v4 для MockTransport: batchGet по 'Лист'!A1-диапазонам"""
+    def rng(a1):
+        if "!" not in a1:
+            return rows                      # весь лист
+        a1 = a1.split("!", 1)[1]
+        if a1 == "1:1":
+            return rows[:1]
+        if a1 == "A:A":
+            return [[r[0]] for r in rows]
+        lo, hi = (int("".join(c for c in part if c.isdigit())) for part in a1.split(":"))
+        return rows[lo - 1:hi]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        log.append(request)
+        if request.url.path.endswith("/values:batchGet"):
+            ranges = request.url.params.get_list("ranges")
+            return httpx.Response(200, json={"valueRanges": [{"values": rng(r)} for r in ranges]})
+        if "/values/" in request.url.path:
+            return httpx.Response(200, json={"values": rng(request.url.path.rsplit("/values/", 1)[1])})
+        return httpx.Response(404)
+    return handler
+
+
+def make_reader(rows, log, **kw):
+    client = AsyncSheetsClient(Creds(), "sid", transport=httpx.MockTransport(sheet_api(rows, log)), **kw)
+    manager = SheetsManager(ws=FakeWorksheet([list(r) for r in rows], title="Данные"))
+    return AsyncSheetsReader(manager, client, "Данные")
+
+
+def test_reader_days_layout_once_then_one_request():
+    log = []
+    reader = make_reader(ROWS, log)
+
+    async def go():
+        first = await reader.get_days_strict(["2025-01-02", "2025-01-09"])
+        second = await reader.get_day_data_strict("2025-01-01")
+        await reader.client.aclose()
+        return first, second
+
+    first, second = asyncio.run(go())
+    assert first == {"2025-01-02": {"книги": 2.0, "спорт": 0.5}, "2025-01-09": {}}
+    assert second == {"книги": 1.0, "спорт": 0.0}
+    assert len(log) == 3   # раскладка (row 1 + колонка A) один раз + по запросу на чтение
+    assert log[0].headers["Authorization"] == "Bearer t0"
+    assert log[2].url.params.get_list("ranges") == ["'Данные'!A2:C2"]
+
+
+def test_reader_layout_shift_refetches():
+    log = []
+    reader = make_reader(ROWS, log)
+    reader.manager.learn_layout([["Дата", "Книги"], ["2025-01-02"], ["2025-01-01"]])   # устаревшая
+
+    got = asyncio.run(reader.get_days_strict(["2025-01-01"]))
+    assert got == {"2025-01-01": {"книги": 1.0}}
+    assert len(log) == 3   # строка не той даты → раскладка заново → строка
+
+
+def test_429_retried_through_limiter():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        return httpx.Response(200, json={"values": [["x"]]})
+
+    lim = RateLimiter(per_minute=6000, burst=5, base_backoff=0.01)
+    client = AsyncSheetsClient(Creds(), "sid", limiter=lim, transport=httpx.MockTransport(handler))
+    assert asyncio.run(client.values_get("'Данные'!A1")) == [["x"]]
+    assert len(calls) == 2 and lim.stats()["http_429"] == 1
+
+
+def test_http_error_not_retried():
+    client = AsyncSheetsClient(Creds(), "sid", limiter=RateLimiter(per_minute=6000),
+                               transport=httpx.MockTransport(lambda r: httpx.Response(403, text="nope")))
+    with pytest.raises(SheetsHTTPError) as e:
+        asyncio.run(client.values_get("A1"))
+    assert e.value.response.status_code == 403
+
+
+def test_expired_token_refreshed_once_for_concurrent_requests():
+    creds = Creds(token="old", expiry=dt.datetime(2000, 1, 1))
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers["Authorization"])
+        return httpx.Response(200, content=json.dumps({"values": []}))
+
+    client = AsyncSheetsClient(creds, "sid", transport=httpx.MockTransport(handler))
+
+    async def go():
+        await asyncio.gather(*(client.values_get("A1") for _ in range(5)))
+
+    asyncio.run(go())
+    assert creds.refreshes == 1
+    assert seen == ["Bearer t1"] * 5
+
+
+def test_concurrency_bounded():
+    active, peak = 0, 0
+
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return httpx.Response(200, json={})
+
+    client = AsyncSheetsClient(Creds(), "sid", max_concurrency=2, transport=httpx.MockTransport(handler))
+
+    async def go():
+        await asyncio.gather(*(client.values_get("A1") for _ in range(6)))
+
+    asyncio.run(go())
+    assert peak == 2
+
+
+def test_reader_falls_back_to_whole_sheet_when_layout_keeps_mismatching():
+    log = []
+    rows = [list(r) for r in ROWS]
+    reader = make_reader(rows, log)
+
+    async def go():
+        got = await reader.get_days_strict(["2025-01-02"])
+        await reader.client.aclose()
+        return got
+
+    real_batch_get = reader.client.values_batch_get
+
+    async def shifted(ranges):   # строки каждый раз «уезжают» — как в get_rows_strict
+        out = await real_batch_get(ranges)
+        return [[["1999-01-01"]] if "1:1" not in r and "A:A" not in r else v
+                for r, v in zip(ranges, out)]
+
+    reader.client.values_batch_get = shifted
+    assert asyncio.run(go()) == {"2025-01-02": {"книги": 2.0, "спорт": 0.5}}
+    assert log[-1].url.path.endswith("/values/'Данные'")
+    assert reader.manager.cached_layout()[1]["2025-01-02"] == 3
+
+
+def test_layout_lock_not_held_during_api_call():
+    import threading
+    import time
+
+    ws = FakeWorksheet([list(r) for r in ROWS], latency=0.5)
+    manager = SheetsManager(ws=ws)
+    t = threading.Thread(target=manager.find_today_row_idx, args=("2025-01-01",))
+    t.start()
+    time.sleep(0.05)                      # поток ждёт col_values
+    start = time.monotonic()
+    assert manager.cached_layout() == (None, None)   # event loop не ждёт чужой I/O
+    assert time.monotonic() - start < 0.1
+    t.join()
@@ -50,3 +50,111 @@ def test_merged_overlay_order_and_date_filter():
     out = merged(base, pending, "2026-07-06")
     assert out == {"игры": 3.5, "мото": 2.0, "чтение": 0.5}
     assert base == {"игры": 1.0, "мото": 2.0}  # не мутирует базу
+
+
+def test_lru_ttl_and_counters():
+    from src.data.daycache import LRUDayCache
+    now = [0.0]
+    lru = LRUDayCache(max_entries=2, ttl=10, clock=lambda: now[0])
+    assert lru.get("2026-01-01") is None
+    lru.set("2026-01-01", {"игры": 1.0})
+    assert lru.get("2026-01-01") == {"игры": 1.0}
+    now[0] = 11
+    assert lru.get("2026-01-01") is None              # TTL истёк
+    assert lru.stats == {"hits": 1, "misses": 2, "expired": 1, "evictions": 0}
+
+
+def test_lru_bounded_by_entries_and_bytes():
+    from src.data.daycache import LRUDayCache
+    lru = LRUDayCache(max_entries=2)
+    lru.set("2026-01-01", {"игры": 1.0})
+    lru.set("2026-01-02", {"игры": 1.0})
+    lru.get("2026-01-01")                             # свежее использование
+    lru.set("2026-01-03", {"игры": 1.0})
+    assert lru.get("2026-01-02") is None and lru.get("2026-01-01") is not None
+    small = LRUDayCache(max_bytes=1000)
+    for d in range(1, 20):
+        small.set(f"2026-01-{d:02d}", {f"хобби{i}": 1.0 for i in range(3)})
+    assert 0 < small.bytes <= 1000 and small.stats["evictions"] > 0
+
+
+def test_lru_apply_entry_only_updates_cached_days():
+    from src.data.daycache import LRUDayCache
+    lru = LRUDayCache()
+    lru.apply_entry("2026-01-01", "игры", 1.0)
+    assert lru.get("2026-01-01") is None
+    lru.set("2026-01-02", {"мото": 1.0})
+    lru.apply_entry("2026-01-02", "игры", 2.0)
+    assert lru.get("2026-01-02") == {"мото": 1.0, "игры": 2.0}
+
+
+def test_write_behind_coalesces_and_flushes_atomically(tmp_path):
+    import asyncio
+    import json
+    path = tmp_path / "days.json"
+    c = DayCache(str(path), flush_ms=20)
+
+    async def scenario():
+        for i in range(10):
+            c.apply_entry("2026-07-06", "игры", float(i))
+        assert not path.exists()              # тап не пишет файл
+        await asyncio.sleep(0.1)
+        assert c.flushes == 1                 # десять изменений — один снапшот
+        c.set("2026-07-05", {"мото": 1.0})
+        await c.close()                       # остановка не ждёт окна
+
+    asyncio.run(scenario())
+    assert c.flushes == 2
+    assert json.loads(path.read_text()) == {"2026-07-06": {"игры": 9.0}, "2026-07-05": {"мото": 1.0}}
+    assert not (tmp_path / "days.json.tmp").exists()
+
+
+def test_corrupt_snapshot_is_rebuildable(tmp_path):
+    path = tmp_path / "days.json"
+    path.write_text("{обрыв")
+    assert DayCache(str(path)).get("2026-07-06") is None
+
+
+def test_warm_tier_month_shards_lazy_and_pruned(tmp_path):
+    from src.data.daycache import WarmDayCache
+    w = WarmDayCache(str(tmp_path / "warm"), days_window=90)
+    w.set("2026-05-10", {"игры": 1.0}, row_hash="h1")
+    w.set("2026-07-01", {"мото": 2.0})
+    w.apply_entry("2026-07-01", "игры", 0.5)
+    w.apply_entry("2026-07-02", "игры", 0.5)          # день неизвестен — не создаём
+    assert sorted(p.name for p in (tmp_path / "warm").iterdir()) == [
+        "2026-05.json", "2026-07.json", "index.json"]
+
+    w2 = WarmDayCache(str(tmp_path / "warm"), days_window=90)   # после рестарта
+    assert w2.dates() == ["2026-05-10", "2026-07-01"]
+    assert w2._months == {}                                      # дни — из индекса, месяцы не читали
+    assert w2.get("2026-07-01") == {"мото": 2.0, "игры": 0.5}
+    assert list(w2._months) == ["2026-07"]                       # только нужный месяц
+    assert w2.row_hash("2026-05-10") == "h1" and "2026-07-02" not in w2
+
+    w2.prune(today="2026-08-20")                                 # окно с 2026-05-22
+    assert w2.dates() == ["2026-07-01"]
+    assert not (tmp_path / "warm" / "2026-05.json").exists()
+    assert WarmDayCache(str(tmp_path / "warm")).dates() == ["2026-07-01"]
+
+
+def test_warm_tier_prune_writes_index_without_dropped_month(tmp_path):
+    import json
+    from src.data.daycache import WarmDayCache
+    w = WarmDayCache(str(tmp_path / "warm"), days_window=30, flush_ms=0)
+    w.set("2026-05-10", {"игры": 1.0})
+    w.set("2026-07-01", {"мото": 2.0})
+    w.prune(today="2026-07-10")
+    index = json.loads((tmp_path / "warm" / "index.json").read_text())
+    assert "2026-05" not in json.dumps(index)
+
+
+def test_warm_tier_index_rebuilt_from_months(tmp_path):
+    from src.data.daycache import WarmDayCache
+    w = WarmDayCache(str(tmp_path / "warm"))
+    w.set("2026-06-01", {"игры": 1.0})
+    w.set("2026-07-01", {"мото": 2.0})
+    (tmp_path / "warm" / "index.json").write_text("{обрыв")
+    w2 = WarmDayCache(str(tmp_path / "warm"))
+    assert w2.dates() == ["2026-06-01", "2026-07-01"]
+    assert WarmDayCache(str(tmp_path / "warm"))._months == {}   # индекс снова на диске
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from src.data.fake_sheets import FakeAPIError, FakeWorksheet
+from src.data.journal import Journal
+from src.data.ratelimit import RateLimiter
+from src.data.sheets import SheetsManager
+from src.data.sync_worker import SyncWorker
+
+
+def test_gspread_like_reads():
+    ws = FakeWorksheet([["Дата", "игры", "мото"], ["2026-07-04", 2.0], ["2026-07-05", "", 1.5]])
+    assert ws.row_values(2) == ["2026-07-04", "2"]
+    assert ws.col_values(1) == ["Дата", "2026-07-04", "2026-07-05"]
+    assert ws.get_all_values()[1] == ["2026-07-04", "2", ""]       # выровнено по ширине
+    assert ws.batch_get(["A2:C2", "A3:C3"]) == [[["2026-07-04", "2"]], [["2026-07-05", "", "1.5"]]]
+    assert ws.calls["row_values"] == 1 and sum(ws.calls.values()) == 4
+
+
+def test_append_rows_reports_range():
+    ws = FakeWorksheet([["Дата"], ["2026-07-04"]])
+    resp = ws.append_rows([["2026-07-05"], ["2026-07-06"]])
+    assert resp["updates"]["updatedRange"] == "'Данные'!A3:A4"
+    assert ws.col_values(1)[-1] == "2026-07-06"
+
+
+def test_failure_rate_and_quota():
+    flaky = FakeWorksheet(failure_rate=1.0)
+    with pytest.raises(FakeAPIError) as e:
+        flaky.row_values(1)
+    assert e.value.response.status_code == 503
+    limited = FakeWorksheet(quota_per_minute=2)
+    limited.row_values(1)
+    limited.row_values(1)
+    with pytest.raises(FakeAPIError) as e:
+        limited.row_values(1)
+    assert e.value.response.status_code == 429
+    assert float(e.value.response.headers["Retry-After"]) > 0
+
+
+def test_sync_worker_end_to_end_on_fake(tmp_path):
+    ws = FakeWorksheet()
+    m = SheetsManager(ws=ws, limiter=RateLimiter(per_minute=60000, burst=100))
+    j = Journal(str(tmp_path / "j.jsonl"), str(tmp_path / "j.offset"))
+    for day in range(1, 11):
+        j.append(f"2026-07-{day:02d}", "игры", float(day), "bot")
+    w = SyncWorker(j, asyncio.Event(), write_day=m.write_values, sheets_lock=asyncio.Lock(),
+                   write_days=m.write_days)
+    assert asyncio.run(w.drain()) is True
+    assert sum(ws.calls.values()) <= 6                # 10 дат — постоянное число вызовов
+    assert m.get_days_strict(["2026-07-10"]) == {"2026-07-10": {"игры": 10.0}}
+
+
+def test_drain_metrics_on_fake(tmp_path):
+    from src.utils import metrics
+    ws = FakeWorksheet()
+    m = SheetsManager(ws=ws, limiter=RateLimiter(per_minute=60000, burst=100))
+    j = Journal(str(tmp_path / "j.jsonl"), str(tmp_path / "j.offset"))
+    j.append("2026-07-01", "игры", 1.0, "bot")
+    j.append("2026-07-02", "игры", 2.0, "bot")
+    w = SyncWorker(j, asyncio.Event(), write_day=m.write_values, sheets_lock=asyncio.Lock(),
+                   write_days=m.write_days)
+    drains = metrics.DRAIN_ENTRIES.count(target="sheets")
+    calls = metrics.DRAIN_API_CALLS.sum()
+    asyncio.run(w.drain())
+    assert metrics.DRAIN_ENTRIES.count(target="sheets") == drains + 1
+    assert metrics.DRAIN_API_CALLS.sum() - calls == sum(ws.calls.values())
+    assert metrics.SHEETS_SECONDS.count(method="append_rows") >= 1
+
+
+def test_drain_api_calls_exclude_lock_wait(tmp_path):
+    from src.utils import metrics
+    ws = FakeWorksheet()
+    m = SheetsManager(ws=ws, limiter=RateLimiter(per_minute=60000, burst=100))
+    j = Journal(str(tmp_path / "j.jsonl"), str(tmp_path / "j.offset"))
+    j.append("2026-07-01", "игры", 1.0, "bot")
+    lock = asyncio.Lock()
+    w = SyncWorker(j, asyncio.Event(), write_day=m.write_values, sheets_lock=lock,
+                   write_days=m.write_days)
+
+    async def go():
+        await lock.acquire()
+        drain = asyncio.create_task(w.drain())
+        await asyncio.sleep(0.01)                  # слив ждёт лок, а чужие вызовы идут
+        metrics.SHEETS_CALLS.inc(5, method="batch_get", outcome="ok")
+        lock.release()
+        await drain
+
+    calls = metrics.DRAIN_API_CALLS.sum()
+    asyncio.run(go())
+    assert metrics.DRAIN_API_CALLS.sum() - calls == sum(ws.calls.values())
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from src.data.history import History
+
+
+@pytest.fixture
+def h():
+    return History.from_days({
+        "2026-07-01": {"игры": 1.0},
+        "2026-07-03": {"игры": 2.0, "мото": 1.0},
+        "2026-07-04": {"мото": 3.0},
+        "2026-07-05": {"игры": 1.0},
+    })
+
+
+def test_window_totals_and_top(h):
+    assert h.matrix.dtype == np.float32 and h.matrix.shape == (5, 2)
+    assert h.totals("2026-07-05", 3) == {"игры": 3.0, "мото": 4.0}
+    assert h.top("2026-07-05", 30, k=2) == [("игры", 4.0), ("мото", 4.0)]
+    assert list(h.daily_totals("2026-07-06", 3)) == [3.0, 1.0, 0.0]   # день после истории — 0
+    assert h.totals("2020-01-01", 7) == {}
+
+
+def test_set_value_grows_matrix(h):
+    h.set_value("2026-06-30", "чтение", 0.5)       # раньше начала — новая строка и колонка
+    h.set_value("2026-07-10", "игры", 2.0)
+    assert h.start.isoformat() == "2026-06-30" and h.matrix.shape == (11, 3)
+    assert h.totals("2026-07-10", 11) == {"игры": 6.0, "мото": 4.0, "чтение": 0.5}
+    h.set_day("2026-07-03", {"мото": 2.0})          # сверка: игры за день обнулились
+    assert h.totals("2026-07-03", 1) == {"мото": 2.0}
+
+
+def test_rolling_weekday_streak_trend(h):
+    assert np.allclose(h.rolling_mean("2026-07-05", 2, k=2), [3.0, 2.0])
+    means = h.weekday_means("2026-07-05", 7)           # 2026-07-05 — воскресенье
+    assert means[6] == 1.0 and means[4] == 3.0
+    assert h.streak("2026-07-05") == 3
+    assert h.streak("2026-07-06") == 3                 # сегодня ещё пусто — серия жива
+    assert h.streak("2026-07-05", hobby="игры") == 1
+    assert h.trends("2026-07-04", 4)["мото"] > 0
+    assert h.half_trend("2026-07-05", 4)["мото"] == "📈"
@@ -1,6 +1,10 @@
+import asyncio
+import json
+import os
+
 import pytest
 
-from src.data.journal import Journal
+from src.data.journal import GroupCommitWriter, Journal, decode_record, encode_record
 
 
 @pytest.fixture
@@ -64,3 +68,255 @@ def test_compact_if_synced(j, tmp_path):
 def test_missing_files_ok(tmp_path):
     j = Journal(str(tmp_path / "nope.jsonl"), str(tmp_path / "nope.offset"))
     assert j.pending() == [] and j.pending_count() == 0
+
+
+def test_offset_is_byte_position(j, tmp_path):
+    j.append("2026-07-06", "игры", 2.0, "bot")
+    j.append("2026-07-06", "мото", 1.0, "bot")
+    j.advance(1)
+    first_line = (tmp_path / "journal.jsonl").read_bytes().split(b"\n")[0]
+    assert json.loads((tmp_path / "journal.offset").read_text()) == {
+        "seg": 1, "pos": len(first_line) + 1}
+    assert [e["hobby"] for e in j.pending()] == ["мото"]
+
+
+def test_legacy_line_offset_migrated(j, tmp_path):
+    """Старый offset (число строк) читается как fallback и переписывается в байты"""
+    j.append("2026-07-06", "игры", 2.0, "bot")
+    j.append("2026-07-06", "мото", 1.0, "bot")
+    j.append("2026-07-06", "чтение", 0.5, "bot")
+    (tmp_path / "journal.offset").write_text("2")
+    j2 = Journal(str(tmp_path / "journal.jsonl"), str(tmp_path / "journal.offset"))
+    assert [e["hobby"] for e in j2.pending()] == ["чтение"]
+    pos = json.loads((tmp_path / "journal.offset").read_text())["pos"]
+    data = (tmp_path / "journal.jsonl").read_bytes()
+    assert decode_record(data[pos:])["hobby"] == "чтение"
+
+
+def test_legacy_byte_offset_without_segment(j, tmp_path):
+    j.append("2026-07-06", "игры", 2.0, "bot")
+    size = (tmp_path / "journal.jsonl").stat().st_size
+    j.append("2026-07-06", "мото", 1.0, "bot")
+    (tmp_path / "journal.offset").write_text(json.dumps({"pos": size}))
+    j2 = Journal(str(tmp_path / "journal.jsonl"), str(tmp_path / "journal.offset"))
+    assert [e["hobby"] for e in j2.pending()] == ["мото"]
+
+
+def test_advance_past_broken_tail_then_append(j, tmp_path):
+    j.append("2026-07-06", "игры", 2.0, "bot")
+    with open(tmp_path / "journal.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"обрыв')
+    entries, raw = j.pending_with_raw_count()
+    j.advance(raw)
+    j.append("2026-07-06", "мото", 1.0, "bot")
+    assert [e["hobby"] for e in j.pending()] == ["мото"]
+
+
+def test_pending_index_by_date_last_wins(j):
+    j.append("2026-07-06", "игры", 1.0, "bot")
+    j.append("2026-07-05", "мото", 2.0, "bot")
+    j.append("2026-07-06", "игры", 3.0, "miniapp")
+    assert j.pending_count() == 3
+    assert [(e["hobby"], e["hours"]) for e in j.pending_for("2026-07-06")] == [("игры", 3.0)]
+    assert j.pending_for("2026-01-01") == []
+
+
+def test_pending_index_trimmed_by_advance(j):
+    j.append("2026-07-06", "игры", 1.0, "bot")
+    j.append("2026-07-05", "мото", 2.0, "bot")
+    j.append("2026-07-06", "игры", 3.0, "bot")
+    j.advance(1)   # старое «игры» слито, победитель 3.0 ещё в хвосте
+    assert [e["hours"] for e in j.pending_for("2026-07-06")] == [3.0]
+    j.advance(2)
+    assert j.pending_for("2026-07-06") == [] and j.pending_for("2026-07-05") == []
+    assert j.pending_count() == 0
+
+
+def test_pending_index_rebuilt_on_restart(j, tmp_path):
+    j.append("2026-07-06", "игры", 1.0, "bot")
+    j.append("2026-07-06", "мото", 2.0, "bot")
+    j.advance(1)
+    j2 = Journal(str(tmp_path / "journal.jsonl"), str(tmp_path / "journal.offset"))
+    assert j2.pending_count() == 1
+    assert [e["hobby"] for e in j2.pending_for("2026-07-06")] == ["мото"]
+
+
+def test_group_commit_one_fsync_per_burst(j, tmp_path, monkeypatch):
+    fsyncs = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: (fsyncs.append(fd), real_fsync(fd)))
+
+    async def burst():
+        w = GroupCommitWriter(j, window_ms=20)
+        await asyncio.gather(*(w.append("2026-07-06", h, 1.0, "miniapp")
+                               for h in ("игры", "мото", "чтение")))
+        assert j.pending_count() == 3  # подтверждены — значит уже на диске
+        await w.stop()
+
+    asyncio.run(burst())
+    assert len(fsyncs) == 1
+    j2 = Journal(str(tmp_path / "journal.jsonl"), str(tmp_path / "journal.offset"))
+    assert [e["hobby"] for e in j2.pending()] == ["игры", "мото", "чтение"]
+
+
+def test_group_commit_failure_propagates(j, monkeypatch):
+    def boom(entries):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(j, "append_entries", boom)
+
+    async def go():
+        w = GroupCommitWriter(j, window_ms=1)
+        with pytest.raises(OSError):
+            await w.append("2026-07-06", "игры", 1.0, "bot")
+        await w.stop()
+
+    asyncio.run(go())
+
+
+@pytest.fixture
+def seg_j(tmp_path):
+    # Крошечный лимит: каждая запись в своём сегменте
+    return Journal(str(tmp_path / "journal.jsonl"), str(tmp_path / "journal.offset"),
+                   segment_bytes=1)
+
+
+def test_segments_rotate_and_replay(seg_j, tmp_path):
+    for h in ("игры", "мото", "чтение"):
+        seg_j.append("2026-07-06", h, 1.0, "bot")
+    assert sorted(p.name for p in tmp_path.glob("journal.0*.jsonl")) == [
+        "journal.000001.jsonl", "journal.000002.jsonl"]
+    manifest = json.loads((tmp_path / "journal.manifest.json").read_text())
+    assert manifest["active"] == 3 and [s["seq"] for s in manifest["segments"]] == [1, 2]
+    j2 = Journal(str(tmp_path / "journal.jsonl"), str(tmp_path / "journal.offset"), segment_bytes=1)
+    assert [e["hobby"] for e in j2.pending()] == ["игры", "мото", "чтение"]
+    entries, raw = j2.pending_with_raw_count()
+    assert raw == 3
+
+
+def test_synced_segments_dropped_while_tail_pending(seg_j, tmp_path):
+    for h in ("игры", "мото", "чтение"):
+        seg_j.append("2026-07-06", h, 1.0, "bot")
+    seg_j.advance(2)
+    seg_j.compact_if_synced()
+    assert list(tmp_path.glob("journal.0*.jsonl")) == []   # слитые сегменты убраны
+    assert [e["hobby"] for e in seg_j.pending()] == ["чтение"]
+    j2 = Journal(str(tmp_path / "journal.jsonl"), str(tmp_path / "journal.offset"), segment_bytes=1)
+    assert [e["hobby"] for e in j2.pending()] == ["чтение"]
+
+
+def test_synced_segments_archived(tmp_path):
+    j = Journal(str(tmp_path / "journal.jsonl"), str(tmp_path / "journal.offset"),
+                segment_bytes=1, archive_dir=str(tmp_path / "archive"))
+    j.append("2026-07-06", "игры", 1.0, "bot")
+    j.append("2026-07-06", "мото", 1.0, "bot")
+    j.advance(1)
+    j.compact_if_synced()
+    assert [p.name for p in (tmp_path / "archive").iterdir()] == ["journal.000001.jsonl"]
+
+
+def test_rotation_crash_before_rename_recovered(tmp_path):
+    """Манифест уже запечатал сегмент, а rename не успел — старт доделывает"""
+    j = Journal(str(tmp_path / "journal.jsonl"), str(tmp_path / "journal.offset"))
+    j.append("2026-07-06", "игры", 1.0, "bot")
+    (tmp_path / "journal.manifest.json").write_text(json.dumps(
+        {"active": 2, "segments": [{"seq": 1, "file": "journal.000001.jsonl"}]}))
+    j2 = Journal(str(tmp_path / "journal.jsonl"), str(tmp_path / "journal.offset"))
+    assert (tmp_path / "journal.000001.jsonl").exists()
+    assert [e["hobby"] for e in j2.pending()] == ["игры"]
+
+
+def test_coalesce_keeps_last_per_cell_and_offset(j, tmp_path):
+    j.append("2026-07-05", "мото", 9.0, "bot")          # уже слито
+    j.advance(1)
+    offset_before = (tmp_path / "journal.offset").read_text()
+    for hours in (1.0, 2.0, 3.0):
+        j.append("2026-07-06", "игры", hours, "miniapp")
+    j.append("2026-07-06", "мото", 1.0, "bot")
+    j.append("2026-07-06", "игры", 4.0, "miniapp")
+    assert j.superseded_count() == 3
+    assert j.coalesce() == 3
+    assert (tmp_path / "journal.offset").read_text() == offset_before
+    assert [(e["hobby"], e["hours"]) for e in j.pending()] == [("мото", 1.0), ("игры", 4.0)]
+    entries, raw = j.pending_with_raw_count()
+    assert raw == 2
+    j.append("2026-07-06", "чтение", 0.5, "bot")        # после coalesce журнал живёт дальше
+    j2 = Journal(str(tmp_path / "journal.jsonl"), str(tmp_path / "journal.offset"))
+    assert [(e["hobby"], e["hours"]) for e in j2.pending()] == [
+        ("мото", 1.0), ("игры", 4.0), ("чтение", 0.5)]
+    j2.advance(3)
+    j2.compact_if_synced()
+    assert j2.pending_count() == 0 and list(tmp_path.glob("journal.0*.jsonl")) == []
+
+
+def test_coalesce_noop_without_duplicates(j, tmp_path):
+    j.append("2026-07-06", "игры", 1.0, "bot")
+    j.append("2026-07-06", "мото", 1.0, "bot")
+    assert j.coalesce() == 0
+    assert j.coalesce(min_gain=0) == 0
+    assert [e["hobby"] for e in j.pending()] == ["игры", "мото"]
+
+
+def test_coalesce_crash_before_manifest_switch(j, tmp_path):
+    """Переписанный файл записан, манифест не переключён — старт берёт старый хвост"""
+    j.append("2026-07-06", "игры", 1.0, "bot")
+    j.append("2026-07-06", "игры", 2.0, "bot")
+    j.coalesce()
+    manifest = (tmp_path / "journal.manifest.json").read_text()
+    (tmp_path / "journal.000001.c2.jsonl").write_text("мусор недописанного coalesce\n")
+    j2 = Journal(str(tmp_path / "journal.jsonl"), str(tmp_path / "journal.offset"))
+    assert not (tmp_path / "journal.000001.c2.jsonl").exists()
+    assert (tmp_path / "journal.manifest.json").read_text() == manifest
+    assert [e["hours"] for e in j2.pending()] == [2.0]
+
+
+def test_record_checksum_detects_bit_flip(j, tmp_path):
+    j.append("2026-07-06", "игры", 2.0, "bot")
+    j.append("2026-07-06", "мото", 1.0, "bot")
+    data = bytearray((tmp_path / "journal.jsonl").read_bytes())
+    i = data.index("2.0".encode())
+    data[i] = ord("7")                       # JSON валиден, CRC — нет
+    (tmp_path / "journal.jsonl").write_bytes(bytes(data))
+    j2 = Journal(str(tmp_path / "journal.jsonl"), str(tmp_path / "journal.offset"))
+    assert [e["hobby"] for e in j2.pending()] == ["мото"]
+    assert j2.pending_with_raw_count()[1] == 2
+
+
+def test_legacy_plain_json_lines_still_read(j, tmp_path):
+    (tmp_path / "journal.jsonl").write_text(
+        '{"date": "2026-07-06", "hobby": "игры", "hours": 2.0}\n', encoding="utf-8")
+    j2 = Journal(str(tmp_path / "journal.jsonl"), str(tmp_path / "journal.offset"))
+    assert [e["hobby"] for e in j2.pending()] == ["игры"]
+
+
+def test_verify_reports_and_quarantines(j, tmp_path):
+    j.append("2026-07-06", "игры", 2.0, "bot")
+    with open(tmp_path / "journal.jsonl", "ab") as f:
+        f.write(encode_record({"date": "x", "hobby": "y", "hours": 1})[:-9])  # оборванная запись
+    good_end = len(encode_record(j.pending()[0]))
+    size = (tmp_path / "journal.jsonl").stat().st_size
+    damaged = j.verify()
+    assert damaged == [(str(tmp_path / "journal.jsonl"), good_end, size)]
+    j.verify(quarantine=True)
+    assert (tmp_path / "journal.jsonl").stat().st_size == size      # offset'ы не сдвинулись
+    assert j.verify() == []
+    q = [json.loads(ln) for ln in (tmp_path / "journal.quarantine.jsonl").read_text().splitlines()]
+    assert q[0]["file"] == "journal.jsonl" and q[0]["end"] == size
+    j.append("2026-07-06", "мото", 1.0, "bot")
+    j2 = Journal(str(tmp_path / "journal.jsonl"), str(tmp_path / "journal.offset"))
+    assert [e["hobby"] for e in j2.pending()] == ["игры", "мото"]
+
+
+def test_open_verifies_tail_before_index(j, tmp_path):
+    j.append("2026-07-06", "игры", 2.0, "bot")
+    with open(tmp_path / "journal.jsonl", "ab") as f:
+        f.write(encode_record({"date": "x", "hobby": "y", "hours": 1})[:-9])
+    size = (tmp_path / "journal.jsonl").stat().st_size
+    path = (str(tmp_path / "journal.jsonl"), str(tmp_path / "journal.offset"))
+    j2 = Journal(*path, verify_tail=True)   # по умолчанию только лог
+    assert not (tmp_path / "journal.quarantine.jsonl").exists()
+    assert [e["hobby"] for e in j2.pending()] == ["игры"]
+    j3 = Journal(*path, verify_tail=True, quarantine=True)
+    assert (tmp_path / "journal.quarantine.jsonl").exists()
+    assert (tmp_path / "journal.jsonl").stat().st_size == size
+    assert j3.verify() == [] and [e["hobby"] for e in j3.pending()] == ["игры"]
@@ -0,0 +1,26 @@
+from src.utils.metrics import Registry
+
+
+def test_prometheus_text_format():
+    reg = Registry()
+    c = reg.counter("t_calls_total", "calls")
+    h = reg.histogram("t_seconds", "latency", (0.1, 1))
+    c.inc(method="update")
+    c.inc(2, method="update")
+    h.observe(0.1, method="get")     # граница бакета — включительно (le)
+    h.observe(5, method="get")
+    text = reg.render()
+    assert 't_calls_total{method="update"} 3' in text
+    assert 't_seconds_bucket{method="get",le="0.1"} 1' in text
+    assert 't_seconds_bucket{method="get",le="1"} 1' in text
+    assert 't_seconds_bucket{method="get",le="+Inf"} 2' in text
+    assert 't_seconds_sum{method="get"} 5.1' in text
+    assert "# TYPE t_seconds histogram" in text
+
+
+def test_counter_total_filters_labels():
+    c = Registry().counter("t_total", "calls")
+    c.inc(2, method="batch_get")
+    c.inc(3, method="async_batch_get")
+    assert c.total() == 5
+    assert c.total(lambda labels: not labels["method"].startswith("async_")) == 2
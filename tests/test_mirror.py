@@ -0,0 +1,150 @@
+import asyncio
+
+import pytest
+
+from src.data.fake_sheets import FakeWorksheet
+from src.data.journal import Journal
+from src.data.mirror import SQLiteMirror
+from src.data.sheets import SheetsManager
+from src.data.sync_worker import SyncWorker
+
+
+def make_journal(tmp_path, **kw):
+    return Journal(str(tmp_path / "j.jsonl"), str(tmp_path / "j.offset"), **kw)
+
+
+def test_mirror_upsert_and_reads(tmp_path):
+    m = SQLiteMirror(str(tmp_path / "h.db"))
+    m.bootstrap({"2026-07-01": {"игры": 1.0}, "2026-07-02": {"мото": 2.0}})
+    m.write_days({"2026-07-02": {"мото": 3.0, "игры": 0.5}})
+    assert m.get_days(["2026-07-02", "2026-07-09"]) == {
+        "2026-07-02": {"мото": 3.0, "игры": 0.5}, "2026-07-09": {}}
+    assert list(m.get_range("2026-07-01", "2026-07-31")) == ["2026-07-01", "2026-07-02"]
+    # bootstrap не перетирает записанное журналом
+    m.bootstrap({"2026-07-02": {"мото": 9.0}})
+    assert m.get_days(["2026-07-02"])["2026-07-02"]["мото"] == 3.0
+    assert m.is_bootstrapped()
+    m.close()
+    assert SQLiteMirror(str(tmp_path / "h.db")).get_days(["2026-07-01"]) == {"2026-07-01": {"игры": 1.0}}
+
+
+def test_targets_have_independent_cursors(tmp_path):
+    j = make_journal(tmp_path)
+    cur = j.cursor("mirror")
+    m = SQLiteMirror(str(tmp_path / "h.db"))
+    j.append("2026-07-06", "игры", 2.0, "bot")
+
+    def sheets_down(batch):
+        raise RuntimeError("sheets down")
+
+    sheets = SyncWorker(j, asyncio.Event(), None, asyncio.Lock(), write_days=sheets_down)
+    local = SyncWorker(cur, asyncio.Event(), None, asyncio.Lock(), write_days=m.write_days,
+                       name="mirror")
+    assert asyncio.run(sheets.drain()) is False
+    assert asyncio.run(local.drain()) is True      # Sheets лежит — зеркало не ждёт
+    assert m.get_days(["2026-07-06"])["2026-07-06"] == {"игры": 2.0}
+    assert j.pending_count() == 1 and cur.pending_count() == 0
+
+    # Курсор переживает рестарт
+    j2 = make_journal(tmp_path)
+    assert j2.cursor("mirror").pending_count() == 0 and j2.pending_count() == 1
+
+
+def test_segments_kept_for_lagging_target(tmp_path):
+    j = make_journal(tmp_path, segment_bytes=1)       # ротация на каждом append
+    cur = j.cursor("mirror")
+    for h in range(3):
+        j.append("2026-07-06", f"h{h}", 1.0, "bot")
+    j.advance(3)
+    j.compact_if_synced()
+    assert len(j.segments()) > 1                      # зеркало ещё не прочитало
+    entries, raw = cur.pending_with_raw_count()
+    assert [e["hobby"] for e in entries] == ["h0", "h1", "h2"]
+    cur.advance(raw)
+    cur.compact_if_synced()
+    assert j.segments() == [j.journal_path]
+
+
+def test_coalesce_remaps_target_cursor(tmp_path):
+    j = make_journal(tmp_path)
+    cur = j.cursor("mirror")
+    for hours in (1.0, 2.0):
+        j.append("2026-07-06", "игры", hours, "bot")
+    entries, raw = cur.pending_with_raw_count()
+    cur.advance(raw)                                  # зеркало видело обе
+    j.append("2026-07-06", "игры", 3.0, "bot")
+    j.append("2026-07-05", "мото", 1.0, "bot")
+    assert j.coalesce() == 2
+    entries, _ = cur.pending_with_raw_count()
+    assert [(e["hobby"], e["hours"]) for e in entries] == [("игры", 3.0), ("мото", 1.0)]
+
+
+def test_stale_snapshot_not_acked_after_coalesce(tmp_path):
+    j = make_journal(tmp_path)
+    cur = j.cursor("mirror")
+    for hours in (1.0, 2.0, 3.0):
+        j.append("2026-07-06", "игры", hours, "bot")
+    _, raw = cur.pending_with_raw_count()
+    j.coalesce()                                      # хвост переписан между чтением и ack
+    cur.advance(raw)
+    entries, _ = cur.pending_with_raw_count()
+    assert [e["hours"] for e in entries] == [3.0]     # перечитали, ничего не потеряно
+
+
+@pytest.fixture
+def rt(tmp_path, monkeypatch):
+    import src.runtime as runtime
+    monkeypatch.setattr(runtime, "JOURNAL_FILE", str(tmp_path / "j.jsonl"))
+    monkeypatch.setattr(runtime, "JOURNAL_OFFSET_FILE", str(tmp_path / "j.offset"))
+    monkeypatch.setattr(runtime, "DAYCACHE_FILE", str(tmp_path / "days.json"))
+    monkeypatch.setattr(runtime, "DAYCACHE_WARM_DIR", str(tmp_path / "warm"))
+    monkeypatch.setattr(runtime, "MIRROR_DB", str(tmp_path / "h.db"))
+    monkeypatch.setattr(runtime, "MIRROR_RECENT_ROWS", 2)
+    monkeypatch.setattr(runtime, "save_hobby_to_history", lambda h: None)
+    monkeypatch.setattr(runtime, "_in_window", lambda date, window=7: False)
+    ws = FakeWorksheet([["Дата", "игры"], ["2020-01-01", "1"], ["2026-07-05", "2"], ["2026-07-06", "3"]])
+    manager = SheetsManager(ws=ws)
+    monkeypatch.setattr(runtime, "get_sheets_manager", lambda: manager)
+    runtime.init_runtime()
+    asyncio.run(runtime.bootstrap_mirror())
+    runtime.ws = ws
+    yield runtime
+    runtime.mirror.close()
+
+
+def test_reads_served_from_mirror(rt):
+    rt.ws.call_log.clear()
+    assert asyncio.run(rt.get_day_values("2020-01-01")) == {"игры": 1.0}
+    assert asyncio.run(rt.get_day_values("2026-07-05")) == {"игры": 2.0}
+    assert asyncio.run(rt.get_day_values("2026-07-07")) == {}
+    assert rt.ws.call_log == []                       # ни одного запроса к Sheets
+
+
+def test_refresh_picks_up_manual_edits(rt):
+    rt.ws.rows[3][1] = "5"                            # правка в последних строках
+    rt.ws.rows.append(["2026-07-07", "4"])            # новая строка руками
+    del rt.ws.rows[1]                                 # удалённая старая строка
+    changed = asyncio.run(rt.refresh_mirror())
+    assert sorted(changed) == ["2020-01-01", "2026-07-06", "2026-07-07"]
+    assert rt.mirror.get_days(["2026-07-06", "2026-07-07", "2020-01-01"]) == {
+        "2026-07-06": {"игры": 5.0}, "2026-07-07": {"игры": 4.0}, "2020-01-01": {}}
+    rt.ws.call_log.clear()
+    assert asyncio.run(rt.refresh_mirror()) == []
+    assert "get_all_values" not in rt.ws.call_log    # дешёвая проверка, не весь лист
+
+
+def test_refresh_skips_dates_with_pending_journal(rt):
+    asyncio.run(rt.record_entry("2026-07-06", "игры", 7.0, "bot"))
+    rt.mirror.write_days({"2026-07-06": {"игры": 7.0}})   # зеркало впереди Sheets
+    assert "2026-07-06" not in asyncio.run(rt.refresh_mirror(full=True))
+    assert rt.mirror.get_days(["2026-07-06"])["2026-07-06"] == {"игры": 7.0}
+
+
+def test_history_from_mirror_follows_writes(rt):
+    rt.ws.call_log.clear()
+    hist = asyncio.run(rt.get_history())
+    assert hist.totals("2026-07-06", 2) == {"игры": 5.0}
+    asyncio.run(rt.record_entry("2026-07-06", "мото", 1.5, "bot"))
+    assert asyncio.run(rt.get_history()) is hist             # не перестраивается
+    assert hist.totals("2026-07-06", 1) == {"игры": 3.0, "мото": 1.5}
+    assert rt.ws.call_log == []
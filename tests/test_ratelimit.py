@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+
+from src.data.ratelimit import LimitedWorksheet, Priority, RateLimiter, retry_after, sheets_priority
+
+
+class HttpError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.response = type("R", (), {"status_code": status, "headers": headers or {}})()
+
+
+def test_burst_then_throttled():
+    lim = RateLimiter(per_minute=600, burst=2)   # 10/с
+    t0 = time.monotonic()
+    for _ in range(3):
+        lim.acquire()
+    assert time.monotonic() - t0 >= 0.08
+    assert lim.stats()["calls"] == 3 and lim.stats()["throttled"] == 1
+
+
+def test_priority_order_when_waiting():
+    lim = RateLimiter(per_minute=6000, burst=1)
+    lim.pause(0.2)                 # все встают в очередь
+    order = []
+
+    def worker(p, name):
+        lim.acquire(p)
+        order.append(name)
+
+    threads = [threading.Thread(target=worker, args=(Priority.BACKGROUND, "reconcile"))]
+    threads[0].start()
+    time.sleep(0.05)
+    for p, name in ((Priority.INTERACTIVE, "stats"), (Priority.SYNC, "sync")):
+        threads.append(threading.Thread(target=worker, args=(p, name)))
+        threads[-1].start()
+    time.sleep(0.05)
+    for t in threads:
+        t.join()
+    assert order == ["sync", "stats", "reconcile"]
+
+
+def test_429_retry_after_pauses_and_retries(monkeypatch):
+    lim = RateLimiter(per_minute=6000, burst=5, base_backoff=0.01)
+    calls = []
+
+    def flaky():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise HttpError(429, {"Retry-After": "0.1"})
+        return "ok"
+
+    assert lim.call(flaky) == "ok"
+    assert calls[1] - calls[0] >= 0.1
+    st = lim.stats()
+    assert st["http_429"] == 1 and st["retries"] == 1
+
+
+def test_non_retryable_raises_immediately():
+    lim = RateLimiter(per_minute=6000, burst=5)
+
+    def bad():
+        raise HttpError(400)
+
+    with pytest.raises(HttpError):
+        lim.call(bad)
+    assert lim.stats()["failures"] == 1 and lim.stats()["retries"] == 0
+
+
+def test_gives_up_after_max_retries():
+    lim = RateLimiter(per_minute=6000, burst=10, max_retries=2, base_backoff=0.001)
+    n = []
+
+    def down():
+        n.append(1)
+        raise HttpError(503)
+
+    with pytest.raises(HttpError):
+        lim.call(down)
+    assert len(n) == 3
+
+
+def test_retry_after_parsing():
+    assert retry_after(HttpError(429, {"Retry-After": "7"})) == 7.0
+    assert retry_after(HttpError(429)) is None
+    assert retry_after(RuntimeError("x")) is None
+
+
+def test_limited_worksheet_routes_api_calls_with_context_priority():
+    seen = []
+
+    class Lim(RateLimiter):
+        def acquire(self, priority=None):
+            from src.data.ratelimit import _priority
+            seen.append(_priority.get())
+
+    class WS:
+        title = "Данные"
+
+        def row_values(self, i):
+            return ["Дата"]
+
+    ws = LimitedWorksheet(WS(), Lim())
+    assert ws.title == "Данные" and seen == []
+    with sheets_priority(Priority.BACKGROUND):
+        assert ws.row_values(1) == ["Дата"]
+    assert seen == [Priority.BACKGROUND]
+
+
+def test_limited_worksheet_append_not_retried_on_5xx():
+    class WS:
+        def __init__(self, status):
+            self.status, self.calls = status, 0
+
+        def append_rows(self, values):
+            self.calls += 1
+            if self.calls == 1:
+                raise HttpError(self.status)
+            return {}
+
+    lim = RateLimiter(per_minute=6000, burst=10, base_backoff=0.001)
+    ws = WS(503)
+    with pytest.raises(HttpError):
+        LimitedWorksheet(ws, lim).append_rows([["2026-07-06"]])   # строка могла лечь — не задваиваем
+    assert ws.calls == 1
+    ws = WS(429)
+    assert LimitedWorksheet(ws, lim).append_rows([["2026-07-06"]]) == {}
+    assert ws.calls == 2
@@ -4,12 +4,15 @@ import pytest
 
 import src.runtime as runtime
 
+REAL_IN_WINDOW = runtime._in_window
+
 
 @pytest.fixture
 def rt(tmp_path, monkeypatch):
     monkeypatch.setattr(runtime, "JOURNAL_FILE", str(tmp_path / "j.jsonl"))
     monkeypatch.setattr(runtime, "JOURNAL_OFFSET_FILE", str(tmp_path / "j.offset"))
     monkeypatch.setattr(runtime, "DAYCACHE_FILE", str(tmp_path / "days.json"))
+    monkeypatch.setattr(runtime, "DAYCACHE_WARM_DIR", str(tmp_path / "warm"))
     monkeypatch.setattr(runtime, "save_hobby_to_history", lambda h: None)
     # Тестовые даты фиксированные — окно кэша не должно зависеть от реального «сегодня»
     monkeypatch.setattr(runtime, "_in_window", lambda date, window=7: True)
@@ -18,7 +21,7 @@ def rt(tmp_path, monkeypatch):
 
 
 def test_record_entry_journal_and_cache(rt):
-    n = rt.record_entry("2026-07-06", "игры", 2.0, "miniapp")
+    n = asyncio.run(rt.record_entry("2026-07-06", "игры", 2.0, "miniapp"))
     assert n == 1
     assert rt.journal.pending()[0]["hobby"] == "игры"
     assert rt.cache.get("2026-07-06") == {"игры": 2.0}
@@ -27,7 +30,7 @@ def test_record_entry_journal_and_cache(rt):
 
 def test_get_day_values_from_cache_with_overlay(rt):
     rt.cache.set("2026-07-06", {"мото": 1.0})
-    rt.record_entry("2026-07-06", "игры", 2.0, "bot")
+    asyncio.run(rt.record_entry("2026-07-06", "игры", 2.0, "bot"))
     out = asyncio.run(rt.get_day_values("2026-07-06"))
     assert out == {"мото": 1.0, "игры": 2.0}
 
@@ -38,8 +41,8 @@ def test_reconcile_cache_pulls_sheets_and_prunes(rt, monkeypatch):
     rt.cache.set("2020-01-01", {"мото": 1.0})
     monkeypatch.setattr(rt, "date_for_time", lambda *a: "2026-07-06")
     monkeypatch.setattr(
-        rt, "_fetch_days_strict",
-        lambda dates: {d: ({"игры": 2.0} if d == "2026-07-05" else {}) for d in dates})
+        rt, "_fetch_rows_strict",
+        lambda dates, fresh: (["Дата", "Игры"], {"2026-07-05": ["2026-07-05", "2"]}))
     asyncio.run(rt.reconcile_cache())
     assert rt.cache.get("2026-07-05") == {"игры": 2.0}   # Sheets победил
     assert rt.cache.get("2020-01-01") is None             # prune сработал
@@ -48,19 +51,39 @@ def test_reconcile_cache_pulls_sheets_and_prunes(rt, monkeypatch):
 def test_reconcile_cache_failure_keeps_cache(rt, monkeypatch):
     rt.cache.set("2026-07-05", {"игры": 9.0})
 
-    def boom(dates):
+    def boom(dates, fresh):
         raise RuntimeError("sheets down")
 
-    monkeypatch.setattr(rt, "_fetch_days_strict", boom)
+    monkeypatch.setattr(rt, "_fetch_rows_strict", boom)
     asyncio.run(rt.reconcile_cache())
     assert rt.cache.get("2026-07-05") == {"игры": 9.0}   # не затёрто пустотой
 
 
+def test_reconcile_applies_only_changed_rows_and_skips_pending(rt, monkeypatch):
+    monkeypatch.setattr(rt, "date_for_time", lambda *a: "2026-07-06")
+    sheet = {"2026-07-05": ["2026-07-05", "2"], "2026-07-06": ["2026-07-06", "1"]}
+    monkeypatch.setattr(rt, "_fetch_rows_strict", lambda dates, fresh: (["Дата", "Игры"], dict(sheet)))
+    first = asyncio.run(rt.reconcile_cache())
+    assert set(first) == set(rt.cache._data)                 # всё окно: отпечатков ещё нет
+
+    sets = []
+    real_set = rt.cache.set
+    monkeypatch.setattr(rt.cache, "set", lambda *a, **kw: (sets.append(a[0]), real_set(*a, **kw)))
+    assert asyncio.run(rt.reconcile_cache(fresh=False)) == []   # ничего не менялось — ничего не пишем
+    assert sets == []
+
+    sheet["2026-07-05"] = ["2026-07-05", "3"]                # ручная правка
+    sheet["2026-07-06"] = ["2026-07-06", "5"]
+    asyncio.run(rt.record_entry("2026-07-06", "мото", 1.0, "bot"))   # ещё не слито
+    assert asyncio.run(rt.reconcile_cache(fresh=False)) == ["2026-07-05"]
+    assert rt.cache.get("2026-07-05") == {"игры": 3.0}
+
+
 def test_get_day_values_miss_fetches_sheets(rt, monkeypatch):
     calls = []
 
     class FakeSheets:
-        def get_day_data(self, date):
+        def get_day_data_strict(self, date):
             calls.append(date)
             return {"чтение": 0.5}
 
@@ -68,3 +91,228 @@ def test_get_day_values_miss_fetches_sheets(rt, monkeypatch):
     out = asyncio.run(rt.get_day_values("2026-07-01"))
     assert out == {"чтение": 0.5}
     assert calls == ["2026-07-01"]
+
+
+def test_get_day_values_failure_not_cached(rt, monkeypatch):
+    calls = []
+
+    class FlakySheets:
+        def get_day_data_strict(self, date):
+            calls.append(date)
+            if len(calls) == 1:
+                raise RuntimeError("503")
+            return {"чтение": 0.5}
+
+    monkeypatch.setattr(rt, "get_sheets_manager", lambda: FlakySheets())
+    monkeypatch.setattr(rt, "_in_window", lambda date, window=7: False)
+    asyncio.run(rt.record_entry("2020-01-01", "игры", 1.0, "bot"))
+    assert asyncio.run(rt.get_day_values("2020-01-01")) == {"игры": 1.0}   # сбой — только журнал
+    assert "2020-01-01" not in rt.lru
+    assert asyncio.run(rt.get_day_values("2020-01-01")) == {"чтение": 0.5, "игры": 1.0}
+    assert calls == ["2020-01-01", "2020-01-01"]
+
+
+def test_out_of_window_dates_cached_in_lru(rt, monkeypatch):
+    calls = []
+
+    class FakeSheets:
+        def get_day_data_strict(self, date):
+            calls.append(date)
+            return {"чтение": 0.5}
+
+    monkeypatch.setattr(rt, "get_sheets_manager", lambda: FakeSheets())
+    monkeypatch.setattr(rt, "_in_window", lambda date, window=7: False)
+    asyncio.run(rt.get_day_values("2020-01-01"))
+    asyncio.run(rt.record_entry("2020-01-01", "игры", 1.0, "bot"))
+    assert asyncio.run(rt.get_day_values("2020-01-01")) == {"чтение": 0.5, "игры": 1.0}
+    assert calls == ["2020-01-01"]                     # второй раз — из LRU
+    rt.journal.advance(1)                              # запись слита — из кэша не пропала
+    assert asyncio.run(rt.get_day_values("2020-01-01")) == {"чтение": 0.5, "игры": 1.0}
+    assert rt.lru.stats["hits"] == 2
+
+
+def test_concurrent_misses_share_one_fetch(rt, monkeypatch):
+    import time
+    calls = []
+
+    class FakeSheets:
+        def get_day_data_strict(self, date):
+            calls.append(("day", date))
+            time.sleep(0.05)
+            return {"чтение": 0.5}
+
+        def get_days_strict(self, dates):
+            calls.append(("window", tuple(dates)))
+            time.sleep(0.05)
+            return {d: {"игры": 1.0} for d in dates}
+
+    monkeypatch.setattr(rt, "get_sheets_manager", lambda: FakeSheets())
+    monkeypatch.setattr(rt, "_in_window", lambda date, window=7: False)
+
+    async def scenario():
+        return await asyncio.gather(
+            rt.get_day_values("2020-01-01"), rt.get_day_values("2020-01-01"),
+            rt._prefetch(["2020-01-01", "2020-01-02"]),
+            rt._prefetch(["2020-01-02", "2020-01-03"]))
+
+    day1, day2, _, _ = asyncio.run(scenario())
+    assert day1 == day2 == {"чтение": 0.5}
+    assert rt.lru.get("2020-01-02") == rt.lru.get("2020-01-03") == {"игры": 1.0}
+    # Один запрос на день + окно только по недостающим датам (чтения параллельны — порядок любой)
+    assert sorted(calls) == [("day", "2020-01-01"), ("window", ("2020-01-02",)), ("window", ("2020-01-03",))]
+    assert rt.flights.shared == 3
+
+
+def test_rwlock_readers_share_writer_exclusive_and_preferred():
+    lock = runtime.RWLock()
+    log = []
+
+    async def read(name, hold=0.02):
+        async with lock.reader:
+            log.append(("in", name))
+            await asyncio.sleep(hold)
+            log.append(("out", name))
+
+    async def write(name):
+        async with lock.writer:
+            assert lock.readers == 0
+            log.append(("in", name))
+            await asyncio.sleep(0.01)
+            log.append(("out", name))
+
+    async def scenario():
+        r1 = asyncio.create_task(read("r1"))
+        r2 = asyncio.create_task(read("r2"))
+        await asyncio.sleep(0)
+        assert lock.readers == 2                 # чтения параллельно
+        w = asyncio.create_task(write("w"))
+        await asyncio.sleep(0)
+        r3 = asyncio.create_task(read("r3"))     # пришло после ждущей записи — ждёт её
+        await asyncio.gather(r1, r2, w, r3)
+
+    asyncio.run(scenario())
+    assert log.index(("in", "w")) > log.index(("out", "r1"))
+    assert log.index(("in", "r3")) > log.index(("out", "w"))
+
+
+def test_rwlock_cancelled_writer_releases_readers():
+    lock = runtime.RWLock()
+
+    async def scenario():
+        await lock.reader.__aenter__()
+        w = asyncio.create_task(lock.writer.__aenter__())
+        await asyncio.sleep(0)
+        r = asyncio.create_task(lock.reader.__aenter__())
+        await asyncio.sleep(0)
+        assert not r.done()                      # ждёт из-за писателя
+        w.cancel()
+        await asyncio.sleep(0)
+        await asyncio.wait_for(r, 1)             # писатель ушёл — чтение пущено
+        assert lock.readers == 2 and not lock.writing
+
+    asyncio.run(scenario())
+
+
+def test_prefetch_follows_direction_into_lru(rt, monkeypatch):
+    fetched = []
+
+    class FakeSheets:
+        def get_days_strict(self, dates):
+            fetched.append(tuple(dates))
+            return {d: {"игры": 1.0} for d in dates}
+
+    monkeypatch.setattr(rt, "get_sheets_manager", lambda: FakeSheets())
+    monkeypatch.setattr(rt, "_in_window", lambda date, window=7: False)
+    monkeypatch.setattr(rt, "PREFETCH_DAYS", 2)
+
+    async def scenario():
+        rt.prefetch_around("2020-01-10")          # первый запрос — в обе стороны
+        await asyncio.gather(*rt._prefetching)
+        rt.prefetch_around("2020-01-09")          # листаем назад
+        await asyncio.gather(*rt._prefetching)
+
+    asyncio.run(scenario())
+    assert fetched == [("2020-01-08", "2020-01-09", "2020-01-11", "2020-01-12"), ("2020-01-07",)]
+    assert "2020-01-07" in rt.lru and "2020-01-11" in rt.lru
+    assert rt.lru.stats["misses"] == 0          # проверки префетча не портят статистику
+
+
+def test_prefetch_failure_caches_nothing(rt, monkeypatch):
+    class DownSheets:
+        def get_days_strict(self, dates):
+            raise RuntimeError("503")
+
+    monkeypatch.setattr(rt, "get_sheets_manager", lambda: DownSheets())
+    monkeypatch.setattr(rt, "_in_window", lambda date, window=7: False)
+    monkeypatch.setattr(rt, "PREFETCH_DAYS", 1)
+
+    async def scenario():
+        rt.prefetch_around("2020-01-10")
+        await asyncio.gather(*rt._prefetching)
+
+    asyncio.run(scenario())
+    assert len(rt.lru) == 0
+
+
+def test_reader_joining_failed_prefetch_caches_nothing(rt, monkeypatch):
+    import time
+
+    class DownSheets:
+        def get_days_strict(self, dates):
+            time.sleep(0.05)
+            raise RuntimeError("503")
+
+        def get_day_data_strict(self, date):
+            raise AssertionError("должно было присоединиться к префетчу")
+
+    monkeypatch.setattr(rt, "get_sheets_manager", lambda: DownSheets())
+    monkeypatch.setattr(rt, "_in_window", lambda date, window=7: False)
+
+    async def scenario():
+        prefetch = asyncio.create_task(rt._prefetch(["2020-01-01"]))
+        await asyncio.sleep(0)
+        day = await rt.get_day_values("2020-01-01")   # ждёт тот же in-flight запрос
+        await prefetch
+        return day
+
+    assert asyncio.run(scenario()) == {}
+    assert rt.flights.shared == 1 and len(rt.lru) == 0
+
+
+def test_tiers_hot_warm_lru_and_demotion(rt, monkeypatch, tmp_path):
+    monkeypatch.setattr(rt, "_in_window", REAL_IN_WINDOW)
+    monkeypatch.setattr(rt, "date_for_time", lambda *a: "2026-07-06")
+    assert rt.warm is not None and rt.warm.days_window == 90
+    fetched = []
+
+    class FakeSheets:
+        def get_day_data_strict(self, date):
+            fetched.append(date)
+            return {"игры": 1.0}
+
+    monkeypatch.setattr(rt, "get_sheets_manager", lambda: FakeSheets())
+    assert rt._tier("2026-07-01") is rt.cache and rt._tier("2026-05-01") is rt.warm
+    assert rt._tier("2025-01-01") is None
+
+    asyncio.run(rt.get_day_values("2026-05-01"))             # промах → тёплый уровень
+    asyncio.run(rt.warm.close())                             # write-behind → на диск
+    assert (tmp_path / "warm" / "2026-05.json").exists()
+    asyncio.run(rt.record_entry("2026-05-01", "мото", 2.0, "bot"))
+    assert rt.warm.get("2026-05-01") == {"игры": 1.0, "мото": 2.0}
+    assert asyncio.run(rt.get_day_values("2026-05-01")) == {"игры": 1.0, "мото": 2.0}
+    assert fetched == ["2026-05-01"]
+
+    rt.cache.set("2026-06-20", {"спорт": 1.0}, row_hash="h")   # выпал из горячего окна
+    monkeypatch.setattr(rt, "_fetch_rows_strict", lambda dates, fresh: (["Дата"], {}))
+    rt.journal.advance(1)
+    asyncio.run(rt.reconcile_cache())
+    assert rt.cache.get("2026-06-20") is None
+    assert "2026-06-20" in rt.warm                            # спущен в тёплый и сверен
+
+
+def test_collect_metrics_without_ts(rt, tmp_path):
+    (tmp_path / "j.jsonl").write_text(
+        '{"date": "2026-07-06", "hobby": "игры", "hours": 2.0}\n', encoding="utf-8")   # старая строка
+    rt.init_runtime()
+    text = rt.collect_metrics()
+    assert "hobby_journal_pending_entries 1" in text
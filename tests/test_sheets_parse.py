@@ -36,3 +36,16 @@ def test_parse_days_normalizes_header_keys():
     assert parse_days(vals, ["2026-07-04"]) == {
         "2026-07-04": {"книги ru": 5.0, "елки": 1.0}
     }
+
+
+def test_parse_days_last_row_of_date_wins_and_backfill_found():
+    vals = ALL_VALUES + [["2026-07-04", "7"], ["2026-01-01", "1"]]   # дубль даты + строка задним числом
+    out = parse_days(vals, ["2026-07-04", "2026-01-01"])
+    assert out == {"2026-07-04": {"игры": 7.0}, "2026-01-01": {"игры": 1.0}}
+
+
+def test_parse_rows_compact():
+    from src.data.sheets import parse_rows
+    keys, rows = parse_rows(ALL_VALUES, ["2026-07-04", "2026-07-06", "2026-01-01"])
+    assert keys == ["дата", "игры", "мото", "спортзал"]
+    assert rows == {"2026-07-04": [(1, 2.0), (3, 1.5)], "2026-07-06": []}
@@ -0,0 +1,175 @@
+import pytest
+
+from src.data.fake_sheets import FakeWorksheet
+from src.data.sheets import SheetsManager, appended_first_row
+
+
+def make_manager(ws):
+    return SheetsManager(ws=ws)   # без кредов и сети
+
+
+@pytest.fixture
+def ws():
+    return FakeWorksheet([["Дата", "игры"], ["2026-07-04", "1"]])
+
+
+def test_write_days_constant_round_trips(ws):
+    m = make_manager(ws)
+    batch = {
+        "2026-07-04": {"игры": 2.0},
+        "2026-07-05": {"мото": 1.5, "игры": 1.0},
+        "2026-07-06": {"мото": 3.0},
+    }
+    headers, rows = m.write_days(batch)
+    assert headers == ["Дата", "игры", "мото"]
+    assert rows == {"2026-07-04": 2, "2026-07-05": 3, "2026-07-06": 4}
+    assert ws.rows == [
+        ["Дата", "игры", "мото"],
+        ["2026-07-04", "2"],
+        ["2026-07-05", "1", "1.5"],
+        ["2026-07-06", "", "3"],
+    ]
+    # заголовки (перечитаны перед добавлением колонки), колонка A, одна вставка строк, одна запись ячеек
+    assert ws.call_log == ["row_values", "row_values", "update", "col_values",
+                           "append_rows", "batch_update"]
+
+
+def test_write_values_single_date_keeps_contract(ws):
+    m = make_manager(ws)
+    headers, row_idx = m.write_values({"игры": 3.0}, "2026-07-04")
+    assert row_idx == 2 and ws.rows[1] == ["2026-07-04", "3"]
+    assert "append_rows" not in ws.call_log
+
+
+def test_appended_first_row():
+    assert appended_first_row({"updates": {"updatedRange": "'Данные'!A101:A103"}}) == 101
+    assert appended_first_row({}) is None
+
+
+def test_layout_cached_write_is_check_and_update(ws):
+    m = make_manager(ws)
+    m.write_days({"2026-07-04": {"игры": 2.0}})
+    ws.call_log.clear()
+    m.write_days({"2026-07-04": {"игры": 3.0}})
+    assert ws.call_log == ["batch_get", "batch_update"]   # сверка раскладки + запись
+    m.write_days({"2026-07-05": {"игры": 1.0}})   # своя новая строка — кэш обновлён локально
+    ws.call_log.clear()
+    m.write_days({"2026-07-05": {"игры": 2.0}})
+    assert ws.call_log == ["batch_get", "batch_update"]
+    assert ws.rows[2] == ["2026-07-05", "2"]
+
+
+def test_write_rechecks_layout_after_manual_column(ws):
+    m = make_manager(ws)
+    m.write_days({"2026-07-04": {"игры": 2.0}})
+    for row in ws.rows:                            # колонку вставили руками перед «игры»
+        row.insert(1, "Заметки" if row[0] == "Дата" else "")
+    m.write_days({"2026-07-04": {"игры": 3.0}})
+    assert ws.rows[:2] == [["Дата", "Заметки", "игры"], ["2026-07-04", "", "3"]]
+
+
+def test_write_rechecks_layout_after_deleted_row():
+    ws = FakeWorksheet([["Дата", "игры"], ["2026-07-03", "1"], ["2026-07-04", "2"]])
+    m = make_manager(ws)
+    m.write_days({"2026-07-04": {"игры": 2.0}})
+    del ws.rows[1]                                 # строку удалили руками: 07-04 съехала вверх
+    m.write_days({"2026-07-04": {"игры": 5.0}})
+    assert ws.rows == [["Дата", "игры"], ["2026-07-04", "5"]]
+
+
+def test_layout_reset_when_append_lands_elsewhere(ws):
+    m = make_manager(ws)
+    m.write_days({"2026-07-04": {"игры": 2.0}})
+    ws.rows.append(["2026-07-05", "9"])           # ручная строка в таблице
+    headers, rows = m.write_days({"2026-07-06": {"игры": 1.0}})
+    assert rows["2026-07-06"] == 4 and ws.rows[3] == ["2026-07-06", "1"]
+    ws.call_log.clear()
+    assert m.find_today_row_idx("2026-07-05") == 3   # перечитано после расхождения
+    assert ws.call_log == ["col_values"]
+
+
+def test_get_day_data_uses_cached_layout(ws):
+    m = make_manager(ws)
+    assert m.get_day_data("2026-07-04") == {"игры": 1.0}
+    ws.call_log.clear()
+    assert m.get_day_data("2026-07-04") == {"игры": 1.0}
+    assert ws.call_log == ["row_values"]
+
+
+def test_get_day_data_detects_shifted_rows(ws):
+    m = make_manager(ws)
+    m.get_day_data("2026-07-04")
+    ws.rows.insert(1, ["2026-07-03", "5"])        # строки сдвинули руками
+    assert m.get_day_data("2026-07-04") == {"игры": 1.0}
+
+
+def test_get_days_strict_learns_layout(ws):
+    m = make_manager(ws)
+    assert m.get_days_strict(["2026-07-04"]) == {"2026-07-04": {"игры": 1.0}}
+    ws.call_log.clear()
+    m.write_days({"2026-07-04": {"игры": 2.0}})
+    assert ws.call_log == ["batch_get", "batch_update"]
+
+
+def test_windowed_read_fetches_only_needed_rows():
+    rows = [["Дата", "игры"]] + [[f"2020-01-{d:02d}", str(d)] for d in range(1, 29)]
+    ws = FakeWorksheet(rows + [["2026-07-04", "1"], ["2026-07-05", "2"], ["2026-07-07", "3"]])
+    m = make_manager(ws)
+    dates = ["2026-07-04", "2026-07-05", "2026-07-06", "2026-07-07"]
+    assert m.get_days_strict(dates) == {
+        "2026-07-04": {"игры": 1.0}, "2026-07-05": {"игры": 2.0},
+        "2026-07-06": {}, "2026-07-07": {"игры": 3.0}}
+    assert "get_all_values" not in ws.call_log
+    ws.call_log.clear()
+    m.get_days_strict(dates)                       # раскладка в кэше — один batch_get
+    assert ws.call_log == ["batch_get"]
+
+
+def test_windowed_read_recovers_from_shifted_rows(ws):
+    m = make_manager(ws)
+    m.get_days_strict(["2026-07-04"])
+    ws.rows.insert(1, ["2026-07-03", "5"])         # строки сдвинули руками
+    assert m.get_days_strict(["2026-07-04", "2026-07-03"]) == {
+        "2026-07-04": {"игры": 1.0}, "2026-07-03": {"игры": 5.0}}
+
+
+def test_row_ranges_merges_runs():
+    from src.data.sheets import row_ranges
+    assert row_ranges([2, 3, 4, 9], 3) == ["A2:C4", "A9:C9"]
+
+
+def test_row_hash_ignores_trailing_blanks_but_not_headers():
+    from src.data.sheets import row_hash
+    h = row_hash(["Дата", "Игры"], ["2025-01-01", "1"])
+    assert row_hash(["Дата", "Игры"], ["2025-01-01", "1", "", ""]) == h
+    assert row_hash(["Дата", "Игры"], ["2025-01-01", "2"]) != h
+    assert row_hash(["Дата", "Книги"], ["2025-01-01", "1"]) != h
+
+
+def test_get_rows_strict_returns_raw_rows():
+    ws = FakeWorksheet([["Дата", "Игры"], ["2025-01-01", "1"], ["2025-01-02", "3"]])
+    headers, rows = SheetsManager(ws=ws).get_rows_strict(["2025-01-02", "2025-01-09"])
+    assert headers == ["Дата", "Игры"]
+    assert rows == {"2025-01-02": ["2025-01-02", "3"]}
+
+
+def test_fresh_rows_check_layout_in_same_batch_get(ws):
+    m = make_manager(ws)
+    m.get_rows_strict(["2026-07-04"])
+    ws.call_log.clear()
+    headers, rows = m.get_rows_strict(["2026-07-04"], fresh=True)
+    assert rows == {"2026-07-04": ["2026-07-04", "1"]}
+    assert ws.call_log == ["batch_get"]           # раскладка не менялась — один запрос
+
+
+def test_fresh_rows_remap_after_manual_row_and_rename(ws):
+    m = make_manager(ws)
+    m.get_rows_strict(["2026-07-04"])
+    ws.rows.insert(1, ["2026-07-03", "5"])         # строку добавили руками
+    ws.rows[0][1] = "Игры"                         # и переименовали колонку
+    ws.call_log.clear()
+    headers, rows = m.get_rows_strict(["2026-07-04", "2026-07-03"], fresh=True)
+    assert headers == ["Дата", "Игры"]
+    assert rows == {"2026-07-03": ["2026-07-03", "5"], "2026-07-04": ["2026-07-04", "1"]}
+    assert ws.call_log == ["batch_get", "batch_get"]
+    assert m.find_today_row_idx("2026-07-03") == 2
@@ -53,3 +53,94 @@ def test_drain_failure_keeps_offset(j):
 def test_drain_empty_journal_ok(j):
     w = make_worker(j, lambda values, date: None)
     assert asyncio.run(w.drain()) is True
+
+
+def test_coalesce_between_failed_drains(j, monkeypatch):
+    import src.data.sync_worker as sw
+    monkeypatch.setattr(sw, "COALESCE_MIN_GAIN", 1)
+    for hours in (1.0, 2.0, 3.0):
+        j.append("2026-07-06", "игры", hours, "miniapp")
+    w = make_worker(j, lambda values, date: None)
+    asyncio.run(w.coalesce())
+    assert [e["hours"] for e in j.pending()] == [3.0]
+
+
+def test_drain_uses_single_batch_write(j):
+    batches = []
+    j.append("2026-07-05", "мото", 1.0, "bot")
+    j.append("2026-07-06", "игры", 2.0, "bot")
+    w = SyncWorker(j, asyncio.Event(), write_day=None, sheets_lock=asyncio.Lock(),
+                   write_days=batches.append)
+    assert asyncio.run(w.drain()) is True
+    assert batches == [{"2026-07-05": {"мото": 1.0}, "2026-07-06": {"игры": 2.0}}]
+    assert j.pending() == []
+
+
+def test_partial_failure_acks_written_dates(j, tmp_path):
+    j.append("2026-07-04", "игры", 1.0, "bot")
+    j.append("2026-07-05", "мото", 2.0, "bot")
+    j.append("2026-07-06", "игры", 3.0, "bot")
+    j.append("2026-07-04", "чтение", 0.5, "bot")   # за упавшей датой — курсор тут встанет
+    written, fail = [], {"2026-07-06"}
+
+    def write_day(values, date):
+        if date in fail:
+            raise RuntimeError("sheets down")
+        written.append((date, values))
+
+    w = make_worker(j, write_day)
+    assert asyncio.run(w.drain()) is False
+    assert [d for d, _ in written] == ["2026-07-04", "2026-07-05"]
+    # Префикс подтверждён, хвост с упавшей датой — нет
+    assert [e["date"] for e in j.pending()] == ["2026-07-06", "2026-07-04"]
+
+    # Рестарт: side-record переживает, повтор шлёт только недостающее
+    j2 = Journal(j.journal_path, j.offset_path)
+    fail.clear()
+    written.clear()
+    assert asyncio.run(make_worker(j2, write_day).drain()) is True
+    assert written == [("2026-07-06", {"игры": 3.0})]
+    assert j2.pending() == [] and j2.applied() == {}
+    assert not (tmp_path / "j.applied.json").exists()
+
+
+def test_newer_value_after_partial_write_is_resent(j):
+    j.append("2026-07-05", "мото", 2.0, "bot")
+    j.append("2026-07-06", "игры", 3.0, "bot")
+    written = []
+
+    def write_day(values, date):
+        if date == "2026-07-06":
+            raise RuntimeError("sheets down")
+        written.append((date, values))
+
+    w = make_worker(j, write_day)
+    asyncio.run(w.drain())
+    j.append("2026-07-05", "мото", 4.0, "bot")   # пользователь поправил записанное
+    written.clear()
+    w.write_day = lambda values, date: written.append((date, values))
+    assert asyncio.run(w.drain()) is True
+    assert ("2026-07-05", {"мото": 4.0}) in written
+
+
+def test_batched_drain_acks_written_chunks(j, monkeypatch):
+    import src.data.sync_worker as sw
+    monkeypatch.setattr(sw, "DRAIN_CHUNK_DATES", 2)
+    for day in range(1, 6):
+        j.append(f"2026-07-0{day}", "игры", float(day), "bot")
+    written, fail = [], {"2026-07-05"}
+
+    def write_days(batch):
+        if fail & set(batch):
+            raise RuntimeError("sheets down")
+        written.append(list(batch))
+
+    w = SyncWorker(j, asyncio.Event(), write_day=None, sheets_lock=asyncio.Lock(),
+                   write_days=write_days)
+    assert asyncio.run(w.drain()) is False
+    assert written == [["2026-07-01", "2026-07-02"], ["2026-07-03", "2026-07-04"]]
+    assert [e["date"] for e in j.pending()] == ["2026-07-05"]   # записанные пачки подтверждены
+    fail.clear()
+    written.clear()
+    assert asyncio.run(w.drain()) is True
+    assert written == [["2026-07-05"]] and j.applied() == {}